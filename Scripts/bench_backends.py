@@ -0,0 +1,94 @@
+"""
+Backend benchmark: per-file target-size search time, probe count and result size of JPG/PNG/GIF
+inputs with every probe encoded by its own magick process versus in-process by Pillow.
+
+Without a folder argument a few noise photos and one flat graphic are generated with Pillow.
+
+Usage (from the repository root):
+    python Scripts/bench_backends.py [FOLDER] [--format jpg] [--target-kb 200] [--runs 3]
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+
+if engine.PIL_AVAILABLE:
+    from PIL import Image, ImageDraw
+
+
+def make_batch(folder, count=3):
+    for i in range(count):
+        noise = Image.effect_noise((2400, 1600), 40 + 20 * i).convert('RGB')
+        noise.save(os.path.join(folder, f"photo_{i}.jpg"), quality=92)
+    graphic = Image.new('RGB', (1600, 1200), 'white')
+    draw = ImageDraw.Draw(graphic)
+    for i in range(0, 1600, 40):
+        draw.rectangle([i, (i * 7) % 1200, i + 30, 1200], fill=(i % 256, 80, 255 - i % 256))
+    graphic.save(os.path.join(folder, "graphic.png"))
+
+
+def time_search(src, work, args, magick_bin, backend):
+    out_dir = tempfile.mkdtemp(dir=work)
+    start = time.perf_counter()
+    out_path, size_str = engine.convert_with_target(
+        src, out_dir, args.format, args.target_kb * 1024, args.tolerance, False, None,
+        magick_bin=magick_bin, search=args.search, backend=backend,
+    )
+    elapsed = time.perf_counter() - start
+    match = re.search(r'\[(\d+) probes', size_str)
+    size = os.path.getsize(out_path)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return elapsed, int(match.group(1)) if match else 1, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('folder', nargs='?', help="JPG/PNG/GIF files to convert (default: generate some)")
+    parser.add_argument('--format', default='jpg', choices=['jpg', 'png', 'gif'])
+    parser.add_argument('--target-kb', type=int, default=200)
+    parser.add_argument('--tolerance', type=int, default=10)
+    parser.add_argument('--search', default='speculative', choices=sorted(engine.SEARCH_STRATEGIES))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--magick', default=None)
+    args = parser.parse_args()
+
+    if not engine.PIL_AVAILABLE:
+        sys.exit("Pillow is not installed (pip install Pillow).")
+    magick_bin = args.magick or engine.get_magick_bin()
+    if not magick_bin:
+        sys.exit("No ImageMagick binary found; pass --magick.")
+    work = tempfile.mkdtemp(prefix="bench_backends_")
+    try:
+        folder = args.folder
+        if folder is None:
+            folder = os.path.join(work, 'batch')
+            os.makedirs(folder)
+            make_batch(folder)
+        files = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(engine.backends.PILLOW_INPUTS))
+        print(f"{'file':<20} {'backend':<8} {'time':>9} {'probes':>7} {'bytes':>9}")
+        for src in files:
+            if engine.open_encoder(src) is None:
+                print(f"{os.path.basename(src):<20} not decodable by Pillow, skipped")
+                continue
+            times = {}
+            for backend in engine.BACKENDS:
+                runs = [time_search(src, work, args, magick_bin, backend) for _ in range(args.runs)]
+                times[backend] = statistics.median(r[0] for r in runs)
+                _, probes, size = runs[-1]
+                print(f"{os.path.basename(src):<20} {backend:<8} {times[backend]:>7.2f} s {probes:>7} {size:>9}")
+            print(f"{'':<20} {'speedup':<8} {times['magick'] / times['pillow']:>7.1f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Shrink-on-load benchmark: per-file time of the default-mode encode (25% resize) of large JPEG/PNG
+inputs, decoding the full image and resizing by percent versus passing the header size so JPEGs
+are decoded at reduced size (jpeg:size) and reduced with -thumbnail.
+
+Without a folder argument a few camera-sized noise JPEGs and one PNG are generated with
+ImageMagick.
+
+Usage (from the repository root):
+    python Scripts/bench_decode_hints.py [FOLDER] [--format jpg] [--scale 25] [--runs 3]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+
+
+def make_batch(folder, magick_bin, count=3):
+    for i in range(count):
+        subprocess.run([magick_bin, '-size', '8000x6000', 'xc:gray', '+noise', 'Random', '-quality', '90',
+                        os.path.join(folder, f"camera_{i}.jpg")], check=True, env=engine.portable_env())
+    subprocess.run([magick_bin, '-size', '6000x4000', 'xc:gray', '+noise', 'Random',
+                    os.path.join(folder, "scan.png")], check=True, env=engine.portable_env())
+
+
+def time_encode(src, dst, args, magick_bin, src_size):
+    cmd = engine.build_im_command(src, dst, args.format, scale=args.scale, magick_bin=magick_bin, src_size=src_size)
+    start = time.perf_counter()
+    res = engine.run_magick(cmd)
+    elapsed = time.perf_counter() - start
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr.decode(errors='ignore'))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('folder', nargs='?', help="JPEG/PNG files to convert (default: generate some)")
+    parser.add_argument('--format', default='jpg', choices=['jpg', 'png', 'gif'])
+    parser.add_argument('--scale', type=int, default=25, help="resize %% (default: 25, as in default mode)")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--magick', default=None)
+    args = parser.parse_args()
+
+    magick_bin = args.magick or engine.get_magick_bin()
+    if not magick_bin:
+        sys.exit("No ImageMagick binary found; pass --magick.")
+    work = tempfile.mkdtemp(prefix="bench_decode_")
+    try:
+        folder = args.folder
+        if folder is None:
+            folder = os.path.join(work, 'batch')
+            os.makedirs(folder)
+            make_batch(folder, magick_bin)
+        files = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        dst = os.path.join(work, f"out.{args.format}")
+        print(f"{'file':<24} {'size':>11} {'full decode':>12} {'hinted':>9} {'speedup':>8}")
+        for src in files:
+            dims = engine.image_dimensions(src)
+            if dims is None:
+                print(f"{os.path.basename(src):<24} header not readable, skipped")
+                continue
+            full = statistics.median(time_encode(src, dst, args, magick_bin, None) for _ in range(args.runs))
+            hinted = statistics.median(time_encode(src, dst, args, magick_bin, dims) for _ in range(args.runs))
+            print(f"{os.path.basename(src):<24} {dims[0]:>5}x{dims[1]:<5} {full:>10.2f} s {hinted:>7.2f} s "
+                  f"{full / hinted:>7.1f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
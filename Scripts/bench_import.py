@@ -0,0 +1,46 @@
+"""
+Import-time benchmark: how long a fresh interpreter takes to import the conversion engine
+compared with the full GUI module.
+
+Usage (from the repository root):
+    python Scripts/bench_import.py [runs]
+"""
+
+import os
+import sys
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = (
+    "import time, sys; t = time.perf_counter(); import {module}; "
+    "sys.stderr.write('%f\\n' % (time.perf_counter() - t))"
+)
+
+
+def time_import(module, runs):
+    """Median wall time of `import module` over several fresh interpreters, or None if it fails."""
+    samples = []
+    for _ in range(runs):
+        res = subprocess.run(
+            [sys.executable, '-c', SNIPPET.format(module=module)],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        if res.returncode != 0:
+            print(f"import {module} failed:\n{res.stderr.decode(errors='ignore').strip()}")
+            return None
+        samples.append(float(res.stderr.decode().strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for module in ('engine', 'app'):
+        seconds = time_import(module, runs)
+        if seconds is not None:
+            print(f"import {module:<7} median of {runs}: {seconds * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
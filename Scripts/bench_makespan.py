@@ -0,0 +1,92 @@
+"""
+Makespan benchmark: wall time of a mixed batch started in list order versus longest-job-first
+(LPT) order, plus what the engine's cost model predicts for both.
+
+Without a folder argument a mixed batch is generated with ImageMagick: many small noise images
+followed by one large poster-sized image saved as PDF, the worst case for list order.
+
+Usage (from the repository root):
+    python Scripts/bench_makespan.py [FOLDER] [--workers 4] [--target-kb 200] [--runs 3]
+"""
+
+import os
+import sys
+import heapq
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+
+
+def make_mixed_batch(folder, magick_bin, small=12):
+    """Small noise JPGs named a..l, then a poster PDF named so it sorts last."""
+    for i in range(small):
+        subprocess.run([magick_bin, '-size', '1200x900', 'xc:gray', '+noise', 'Random',
+                        os.path.join(folder, f"{chr(97 + i)}_small.jpg")], check=True, env=engine.portable_env())
+    subprocess.run([magick_bin, '-size', '1500x1500', 'xc:gray', '+noise', 'Random', '-units', 'PixelsPerInch',
+                    '-density', '72', os.path.join(folder, 'z_poster.pdf')], check=True, env=engine.portable_env())
+
+
+def simulated_makespan(costs, workers):
+    """Greedy list scheduling: each job goes to the worker that frees up first."""
+    finish = [0.0] * workers
+    for cost in costs:
+        heapq.heappush(finish, heapq.heappop(finish) + cost)
+    return max(finish)
+
+
+def run_batch(files, out_dir, args, magick_bin, lpt):
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    summary = engine.convert_batch(
+        files, out_dir, args.format, args.target_kb * 1024 if args.target_kb else None, 10, False, None,
+        lambda *a: None, workers=args.workers, magick_bin=magick_bin, lpt=lpt,
+    )
+    return summary['elapsed']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('folder', nargs='?', help="batch to convert (default: generate a mixed batch)")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--format', default='jpg', choices=['jpg', 'png', 'gif'])
+    parser.add_argument('--target-kb', type=int, default=None)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--magick', default=None)
+    args = parser.parse_args()
+
+    magick_bin = args.magick or engine.get_magick_bin()
+    if not magick_bin:
+        sys.exit("No ImageMagick binary found; pass --magick.")
+    work = tempfile.mkdtemp(prefix="bench_makespan_")
+    try:
+        folder = args.folder
+        if folder is None:
+            folder = os.path.join(work, 'batch')
+            os.makedirs(folder)
+            make_mixed_batch(folder, magick_bin)
+        files = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(engine.SUPPORTED_INPUTS))
+        jobs = engine.plan_pages(files, args.format, magick_bin)
+        target_bytes = args.target_kb * 1024 if args.target_kb else None
+        estimates = engine.estimate_jobs(jobs, args.format, target_bytes, None, magick_bin)
+        costs = [estimates[job]['cost'] for job in jobs]
+        lpt_costs = [costs[i] for i in engine.longest_first(jobs, estimates)]
+        print(f"{len(files)} files, {len(jobs)} jobs, {args.workers} workers")
+        print(f"cost model makespan: list order {simulated_makespan(costs, args.workers):.3g}, "
+              f"largest first {simulated_makespan(lpt_costs, args.workers):.3g}")
+
+        out_dir = os.path.join(work, 'out')
+        for name, lpt in (('list order', False), ('largest first', True)):
+            times = [run_batch(files, out_dir, args, magick_bin, lpt) for _ in range(args.runs)]
+            print(f"{name:<14} median of {args.runs}: {statistics.median(times):7.2f} s  (min {min(times):.2f} s)")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
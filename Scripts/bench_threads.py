@@ -0,0 +1,80 @@
+"""
+Thread-budget benchmark: wall time of one batch under each THREAD_MODES setting ("multi" splits
+the cores between workers, "single" runs single-threaded jobs, "off" lets every magick child
+use all cores) for several worker counts.
+
+Without a folder argument a batch of large noise images is generated with ImageMagick; resizing
+and encoding them keeps ImageMagick's OpenMP loops busy.
+
+Usage (from the repository root):
+    python Scripts/bench_threads.py [FOLDER] [--workers 1,2,4,8] [--target-kb 300] [--runs 3]
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+
+
+def make_batch(folder, magick_bin, count=16):
+    for i in range(count):
+        subprocess.run([magick_bin, '-size', '3000x2000', 'xc:gray', '+noise', 'Random',
+                        os.path.join(folder, f"img_{i:02d}.png")], check=True, env=engine.portable_env())
+
+
+def run_batch(files, out_dir, args, magick_bin, workers, mode):
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    summary = engine.convert_batch(
+        files, out_dir, args.format, args.target_kb * 1024 if args.target_kb else None, 10, False, None,
+        lambda *a: None, workers=workers, magick_bin=magick_bin, thread_mode=mode,
+    )
+    return summary['elapsed']
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('folder', nargs='?', help="batch to convert (default: generate one)")
+    parser.add_argument('--workers', default=','.join(str(w) for w in sorted({1, 2, 4, min(5, cores), cores})),
+                        help="comma-separated worker counts")
+    parser.add_argument('--format', default='jpg', choices=['jpg', 'png', 'gif'])
+    parser.add_argument('--target-kb', type=int, default=None)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--magick', default=None)
+    args = parser.parse_args()
+
+    magick_bin = args.magick or engine.get_magick_bin()
+    if not magick_bin:
+        sys.exit("No ImageMagick binary found; pass --magick.")
+    work = tempfile.mkdtemp(prefix="bench_threads_")
+    try:
+        folder = args.folder
+        if folder is None:
+            folder = os.path.join(work, 'batch')
+            os.makedirs(folder)
+            make_batch(folder, magick_bin)
+        files = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(engine.SUPPORTED_INPUTS))
+        print(f"{len(files)} files, {cores} cores")
+        print(f"{'workers':>7}  " + ''.join(f"{mode:>18}" for mode in engine.THREAD_MODES))
+        out_dir = os.path.join(work, 'out')
+        for workers in (int(w) for w in args.workers.split(',')):
+            cells = []
+            for mode in engine.THREAD_MODES:
+                times = [run_batch(files, out_dir, args, magick_bin, workers, mode) for _ in range(args.runs)]
+                threads = engine.threads_per_job(mode, workers) or cores
+                cells.append(f"{statistics.median(times):8.2f} s ({threads:>2} thr)")
+            print(f"{workers:>7}  " + ''.join(f"{c:>18}" for c in cells))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Ghostscript stand-in for the 'gs' PDF backend where Ghostscript isn't installed or bundled.
+Accepts the arguments engine.build_gs_command passes and writes a blank white page of the size
+Ghostscript would render (the PDF's largest MediaBox, or its TrimBox with -dUseTrimBox, at -r
+dpi) as raw PPM (ppmraw) or RGBA PNG (pngalpha), so the backend can be exercised end to end.
+
+Usage (from the repository root):
+    GS_PROG=Scripts/gs_standin.py python cli.py FILE.pdf --pdf-backend gs --magick PATH
+
+Set GS_STANDIN_LOG to a file to have every invocation's arguments appended to it.
+"""
+
+import os
+import re
+import sys
+import zlib
+import struct
+
+BOX_RE = rb"/%s\s*\[\s*(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s*\]"
+
+
+def page_size(path, box='MediaBox'):
+    """(width, height) in points of the largest box of that name (US Letter if there is none)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    best = None
+    for m in re.finditer(BOX_RE % box.encode(), data):
+        x0, y0, x1, y1 = (float(v) for v in m.groups())
+        w, h = abs(x1 - x0), abs(y1 - y0)
+        if best is None or w * h > best[0] * best[1]:
+            best = (w, h)
+    if best is None and box != 'MediaBox':
+        return page_size(path)
+    return best or (612.0, 792.0)
+
+
+def write_ppm(path, width, height):
+    with open(path, 'wb') as f:
+        f.write(b"P6\n%d %d\n255\n" % (width, height))
+        f.write(b"\xff" * (3 * width * height))
+
+
+def write_png(path, width, height):
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    row = b"\x00" + b"\xff\xff\xff\x00" * width  # filter byte + transparent white, like pngalpha
+    with open(path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(row * height, 1)))
+        f.write(chunk(b'IEND', b''))
+
+
+def main(argv):
+    if '--version' in argv:
+        print("10.00.0 (stand-in)")
+        return 0
+    log = os.environ.get('GS_STANDIN_LOG')
+    if log:
+        with open(log, 'a') as f:
+            f.write(' '.join(argv) + '\n')
+    opts = {}
+    src = None
+    for i, arg in enumerate(argv):
+        if arg.startswith(('-s', '-d')) and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            opts[key] = value
+        elif arg.startswith('-d'):
+            opts[arg[2:]] = True
+        elif arg.startswith('-r'):
+            opts['r'] = arg[2:]
+        elif arg == '-f' and i + 1 < len(argv):
+            src = argv[i + 1]
+    if src is None or 'OutputFile' not in opts:
+        print("gs_standin: need -sOutputFile=... and -f FILE", file=sys.stderr)
+        return 1
+    device = opts.get('DEVICE', 'ppmraw')
+    if device not in ('ppmraw', 'pngalpha'):
+        print(f"gs_standin: unsupported device {device}", file=sys.stderr)
+        return 1
+    try:
+        w, h = page_size(src, 'TrimBox' if 'UseTrimBox' in opts else 'MediaBox')
+    except OSError as e:
+        print(f"gs_standin: {e}", file=sys.stderr)
+        return 1
+    dpi = float(opts.get('r', 72))
+    width, height = max(1, int(w * dpi / 72 + 0.5)), max(1, int(h * dpi / 72 + 0.5))
+    out_path = opts['OutputFile'].replace('%%', '%')
+    (write_ppm if device == 'ppmraw' else write_png)(out_path, width, height)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -39,71 +39,26 @@ def ensure_convert_executable():
 
 
 ensure_convert_executable()
-import subprocess
-import tempfile
-import shutil
-import math
 import sqlite3
-import time
 import pandas as pd
 import re
+import threading
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLineEdit, QVBoxLayout, QHBoxLayout, QGridLayout, QPushButton, QListWidget, QFileDialog, QLabel, QProgressBar, QWidget, QMessageBox
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QIcon, QPixmap, QMovie, QPainter
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt5.QtWidgets import QComboBox, QCheckBox, QAction, QDialog, QSpinBox, QTextEdit, QTabWidget
 from renamer import RenamerTab
 from qr_code import QRCodeTab
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- Portable tool integration ---
 import sys
+from engine import (
+    MAGICK_DIR, get_magick_bin, SEARCH_STRATEGIES, THREAD_MODES, BACKENDS, PDF_BACKENDS, BatchCancelled, RES_PRESETS, SUPPORTED_INPUTS, convert_batch,
+    ResultCache, RateCurveStore, config_dir, path_db, init_database,
+)
 
-
-def resource_path(relative_path):
-    """Get absolute path to resource, works for dev and for PyInstaller bundle."""
-    if hasattr(sys, '_MEIPASS'):
-        base_path = sys._MEIPASS
-    else:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
-
-
-MAGICK_DIR = resource_path('portable_magick')
-
-
-def find_portable_magick_bin():
-    # Prefer 'magick' (IM v7) if present, fall back to 'convert' (IM v6)
-    for name in ('magick', 'convert'):
-        path = os.path.join(MAGICK_DIR, 'bin', name)
-        if os.path.isfile(path) and os.access(path, os.X_OK):
-            return path
-    return None
-
-
-# Resolve portable ImageMagick entry point
-MAGICK_BIN = find_portable_magick_bin()
-if not MAGICK_BIN:
-    raise FileNotFoundError("No usable ImageMagick binary ('magick' or 'convert') found in portable_magick/bin.")
-
-
-def portable_env():
-    env = os.environ.copy()
-    magick_bin_dir = os.path.join(MAGICK_DIR, 'bin')
-    env['PATH'] = os.pathsep.join([magick_bin_dir, env.get('PATH', '')])
-    lib_dir = os.path.join(MAGICK_DIR, 'lib')
-    if os.path.isdir(lib_dir):
-        # Prepend ImageMagick lib dir to ensure it takes precedence over PIL bundled libs
-        # This fixes harfbuzz symbol conflicts between PIL and ImageMagick
-        env['DYLD_LIBRARY_PATH'] = lib_dir + os.pathsep + env.get('DYLD_LIBRARY_PATH', '')
-    return env
-
-    gs_path = os.path.join(magick_bin_dir, 'gs')
-    env['GS_PROG'] = gs_path
-    # If you have a modules directory, add:
-    # env['MAGICK_MODULE_PATH'] = os.path.join(MAGICK_DIR, 'lib', 'ImageMagick-7.*/modules-Q16HDRI/coders')
-    return env
-    return env
-
+# Resolve portable ImageMagick entry point (falls back to one on PATH)
+MAGICK_BIN = get_magick_bin()
 
 # Debug prints for runtime path diagnostics
 print("[DEBUG] MAGICK_DIR:", MAGICK_DIR)
@@ -123,248 +78,17 @@ basedir = os.path.dirname(__file__)
 #######################################################################################################
 
 
-def build_im_command(src_path, dst_path, out_fmt, quality=None, colors=None, scale=100, density=None,
-                     trim=False, gif_timing=None, magick_bin=MAGICK_BIN):
-    """Build an ImageMagick convert command using only portable_magick.
-    gif_timing: dict with keys {delay, loop} or fca/frame/opt/custom string use-case.
-    """
-    cmd = [magick_bin]
-    # PDF density must come before input
-    if density is not None:
-        cmd += ['-density', str(density)]
-
-    # For animated inputs, coalesce should occur AFTER the input is read.
-
-    # For PDFs, when trimming is requested, use the TrimBox on import
-    if trim and src_path.lower().endswith('.pdf'):
-        cmd += ['-define', 'pdf:use-trimbox=true']
-
-    # Input
-    cmd += [src_path]
-
-    if trim:
-        cmd += ['-trim', '+repage']
-
-    # Apply coalesce only when output is GIF and the input is an animated GIF
-    if out_fmt == 'gif' and src_path.lower().endswith('.gif'):
-        cmd += ['-coalesce']
-
-    # Common operations
-    if out_fmt == 'jpg':
-        if quality is not None:
-            cmd += ['-quality', str(quality)]
-        cmd += ['-strip', '-interlace', 'Plane', '-sampling-factor', '4:2:0']
-    elif out_fmt in ('png', 'gif'):
-        if colors is not None:
-            cmd += ['-dither', 'None', '-colors', str(colors)]
-        if out_fmt == 'png':
-            cmd += ['-strip', '-define', 'png:compression-level=9']
-        if out_fmt == 'gif':
-            cmd += ['-layers', 'Optimize', '+map']
-
-    if scale != 100:
-        cmd += ['-resize', f'{scale}%']
-
-    # GIF timing controls (only for GIF output)
-    if out_fmt == 'gif' and gif_timing:
-        if isinstance(gif_timing, str):
-            cmd += ['-delay'] + gif_timing.split()
-        else:
-            delay = gif_timing.get('delay')
-            loop = gif_timing.get('loop')
-            if delay is not None:
-                cmd += ['-delay', str(delay)]
-            if loop is not None:
-                cmd += ['-loop', str(loop)]
-
-    # Output
-    cmd += [dst_path]
-    return cmd
-
-
-def within_tolerance(size_bytes, target_bytes, tolerance_pct):
-    lo = target_bytes * (1 - tolerance_pct / 100.0)
-    hi = target_bytes * (1 + tolerance_pct / 100.0)
-    return lo <= size_bytes <= hi
-
-
-def convert_with_target(src_path, out_dir, out_fmt, target_bytes, tolerance_pct, trim_pdf,
-                        gif_opts, default_density=None, timeout_sec=25, magick_bin=MAGICK_BIN):
-    """Iteratively convert using ImageMagick only to meet byte target.
-    Returns (out_path, size_str) or raises on fatal error.
-    """
-    base_name = os.path.splitext(os.path.basename(src_path))[0]
-    dst_path = os.path.join(out_dir or os.path.dirname(src_path), f"{base_name}.{out_fmt}")
-    is_pdf = src_path.lower().endswith('.pdf')
-
-    # Default mode: if target_bytes is None, do a single-pass conversion with density 288 (for PDFs) and resize 25%
-    if target_bytes is None:
-        density = (default_density if default_density is not None else 288) if is_pdf else None
-        cmd = build_im_command(
-            src_path, dst_path, out_fmt,
-            quality=None, colors=None, scale=25, density=density,
-            trim=trim_pdf and is_pdf,
-            gif_timing=(gif_opts.get('custom') if gif_opts else None),
-            magick_bin=magick_bin,
-        )
-        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
-        if res.returncode != 0:
-            raise RuntimeError(f"Default conversion failed: {res.stderr.decode(errors='ignore')}")
-        out_choice = dst_path
-        if not os.path.exists(out_choice):
-            # Multi-page outputs may be written as base-0.ext, base-1.ext, etc.
-            base_no_ext, ext = os.path.splitext(dst_path)
-            import glob
-            candidates = sorted(glob.glob(f"{base_no_ext}-*{ext}"))
-            if candidates:
-                out_choice = candidates[0]
-            else:
-                raise RuntimeError("Default conversion failed: no output produced")
-        size = os.path.getsize(out_choice)
-        return out_choice, f"{size} Bytes ({size/1024:.2f} KB)"
-
-    work_dir = tempfile.mkdtemp(prefix="imconv_")
-    try:
-        start_ts = time.time()
-        # Optional pre-pass: for PDFs with a target, rasterize once at the selected preset density then apply tolerance on the raster
-        src_for_iter = src_path
-        if target_bytes is not None and is_pdf and default_density is not None:
-            pre_src = os.path.join(work_dir, f"pre_{default_density}.png")
-            pre_cmd = build_im_command(
-                src_path, pre_src, 'png', quality=None, colors=None, scale=25, density=default_density,
-                trim=trim_pdf and is_pdf, gif_timing=None, magick_bin=magick_bin
-            )
-            res = subprocess.run(pre_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
-            if res.returncode == 0 and os.path.exists(pre_src):
-                src_for_iter = pre_src
-                is_pdf = False  # subsequent steps treat it as an image (no PDF density needed)
-
-        # Strategy parameters
-        if is_pdf:
-            base_ladder = [200, 150, 120, 100]
-            if default_density is not None:
-                # Start with the user-selected preset, then fall back through the base ladder
-                density_ladder = [default_density] + [d for d in base_ladder if d != default_density]
-            else:
-                density_ladder = base_ladder
-        else:
-            density_ladder = [None]
-        scale_ladder = [100, 90, 80, 70, 60]
-        # Quality/palette search ranges
-        q_lo, q_hi = 20, 90
-        c_lo, c_hi = 16, 256
-
-        best_path = None
-        best_delta = float('inf')
-
-        for density in density_ladder:
-            for scale in scale_ladder:
-                # Initialize per-format parameter search
-                if out_fmt == 'jpg':
-                    lo, hi = q_lo, q_hi
-                    while lo <= hi:
-                        # Timeout: if target mode and taking too long, fall back to single pass using selected preset (or Low)
-                        if target_bytes is not None and (time.time() - start_ts) > timeout_sec:
-                            low_density = default_density if default_density is not None else (144 if src_path.lower().endswith('.pdf') else None)
-                            cmd = build_im_command(
-                                src_path, dst_path, out_fmt,
-                                quality=None, colors=None, scale=25, density=low_density,
-                                trim=trim_pdf and src_path.lower().endswith('.pdf'),
-                                gif_timing=None, magick_bin=magick_bin,
-                            )
-                            res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
-                            if res.returncode != 0 or not os.path.exists(dst_path):
-                                raise RuntimeError(f"Timed fallback failed: {res.stderr.decode(errors='ignore')}")
-                            size = os.path.getsize(dst_path)
-                            return dst_path, f"{size} Bytes ({size/1024:.2f} KB) [Timed fallback]"
-                        mid = (lo + hi) // 2
-                        tmp_out = os.path.join(work_dir, f"tmp_{density}_{scale}_{mid}.jpg")
-                        cmd = build_im_command(
-                            src_for_iter, tmp_out, 'jpg', quality=mid, scale=scale, density=density,
-                            trim=trim_pdf and is_pdf, gif_timing=None, magick_bin=magick_bin
-                        )
-                        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
-                        if res.returncode != 0 or not os.path.exists(tmp_out):
-                            # On error, move quality lower to try smaller file
-                            hi = mid - 1
-                            continue
-                        size = os.path.getsize(tmp_out)
-                        if within_tolerance(size, target_bytes, tolerance_pct):
-                            shutil.move(tmp_out, dst_path)
-                            return dst_path, f"{size} Bytes ({size/1024:.2f} KB)"
-                        # Track best attempt
-                        delta = abs(size - target_bytes)
-                        if delta < best_delta:
-                            best_delta = delta
-                            best_path = tmp_out
-                        if size > target_bytes:
-                            # need smaller file => reduce quality
-                            hi = mid - 1
-                        else:
-                            lo = mid + 1
-
-                elif out_fmt in ('png', 'gif'):
-                    lo, hi = c_lo, c_hi
-                    while lo <= hi:
-                        # Timeout fallback
-                        if target_bytes is not None and (time.time() - start_ts) > timeout_sec:
-                            low_density = default_density if default_density is not None else (144 if src_path.lower().endswith('.pdf') else None)
-                            cmd = build_im_command(
-                                src_path, dst_path, out_fmt,
-                                quality=None, colors=None, scale=25, density=low_density,
-                                trim=trim_pdf and src_path.lower().endswith('.pdf'),
-                                gif_timing=None, magick_bin=magick_bin,
-                            )
-                            res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
-                            if res.returncode != 0 or not os.path.exists(dst_path):
-                                raise RuntimeError(f"Timed fallback failed: {res.stderr.decode(errors='ignore')}")
-                            size = os.path.getsize(dst_path)
-                            return dst_path, f"{size} Bytes ({size/1024:.2f} KB) [Timed fallback]"
-                        mid = (lo + hi) // 2
-                        tmp_out = os.path.join(work_dir, f"tmp_{density}_{scale}_{mid}.{out_fmt}")
-                        timing = None
-                        if out_fmt == 'gif' and gif_opts:
-                            # Use existing custom timing string if provided
-                            timing = gif_opts.get('custom') or None
-                        cmd = build_im_command(
-                            src_for_iter, tmp_out, out_fmt, colors=mid, scale=scale, density=density,
-                            trim=trim_pdf and is_pdf, gif_timing=timing, magick_bin=magick_bin
-                        )
-                        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
-                        if res.returncode != 0 or not os.path.exists(tmp_out):
-                            # On error, reduce colors to get smaller files
-                            hi = mid - 1
-                            continue
-                        size = os.path.getsize(tmp_out)
-                        if within_tolerance(size, target_bytes, tolerance_pct):
-                            shutil.move(tmp_out, dst_path)
-                            return dst_path, f"{size} Bytes ({size/1024:.2f} KB)"
-                        delta = abs(size - target_bytes)
-                        if delta < best_delta:
-                            best_delta = delta
-                            best_path = tmp_out
-                        if size > target_bytes:
-                            hi = mid - 1
-                        else:
-                            lo = mid + 1
-
-        # If no exact match, write best attempt if any
-        if best_path and os.path.exists(best_path):
-            shutil.move(best_path, dst_path)
-            size = os.path.getsize(dst_path)
-            return dst_path, f"{size} Bytes ({size/1024:.2f} KB)"
-        raise RuntimeError("Conversion failed: no output produced")
-    finally:
-        shutil.rmtree(work_dir, ignore_errors=True)
-
-
 class GenericConversionThread(QThread):
     progress = pyqtSignal(str, int, int)
     converted_created = pyqtSignal(str, str)
+    batch_summary = pyqtSignal(dict)  # convert_batch's summary: jobs, elapsed, scheduler decisions
 
     def __init__(self, files, output_dir, out_fmt, target_bytes, tolerance_pct, trim_pdfs,
                  fca_value, frame_value, opt_value, custom_fca_frame_cmd, workers=5,
-                 default_density=None, timeout_sec=25):
+                 default_density=None, timeout_sec=25, search='speculative', persistent_workers=False,
+                 jpeg_extent=True, result_cache=True, adaptive_workers=False, min_workers=1, memory_budget_mb=0,
+                 largest_first=True, thread_mode='off', process_timeout=300, pipeline=False, raster_workers=2,
+                 fast_probes=True, shared_palette=True, backend='magick', pdf_backend='magick'):
         super().__init__()
         self.files = files
         self.output_dir = output_dir
@@ -381,277 +105,120 @@ class GenericConversionThread(QThread):
         self.workers = max(1, int(workers))
         self.default_density = default_density
         self.timeout_sec = timeout_sec
+        self.search = search
+        self.persistent_workers = persistent_workers
+        self.jpeg_extent = jpeg_extent
+        self.fast_probes = fast_probes
+        self.shared_palette = shared_palette
+        self.backend = backend
+        self.pdf_backend = pdf_backend
+        self.result_cache = result_cache
+        self.adaptive_workers = adaptive_workers
+        self.min_workers = max(1, int(min_workers))
+        self.memory_budget_mb = max(0, int(memory_budget_mb))  # 0 = automatic
+        self.largest_first = largest_first
+        self.thread_mode = thread_mode
+        self.process_timeout = process_timeout or None  # 0 = no limit
+        self.pipeline = pipeline
+        self.raster_workers = max(1, int(raster_workers))
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stop the batch: running magick processes are killed, pending files are skipped."""
+        self.cancel_event.set()
 
     def run(self):
-        total_files = len(self.files)
-        with ThreadPoolExecutor(max_workers=self.workers) as executor:
-            future_to_src = {}
-            for f in self.files:
-                fut = executor.submit(
-                    convert_with_target,
-                    f,
-                    self.output_dir,
-                    self.out_fmt,
-                    self.target_bytes,
-                    self.tolerance_pct,
-                    self.trim_pdfs,
-                    self.gif_opts,
-                    self.default_density,
-                    timeout_sec=self.timeout_sec,
-                    magick_bin=MAGICK_BIN
-                )
-                future_to_src[fut] = f
-
-            total = len(future_to_src)
-            completed_index = 0
-            for future in as_completed(future_to_src):
-                try:
-                    out_path, size_str = future.result()
-                    src_path_orig = future_to_src[future]
-                    completed_index += 1
-                    # If ImageMagick produced multi-page outputs (e.g., name-0.jpg, name-1.jpg),
-                    # the returned out_path may be a single page (e.g., base-0.jpg). In that case,
-                    # glob using the stem without the trailing -<n> to capture both pages, but ONLY
-                    # when the original source was not already a numbered page file.
-                    emitted_any = False
-                    base, ext = os.path.splitext(out_path)
-                    import glob, re
-                    base_dir = os.path.dirname(base)
-                    base_name = os.path.basename(base)
-                    m = re.match(r"^(.*)-(\d+)$", base_name)
-                    src_is_numbered = re.match(r"^(.*)-(\d+)\.[^.]+$", os.path.basename(src_path_orig)) is not None
-                    if m and not src_is_numbered:
-                        base_for_glob = os.path.join(base_dir, m.group(1))
-                    else:
-                        base_for_glob = base
-                    # Gather candidates like base-<n>.ext
-                    pattern = f"{base_for_glob}-*.{ext.lstrip('.')}"
-                    candidates = sorted(glob.glob(pattern))
-                    if candidates:
-                        # Sort pages numerically; then if both 1 and 0 exist, place 1 before 0
-                        def page_index(p):
-                            b = os.path.splitext(os.path.basename(p))[0]
-                            try:
-                                return int(b.split('-')[-1])
-                            except Exception:
-                                return 0
-                        candidates.sort(key=page_index)
-                        # Reorder to prefer page 1 first if both 0 and 1 present
-                        names = {os.path.splitext(os.path.basename(c))[0] for c in candidates}
-                        has0 = any(n.endswith('-0') for n in names)
-                        has1 = any(n.endswith('-1') for n in names)
-                        if has0 and has1:
-                            candidates = sorted(
-                                candidates,
-                                key=lambda p: (
-                                    0, page_index(p)
-                                ) if p.endswith('-1'+ext) else (
-                                    1, page_index(p)
-                                ) if p.endswith('-0'+ext) else (
-                                    2, page_index(p)
-                                )
-                            )
-                        for p in candidates:
-                            try:
-                                sz = os.path.getsize(p)
-                                name = os.path.basename(p)
-                                self.progress.emit(name, completed_index, total)
-                                self.converted_created.emit(p, f"{sz} Bytes ({sz/1024:.2f} KB)")
-                                emitted_any = True
-                            except Exception:
-                                continue
-                    if not emitted_any:
-                        # Single output
-                        name = os.path.basename(out_path)
-                        self.progress.emit(name, completed_index, total)
-                        self.converted_created.emit(out_path, size_str)
-                except Exception as e:
-                    print(f"Error converting {future_to_src[future]}: {e}")
-
-# Define the name of your database file
-db_file = 'database.db'  # You can choose any name you like
-
-# Create the 'config' directory path
-config_dir = os.path.join(basedir, 'config')
-
-# Ensure the 'config' directory exists; create it if it does not
-os.makedirs(config_dir, exist_ok=True)
-
-# Create the full path to the database file inside the 'config' directory
-path_db = os.path.join(config_dir, db_file)
-
-# Now connect to the SQLite database
-try:
-    # Connect to the SQLite database (this will create the database file if it doesn't exist)
-    conn = sqlite3.connect(path_db)
-    # print(f"Successfully connected to the database at: {path_db}")
-
-    # Create a cursor object to execute SQL commands
-    cursor = conn.cursor()
-
-    # Create the tables if they don't already exist
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS paths (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT UNIQUE,  -- This will store either 'convert_path' or 'gifsicle_path'
-            path TEXT          -- This will store the actual path
+        cache = ResultCache(path_db, os.path.join(config_dir, 'result_cache')) if self.result_cache else None
+        curves = RateCurveStore(path_db) if self.result_cache else None
+        summary = convert_batch(
+            self.files, self.output_dir, self.out_fmt, self.target_bytes, self.tolerance_pct,
+            self.trim_pdfs, self.gif_opts, self.on_result,
+            workers=self.workers,
+            default_density=self.default_density,
+            timeout_sec=self.timeout_sec,
+            magick_bin=MAGICK_BIN,
+            search=self.search,
+            persistent_workers=self.persistent_workers,
+            jpeg_extent=self.jpeg_extent,
+            fast_probes=self.fast_probes,
+            shared_palette=self.shared_palette,
+            backend=self.backend,
+            pdf_backend=self.pdf_backend,
+            cache=cache,
+            curves=curves,
+            adaptive=self.adaptive_workers,
+            min_workers=self.min_workers,
+            memory_budget=self.memory_budget_mb * 1024 * 1024 or None,
+            lpt=self.largest_first,
+            thread_mode=self.thread_mode,
+            process_timeout=self.process_timeout,
+            cancel_event=self.cancel_event,
+            pipeline=self.pipeline,
+            raster_workers=self.raster_workers
         )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    """)
-
-    # Optional: Insert default values if they don't exist
-    # Paths are now hardcoded to portable_magick, so DB values are ignored
-
-    # Commit changes and close the connection
-    conn.commit()
-
-except sqlite3.OperationalError as e:
-    print(f"Error connecting to the database: {e}")
-finally:
-    if conn:
-        conn.close()  # Always close the connection
-
-
-def convert_pdf_to_gif(pdf_path, output_dir, fca_value, frame_value, opt_value, magick_path, custom_fca_frame_cmd=None):
-    # Get the PDF name and the directory to save the GIF in
-    pdf_name = os.path.basename(pdf_path)  # Get the PDF filename
-    pdf_dir = os.path.dirname(pdf_path)
-    gif_name = pdf_name.replace('.pdf', '.gif')  # Create the GIF name
-    gif_path = os.path.join(pdf_dir, gif_name)  # Save GIF in the same directory as the PDF
-
-    # Determine the FCA and Frame part of the command
-    if custom_fca_frame_cmd:
-        fca_frame_cmd = custom_fca_frame_cmd  # Use the custom value if provided
-    else:
-        # Construct the FCA and Frame part of the command
-        if fca_value == "Yes" and frame_value == "Loop":
-            fca_frame_cmd = "300 -loop 0"
-        elif fca_value == "No" and frame_value == "Loop":
-            fca_frame_cmd = "300 -loop 0"
-        elif fca_value == "Yes" and frame_value == "2":
-            fca_frame_cmd = "1000 -loop 1"
-        elif fca_value == "No" and frame_value == "2":
-            fca_frame_cmd = "200 -loop 5"
-        elif fca_value == "Yes" and frame_value == "3":
-            fca_frame_cmd = "500 -loop 1"
-        elif fca_value == "No" and frame_value == "3":
-            fca_frame_cmd = "200 -loop 4"
-        elif fca_value == "Yes" and frame_value == "4":
-            fca_frame_cmd = "350 -loop 1"
-        elif fca_value == "No" and frame_value == "4":
-            fca_frame_cmd = "200 -loop 3"
-        elif fca_value == "Yes" and frame_value == "5":
-            fca_frame_cmd = "250 -loop 1"
-        elif fca_value == "No" and frame_value == "5":
-            fca_frame_cmd = "166 -loop 3"
-        elif fca_value == "Yes" and frame_value == "6":
-            fca_frame_cmd = "250 -loop 1"
-        elif fca_value == "No" and frame_value == "6":
-            fca_frame_cmd = "150 -loop 3"
-        elif fca_value == "Yes" and frame_value == "7":
-            fca_frame_cmd = "220 -loop 1"
-        elif fca_value == "No" and frame_value == "7":
-            fca_frame_cmd = "140 -loop 3"
-        elif fca_value == "Yes" and frame_value == "8":
-            fca_frame_cmd = "220 -loop 1"
-        elif fca_value == "No" and frame_value == "8":
-            fca_frame_cmd = "166 -loop 2"
-        elif fca_value == "Yes" and frame_value == "9":
-            fca_frame_cmd = "220 -loop 1"
-        elif fca_value == "No" and frame_value == "9":
-            fca_frame_cmd = "150 -loop 2"
-        else:
-            fca_frame_cmd = "-delay 500 -loop 0"  # Default command if no match
-
-    opt_cmd = "-layers Optimize" if opt_value == "Yes" else ""
-    opt_cmd1 = "-coalesce -dispose background -alpha background +dither"
-    opt_cmd2 = "+map -scale 25% +set comment"
-
-    # Use portable_magick binaries for conversion
-    if os.path.basename(magick_path) == 'magick':
-        cmd = [magick_path, 'convert', '-density', '288', '-delay']
-    else:
-        cmd = [magick_path, '-density', '288', '-delay']
-    cmd += fca_frame_cmd.split() + opt_cmd1.split() + (opt_cmd.split() if opt_cmd else []) + opt_cmd2.split()
-    cmd += [pdf_path, gif_path]
-
-    # Run the command with portable environment
-    convert_result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
-    print("Convert STDOUT:", convert_result.stdout.decode())
-    print("Convert STDERR:", convert_result.stderr.decode())
-    print("ImageMagick Command:", cmd)
-    if convert_result.returncode != 0:
-        print("ERROR: ImageMagick convert failed!")
-        if not os.path.exists(gif_path):
-            print(f"ERROR: Expected GIF not created at {gif_path}")
-            return 0  # or handle error appropriately
-
-    # Optional gifsicle pass is disabled to keep only portable ImageMagick usage
-
-    # Get the exact size of the GIF in bytes, with existence check
-    if not os.path.exists(gif_path):
-        print(f"ERROR: Final GIF not found at {gif_path}")
-        return 0
-    gif_size_bytes = os.path.getsize(gif_path)
-
-    # Convert to KB with two decimal places
-    gif_size_kb = gif_size_bytes / 1024
-
-    # Return details
-    return pdf_name, gif_path, f"{gif_size_bytes} Bytes ({gif_size_kb:.2f} KB)"
-
+        self.batch_summary.emit(summary)
 
-#######################################################################################################
-
-
-class ConversionThread(QThread):
-    progress = pyqtSignal(str, int, int)  # Signal to update progress: pdf name, current, total count
-    gif_created = pyqtSignal(str, str)  # Signal to notify GIF creation: gif name, size
-
-    def __init__(self, pdf_list, output_dir, fca_value, frame_value, opt_value, convert_path, custom_fca_frame_cmd=None):
-        super().__init__()
-        self.pdf_list = pdf_list
-        self.output_dir = output_dir
-        self.fca_value = fca_value
-        self.frame_value = frame_value
-        self.opt_value = opt_value
-        self.convert_path = convert_path  # Use user-defined path
-        self.custom_fca_frame_cmd = custom_fca_frame_cmd
-
-    def run(self):
-        total_files = len(self.pdf_list)
-
-        # Use ThreadPoolExecutor to limit concurrency to 3
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            # Submit each PDF conversion task
-            futures = [
-                executor.submit(
-                    convert_pdf_to_gif,
-                    pdf_path,
-                    self.output_dir,
-                    self.fca_value,
-                    self.frame_value,
-                    self.opt_value,
-                    MAGICK_BIN,
-                    custom_fca_frame_cmd=self.custom_fca_frame_cmd
-                )
-                for pdf_path in self.pdf_list
-            ]
-
-            # Process each completed future as it finishes
-            for idx, future in enumerate(as_completed(futures)):
+    def on_result(self, index, total, job, result, error):
+        src_path_orig, page = job
+        if isinstance(error, BatchCancelled):
+            return
+        if error is not None:
+            label = src_path_orig if page is None else f"{src_path_orig} (page {page + 1})"
+            print(f"Error converting {label}: {error}")
+            return
+        out_path, size_str = result
+        if page is not None:
+            # Page jobs write exactly one deterministic base-<page>.ext file
+            self.progress.emit(os.path.basename(out_path), index + 1, total)
+            self.converted_created.emit(out_path, size_str)
+            return
+        self.emit_outputs(src_path_orig, out_path, size_str, index + 1, total)
+
+    def emit_outputs(self, src_path_orig, out_path, size_str, completed_index, total):
+        """Report a whole-file conversion; ImageMagick may still have split it into pages when
+        the page count couldn't be determined up front."""
+        # If ImageMagick produced multi-page outputs (e.g., name-0.jpg, name-1.jpg),
+        # the returned out_path may be a single page (e.g., base-0.jpg). In that case,
+        # glob using the stem without the trailing -<n> to capture both pages, but ONLY
+        # when the original source was not already a numbered page file.
+        emitted_any = False
+        base, ext = os.path.splitext(out_path)
+        import glob, re
+        base_dir = os.path.dirname(base)
+        base_name = os.path.basename(base)
+        m = re.match(r"^(.*)-(\d+)$", base_name)
+        src_is_numbered = re.match(r"^(.*)-(\d+)\.[^.]+$", os.path.basename(src_path_orig)) is not None
+        if m and not src_is_numbered:
+            base_for_glob = os.path.join(base_dir, m.group(1))
+        else:
+            base_for_glob = base
+        # Gather candidates like base-<n>.ext
+        pattern = f"{base_for_glob}-*.{ext.lstrip('.')}"
+        candidates = sorted(glob.glob(pattern))
+        if candidates:
+            # Sort pages numerically
+            def page_index(p):
+                b = os.path.splitext(os.path.basename(p))[0]
+                try:
+                    return int(b.split('-')[-1])
+                except Exception:
+                    return 0
+            candidates.sort(key=page_index)
+            for p in candidates:
                 try:
-                    pdf_name, gif_path, gif_size = future.result()
-                    # Emit progress and completion signals
-                    self.progress.emit(pdf_name, idx + 1, total_files)
-                    self.gif_created.emit(gif_path, gif_size)
-                except Exception as e:
-                    print(f"Error processing {self.pdf_list[idx]}: {e}")
+                    sz = os.path.getsize(p)
+                    name = os.path.basename(p)
+                    self.progress.emit(name, completed_index, total)
+                    self.converted_created.emit(p, f"{sz} Bytes ({sz/1024:.2f} KB)")
+                    emitted_any = True
+                except Exception:
+                    continue
+        if not emitted_any:
+            # Single output
+            name = os.path.basename(out_path)
+            self.progress.emit(name, completed_index, total)
+            self.converted_created.emit(out_path, size_str)
+
 
 #######################################################################################################
 
@@ -697,6 +264,7 @@ class GifWindow(QWidget):
 class PDFToGIFOptimizer(QMainWindow):
     def __init__(self):
         super().__init__()
+        init_database(path_db)
 
         # Menus with macOS menu roles so items appear in the standard locations
         menubar = self.menuBar()
@@ -872,6 +440,12 @@ class PDFToGIFOptimizer(QMainWindow):
         self.process_button.clicked.connect(self.process_files)
         controls_layout.addWidget(self.process_button, row, 9)
 
+        # Stops a running batch; only enabled while processing
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        controls_layout.addWidget(self.cancel_button, row, 10)
+
         image_layout.addLayout(controls_layout)
         image_tab.setLayout(image_layout)
         self.tabs.addTab(image_tab, "Image")
@@ -898,6 +472,52 @@ class PDFToGIFOptimizer(QMainWindow):
             self.custom_timeout_sec = int(self.default_settings.get('timeout_sec', 25))
         except Exception:
             self.custom_timeout_sec = 25
+        # Hard limit per magick process (kills hung Ghostscript renders); 0 = no limit
+        try:
+            self.process_timeout_sec = max(0, int(self.default_settings.get('process_timeout_sec', 300)))
+        except Exception:
+            self.process_timeout_sec = 300
+        # Target-mode search strategy persisted (see SEARCH_STRATEGIES)
+        self.search_strategy = self.default_settings.get('search', 'speculative')
+        if self.search_strategy not in SEARCH_STRATEGIES:
+            self.search_strategy = 'speculative'
+        self.persistent_workers = self.default_settings.get('persistent_workers') in ('1', 'true', 'True')
+        self.jpeg_extent = self.default_settings.get('jpeg_extent', '1') in ('1', 'true', 'True')
+        self.fast_probes = self.default_settings.get('fast_probes', '1') in ('1', 'true', 'True')
+        self.shared_palette = self.default_settings.get('shared_palette', '1') in ('1', 'true', 'True')
+        # Probe encoder for raster sources (see BACKENDS); PDFs are always encoded with ImageMagick
+        self.backend = self.default_settings.get('backend', 'magick')
+        if self.backend not in BACKENDS:
+            self.backend = 'magick'
+        # PDF renderer (see PDF_BACKENDS): ImageMagick's delegate or Ghostscript called directly
+        self.pdf_backend = self.default_settings.get('pdf_backend', 'magick')
+        if self.pdf_backend not in PDF_BACKENDS:
+            self.pdf_backend = 'magick'
+        self.result_cache = self.default_settings.get('result_cache', '1') in ('1', 'true', 'True')
+        # Adaptive workers: the Workers spinbox becomes the upper bound
+        self.adaptive_workers = self.default_settings.get('adaptive_workers') in ('1', 'true', 'True')
+        try:
+            self.min_workers = max(1, int(self.default_settings.get('min_workers', 1)))
+        except Exception:
+            self.min_workers = 1
+        # Memory jobs may reserve at once, in MB; 0 = automatic (share of available RAM)
+        try:
+            self.memory_budget_mb = max(0, int(self.default_settings.get('memory_budget_mb', 0)))
+        except Exception:
+            self.memory_budget_mb = 0
+        # Start the most expensive jobs first (results are still listed in order)
+        self.largest_first = self.default_settings.get('largest_first', '1') in ('1', 'true', 'True')
+        # Threads per magick process (see THREAD_MODES)
+        self.thread_mode = self.default_settings.get('thread_mode', 'off')
+        if self.thread_mode not in THREAD_MODES:
+            self.thread_mode = 'off'
+        # Rasterize PDFs on their own workers ahead of the target-size search
+        self.pipeline = self.default_settings.get('pipeline') in ('1', 'true', 'True')
+        try:
+            self.raster_workers = max(1, int(self.default_settings.get('raster_workers', 2)))
+        except Exception:
+            self.raster_workers = 2
+        self.last_batch_summary = None
 
     def set_controls_enabled(self, enabled: bool):
         # Top bar controls
@@ -912,6 +532,7 @@ class PDFToGIFOptimizer(QMainWindow):
         self.tolerance_combo.setEnabled(enabled)
         self.trim_checkbox.setEnabled(enabled)
         self.process_button.setEnabled(enabled)
+        self.cancel_button.setEnabled(not enabled)
 
     def eventFilter(self, obj, event):
         # Allow Delete/Backspace to remove selected items from the list
@@ -1014,11 +635,39 @@ class PDFToGIFOptimizer(QMainWindow):
         self.progress_bar.reset()
         if self.file_list_widget.count() == 0:
             self.label.setText("Select Folder with PDF/JPG/PNG/GIF:")
+        elif (self.last_batch_summary or {}).get('cancelled'):
+            self.label.setText("Processing cancelled. Converted files are kept.")
         else:
-            self.label.setText("Processing complete! You can clear list.")
+            self.label.setText("Processing complete! You can clear list." + self.scheduler_note())
         # Auto-sort list by filename after processing
         self.auto_sort_list()
 
+    def cancel_processing(self):
+        if self.processing and getattr(self, 'generic_thread', None) is not None:
+            self.generic_thread.cancel()
+            self.cancel_button.setEnabled(False)
+            self.label.setText("Cancelling...")
+
+    def on_batch_summary(self, summary):
+        self.last_batch_summary = summary
+        sched = summary.get('scheduler')
+        if sched:
+            for d in sched['decisions']:
+                print(f"Workers {d['from']} -> {d['to']} at {d['t']}s: {d['reason']}")
+        mem = summary.get('memory')
+        if mem and mem['waited_jobs']:
+            print(f"Memory budget {mem['budget'] // (1024 * 1024)} MB: {mem['waited_jobs']} jobs waited for memory, "
+                  f"peak reserved {mem['peak_reserved'] // (1024 * 1024)} MB")
+
+    def scheduler_note(self):
+        """Short description of what the adaptive scheduler did in the last batch, or ''."""
+        sched = (self.last_batch_summary or {}).get('scheduler')
+        if not sched:
+            return ""
+        start = sched['decisions'][0]['from'] if sched['decisions'] else sched['final_workers']
+        return (f" Workers {start}\u2192{sched['final_workers']} "
+                f"({len(sched['decisions'])} adjustments, peak {sched['peak_running']}).")
+
 #######################################################################################################
 
     def load_paths_from_db(self):
@@ -1049,7 +698,7 @@ class PDFToGIFOptimizer(QMainWindow):
         return out
 
     def open_settings(self):
-        """Open a minimal settings dialog to adjust defaults for Output, Res, Tol%, Workers, Timeout."""
+        """Open a minimal settings dialog to adjust defaults for Output, Res, Tol%, Workers, Timeout, Search."""
         dlg = QDialog(self)
         dlg.setWindowTitle("Settings")
         v = QVBoxLayout(dlg)
@@ -1109,6 +758,62 @@ class PDFToGIFOptimizer(QMainWindow):
         workers_row.addWidget(workers_spin)
         v.addLayout(workers_row)
 
+        # Adaptive workers: vary between Min workers and Workers with CPU load and free memory
+        adaptive_row = QHBoxLayout()
+        adaptive_checkbox = QCheckBox("Adaptive workers")
+        adaptive_checkbox.setChecked(self.adaptive_workers)
+        adaptive_row.addWidget(adaptive_checkbox)
+        adaptive_row.addWidget(QLabel("Min workers:"))
+        min_workers_spin = QSpinBox()
+        min_workers_spin.setRange(1, 16)
+        min_workers_spin.setValue(self.min_workers)
+        adaptive_row.addWidget(min_workers_spin)
+        v.addLayout(adaptive_row)
+
+        # Memory budget for admitting large PDF rasterizations
+        memory_row = QHBoxLayout()
+        memory_row.addWidget(QLabel("Memory budget (MB):"))
+        memory_spin = QSpinBox()
+        memory_spin.setRange(0, 1024 * 1024)
+        memory_spin.setSingleStep(512)
+        memory_spin.setSpecialValueText("Auto")
+        memory_spin.setValue(self.memory_budget_mb)
+        memory_row.addWidget(memory_spin)
+        v.addLayout(memory_row)
+
+        # Longest-job-first dispatch
+        lpt_row = QHBoxLayout()
+        lpt_checkbox = QCheckBox("Start largest files first")
+        lpt_checkbox.setChecked(self.largest_first)
+        lpt_row.addWidget(lpt_checkbox)
+        v.addLayout(lpt_row)
+
+        # Thread budget per magick process
+        thread_labels = {
+            'multi': "Split cores between workers",
+            'single': "Single-threaded jobs",
+            'off': "ImageMagick default",
+        }
+        threads_row = QHBoxLayout()
+        threads_row.addWidget(QLabel("Threads per job:"))
+        threads_combo = QComboBox()
+        threads_combo.addItems([thread_labels[m] for m in THREAD_MODES])
+        threads_combo.setCurrentText(thread_labels[self.thread_mode])
+        threads_row.addWidget(threads_combo)
+        v.addLayout(threads_row)
+
+        # Pipelined PDF rasterizing with its own worker count
+        pipeline_row = QHBoxLayout()
+        pipeline_checkbox = QCheckBox("Rasterize PDFs ahead")
+        pipeline_checkbox.setChecked(self.pipeline)
+        pipeline_row.addWidget(pipeline_checkbox)
+        pipeline_row.addWidget(QLabel("Raster workers:"))
+        raster_workers_spin = QSpinBox()
+        raster_workers_spin.setRange(1, 16)
+        raster_workers_spin.setValue(self.raster_workers)
+        pipeline_row.addWidget(raster_workers_spin)
+        v.addLayout(pipeline_row)
+
         # Timeout seconds
         timeout_row = QHBoxLayout()
         timeout_row.addWidget(QLabel("Timeout (sec):"))
@@ -1118,6 +823,80 @@ class PDFToGIFOptimizer(QMainWindow):
         timeout_row.addWidget(timeout_spin)
         v.addLayout(timeout_row)
 
+        # Process timeout seconds (hard kill)
+        process_timeout_row = QHBoxLayout()
+        process_timeout_row.addWidget(QLabel("Process timeout (sec):"))
+        process_timeout_spin = QSpinBox()
+        process_timeout_spin.setRange(0, 3600)
+        process_timeout_spin.setSpecialValueText("No limit")
+        process_timeout_spin.setValue(self.process_timeout_sec)
+        process_timeout_row.addWidget(process_timeout_spin)
+        v.addLayout(process_timeout_row)
+
+        # Target-mode search strategy
+        search_row = QHBoxLayout()
+        search_row.addWidget(QLabel("Search:"))
+        search_combo = QComboBox()
+        search_combo.addItems(["Speculative", "Interpolate", "Bisect"])
+        search_combo.setCurrentText(self.search_strategy.capitalize())
+        search_row.addWidget(search_combo)
+        v.addLayout(search_row)
+
+        # Persistent magick worker processes
+        pool_row = QHBoxLayout()
+        pool_checkbox = QCheckBox("Persistent magick workers")
+        pool_checkbox.setChecked(self.persistent_workers)
+        pool_row.addWidget(pool_checkbox)
+        v.addLayout(pool_row)
+
+        # JPG fast mode: single encode with jpeg:extent before searching
+        extent_row = QHBoxLayout()
+        extent_checkbox = QCheckBox("JPG fast mode (jpeg:extent)")
+        extent_checkbox.setChecked(self.jpeg_extent)
+        extent_row.addWidget(extent_checkbox)
+        v.addLayout(extent_row)
+
+        # PNG fast probes: cheap compression while searching, one full encode at the end
+        fast_row = QHBoxLayout()
+        fast_checkbox = QCheckBox("PNG fast probes")
+        fast_checkbox.setChecked(self.fast_probes)
+        fast_row.addWidget(fast_checkbox)
+        v.addLayout(fast_row)
+
+        # Shared palettes: quantize once per source, remap every palette-size probe
+        palette_row = QHBoxLayout()
+        palette_checkbox = QCheckBox("Shared palettes (PNG/GIF)")
+        palette_checkbox.setChecked(self.shared_palette)
+        palette_row.addWidget(palette_checkbox)
+        v.addLayout(palette_row)
+
+        # Encoder for JPG/PNG/GIF probes: a magick process each, or Pillow in-process
+        backend_labels = {'magick': "ImageMagick", 'pillow': "Pillow (in-process)"}
+        backend_row = QHBoxLayout()
+        backend_row.addWidget(QLabel("Image encoder:"))
+        backend_combo = QComboBox()
+        backend_combo.addItems([backend_labels[b] for b in BACKENDS])
+        backend_combo.setCurrentText(backend_labels[self.backend])
+        backend_row.addWidget(backend_combo)
+        v.addLayout(backend_row)
+
+        # PDF renderer: Ghostscript through ImageMagick, or called directly with several threads
+        pdf_backend_labels = {'magick': "ImageMagick", 'gs': "Ghostscript (direct)"}
+        pdf_backend_row = QHBoxLayout()
+        pdf_backend_row.addWidget(QLabel("PDF renderer:"))
+        pdf_backend_combo = QComboBox()
+        pdf_backend_combo.addItems([pdf_backend_labels[b] for b in PDF_BACKENDS])
+        pdf_backend_combo.setCurrentText(pdf_backend_labels[self.pdf_backend])
+        pdf_backend_row.addWidget(pdf_backend_combo)
+        v.addLayout(pdf_backend_row)
+
+        # Reuse earlier results for unchanged files and settings
+        cache_row = QHBoxLayout()
+        cache_checkbox = QCheckBox("Reuse cached results")
+        cache_checkbox.setChecked(self.result_cache)
+        cache_row.addWidget(cache_checkbox)
+        v.addLayout(cache_row)
+
         # Buttons
         btn_row = QHBoxLayout()
         ok_btn = QPushButton("OK")
@@ -1138,6 +917,22 @@ class PDFToGIFOptimizer(QMainWindow):
             self.workers_spin.setValue(workers_spin.value())
             # Save timeout on instance for next GenericConversionThread
             self.custom_timeout_sec = timeout_spin.value()
+            self.process_timeout_sec = process_timeout_spin.value()
+            self.search_strategy = search_combo.currentText().lower()
+            self.persistent_workers = pool_checkbox.isChecked()
+            self.jpeg_extent = extent_checkbox.isChecked()
+            self.fast_probes = fast_checkbox.isChecked()
+            self.shared_palette = palette_checkbox.isChecked()
+            self.backend = BACKENDS[backend_combo.currentIndex()]
+            self.pdf_backend = PDF_BACKENDS[pdf_backend_combo.currentIndex()]
+            self.result_cache = cache_checkbox.isChecked()
+            self.adaptive_workers = adaptive_checkbox.isChecked()
+            self.min_workers = min_workers_spin.value()
+            self.memory_budget_mb = memory_spin.value()
+            self.largest_first = lpt_checkbox.isChecked()
+            self.thread_mode = THREAD_MODES[threads_combo.currentIndex()]
+            self.pipeline = pipeline_checkbox.isChecked()
+            self.raster_workers = raster_workers_spin.value()
             # Persist to DB
             self.save_setting('output', out_combo.currentText())
             self.save_setting('res', res_combo.currentText())
@@ -1146,6 +941,22 @@ class PDFToGIFOptimizer(QMainWindow):
             self.save_setting('trim_pdfs', '1' if trim_checkbox.isChecked() else '0')
             self.save_setting('workers', str(workers_spin.value()))
             self.save_setting('timeout_sec', str(self.custom_timeout_sec))
+            self.save_setting('process_timeout_sec', str(self.process_timeout_sec))
+            self.save_setting('search', self.search_strategy)
+            self.save_setting('persistent_workers', '1' if self.persistent_workers else '0')
+            self.save_setting('jpeg_extent', '1' if self.jpeg_extent else '0')
+            self.save_setting('fast_probes', '1' if self.fast_probes else '0')
+            self.save_setting('shared_palette', '1' if self.shared_palette else '0')
+            self.save_setting('backend', self.backend)
+            self.save_setting('pdf_backend', self.pdf_backend)
+            self.save_setting('result_cache', '1' if self.result_cache else '0')
+            self.save_setting('adaptive_workers', '1' if self.adaptive_workers else '0')
+            self.save_setting('min_workers', str(self.min_workers))
+            self.save_setting('memory_budget_mb', str(self.memory_budget_mb))
+            self.save_setting('largest_first', '1' if self.largest_first else '0')
+            self.save_setting('thread_mode', self.thread_mode)
+            self.save_setting('pipeline', '1' if self.pipeline else '0')
+            self.save_setting('raster_workers', str(self.raster_workers))
             dlg.accept()
 
         ok_btn.clicked.connect(apply_and_close)
@@ -1161,12 +972,29 @@ class PDFToGIFOptimizer(QMainWindow):
                 cores = 5
             default_workers = min(5, cores)
             default_timeout = 25
+            default_search = "speculative"
             # Apply to dialog widgets
             out_combo.setCurrentText(default_output)
             res_combo.setCurrentText(default_res)
             tol_combo.setCurrentText(default_tol)
             workers_spin.setValue(default_workers)
             timeout_spin.setValue(default_timeout)
+            process_timeout_spin.setValue(300)
+            search_combo.setCurrentText(default_search.capitalize())
+            pool_checkbox.setChecked(False)
+            extent_checkbox.setChecked(True)
+            fast_checkbox.setChecked(True)
+            palette_checkbox.setChecked(True)
+            backend_combo.setCurrentText(backend_labels['magick'])
+            pdf_backend_combo.setCurrentText(pdf_backend_labels['magick'])
+            cache_checkbox.setChecked(True)
+            adaptive_checkbox.setChecked(False)
+            min_workers_spin.setValue(1)
+            memory_spin.setValue(0)
+            lpt_checkbox.setChecked(True)
+            threads_combo.setCurrentText(thread_labels['off'])
+            pipeline_checkbox.setChecked(False)
+            raster_workers_spin.setValue(2)
             target_edit.setText("")
             trim_checkbox.setChecked(False)
             # Also apply to main UI immediately
@@ -1175,6 +1003,22 @@ class PDFToGIFOptimizer(QMainWindow):
             self.tolerance_combo.setCurrentText(default_tol)
             self.workers_spin.setValue(default_workers)
             self.custom_timeout_sec = default_timeout
+            self.process_timeout_sec = 300
+            self.search_strategy = default_search
+            self.persistent_workers = False
+            self.jpeg_extent = True
+            self.fast_probes = True
+            self.shared_palette = True
+            self.backend = 'magick'
+            self.pdf_backend = 'magick'
+            self.result_cache = True
+            self.adaptive_workers = False
+            self.min_workers = 1
+            self.memory_budget_mb = 0
+            self.largest_first = True
+            self.thread_mode = 'off'
+            self.pipeline = False
+            self.raster_workers = 2
             self.target_bytes_input.setText("")
             self.trim_checkbox.setChecked(False)
             # Persist to DB
@@ -1183,6 +1027,22 @@ class PDFToGIFOptimizer(QMainWindow):
             self.save_setting('tol', default_tol)
             self.save_setting('workers', str(default_workers))
             self.save_setting('timeout_sec', str(default_timeout))
+            self.save_setting('process_timeout_sec', '300')
+            self.save_setting('search', default_search)
+            self.save_setting('persistent_workers', '0')
+            self.save_setting('jpeg_extent', '1')
+            self.save_setting('fast_probes', '1')
+            self.save_setting('shared_palette', '1')
+            self.save_setting('backend', 'magick')
+            self.save_setting('pdf_backend', 'magick')
+            self.save_setting('result_cache', '1')
+            self.save_setting('adaptive_workers', '0')
+            self.save_setting('min_workers', '1')
+            self.save_setting('memory_budget_mb', '0')
+            self.save_setting('largest_first', '1')
+            self.save_setting('thread_mode', 'off')
+            self.save_setting('pipeline', '0')
+            self.save_setting('raster_workers', '2')
             self.save_setting('default_target_kb', "")
             self.save_setting('trim_pdfs', '0')
 
@@ -1261,10 +1121,13 @@ class PDFToGIFOptimizer(QMainWindow):
         # Always derive the processing list from the visible UI list to avoid re-adding removed entries
         current_paths = self._current_list_paths()
         self.file_paths = current_paths[:]  # keep internal state in sync
-        files = [f for f in current_paths if f.lower().endswith(('.pdf', '.gif', '.jpg', '.jpeg', '.png'))]
+        files = [f for f in current_paths if f.lower().endswith(SUPPORTED_INPUTS)]
         if not files:
             QMessageBox.warning(self, "No Files Found", "Please add PDF/JPG/PNG/GIF files to convert.")
             return
+        if not MAGICK_BIN:
+            QMessageBox.critical(self, "ImageMagick Not Found", "No usable ImageMagick binary ('magick' or 'convert') found in portable_magick/bin or on PATH.")
+            return
 
         # Always process all files; concurrency handled inside the worker thread (5 parallel tasks)
 
@@ -1283,13 +1146,7 @@ class PDFToGIFOptimizer(QMainWindow):
         trim_pdfs = self.trim_checkbox.isChecked()
 
         # Map resolution preset to default PDF density for default mode
-        res_choice = self.res_combo.currentText()
-        if res_choice == "High":
-            default_density = 288
-        elif res_choice == "Medium":
-            default_density = 216
-        else:
-            default_density = 144
+        default_density = RES_PRESETS.get(self.res_combo.currentText(), 144)
 
         # No custom GIF timing; removed controls
         fca_value = None
@@ -1307,9 +1164,27 @@ class PDFToGIFOptimizer(QMainWindow):
             trim_pdfs, fca_value, frame_value, opt_value, custom_fca_frame_cmd,
             workers=self.workers_spin.value(),
             default_density=default_density,
-            timeout_sec=getattr(self, 'custom_timeout_sec', 25)
+            timeout_sec=getattr(self, 'custom_timeout_sec', 25),
+            search=self.search_strategy,
+            persistent_workers=self.persistent_workers,
+            jpeg_extent=self.jpeg_extent,
+            fast_probes=self.fast_probes,
+            shared_palette=self.shared_palette,
+            backend=self.backend,
+            pdf_backend=self.pdf_backend,
+            result_cache=self.result_cache,
+            adaptive_workers=self.adaptive_workers,
+            min_workers=self.min_workers,
+            memory_budget_mb=self.memory_budget_mb,
+            largest_first=self.largest_first,
+            thread_mode=self.thread_mode,
+            process_timeout=self.process_timeout_sec,
+            pipeline=self.pipeline,
+            raster_workers=self.raster_workers
         )
+        self.last_batch_summary = None
         self.generic_thread.progress.connect(self.update_progress)
+        self.generic_thread.batch_summary.connect(self.on_batch_summary)
         self.generic_thread.converted_created.connect(self.update_file_list)
         self.generic_thread.finished.connect(self.on_processing_finished)
         self.generic_thread.start()
@@ -1391,6 +1266,9 @@ class PDFToGIFOptimizer(QMainWindow):
     # Removed gifsicle-based optimization methods
 
     def update_progress(self, file_name, current, total):
+        # Multi-page PDFs are counted per page, so the total can exceed the number of files
+        if self.progress_bar.maximum() != total:
+            self.progress_bar.setMaximum(total)
         self.progress_bar.setValue(current)
         self.label.setText(f"Processing: {file_name} ({current}/{total})")
 
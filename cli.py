@@ -0,0 +1,170 @@
+"""
+Command-line Converter
+Runs the Image tab's conversion engine without a display, e.g. for overnight batches on a
+Linux box. Results are streamed to stdout as JSON lines, one per output file, followed by a
+summary line; diagnostics go to stderr.
+
+Usage:
+    python cli.py FOLDER_OR_FILE [...] --format jpg --target-kb 200 --tolerance 10
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import contextlib
+
+import engine
+
+
+def collect_files(paths, recursive=False):
+    """Expand folders into the supported files they contain (sorted), keeping files as given."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                found = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+            else:
+                found = [os.path.join(path, name) for name in os.listdir(path)]
+            files.extend(sorted(f for f in found if os.path.isfile(f) and f.lower().endswith(engine.SUPPORTED_INPUTS)))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"Skipping {path}: not found", file=sys.stderr)
+    return files
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert PDF/JPG/PNG/GIF files with ImageMagick, optionally to a target size.")
+    parser.add_argument('paths', nargs='+', help="files and/or folders to convert")
+    parser.add_argument('--format', default='jpg', choices=['jpg', 'png', 'gif'], help="output format (default: jpg)")
+    parser.add_argument('--target-kb', type=int, default=None, help="target size in KB; omit for the default single pass")
+    parser.add_argument('--tolerance', type=int, default=10, help="allowed deviation from the target in %% (default: 10)")
+    parser.add_argument('--res', default='High', choices=list(engine.RES_PRESETS), help="PDF resolution preset (default: High)")
+    parser.add_argument('--trim', action='store_true', help="trim PDFs to their TrimBox and uniform margins")
+    parser.add_argument('--workers', type=int, default=min(5, os.cpu_count() or 5), help="parallel conversions (upper bound with --adaptive)")
+    parser.add_argument('--adaptive', action='store_true', help="vary parallelism with CPU load and free memory")
+    parser.add_argument('--min-workers', type=int, default=1, help="lower bound for --adaptive (default: 1)")
+    parser.add_argument('--timeout', type=int, default=25, help="seconds per file before the timed fallback (default: 25)")
+    parser.add_argument('--process-timeout', type=int, default=300,
+                        help="seconds before a single magick process is killed; 0 = no limit (default: 300)")
+    parser.add_argument('--search', default='speculative', choices=sorted(engine.SEARCH_STRATEGIES), help="target-mode search strategy")
+    parser.add_argument('--out-dir', default=None, help="write outputs here instead of next to the originals")
+    parser.add_argument('--recursive', action='store_true', help="also convert files in subfolders")
+    parser.add_argument('--memory-budget-mb', type=int, default=None, help="memory jobs may reserve at once (default: 75%% of available)")
+    parser.add_argument('--no-memory-admission', action='store_true', help="start jobs without checking their estimated raster memory")
+    parser.add_argument('--list-order', action='store_true', help="start jobs in list order instead of largest first")
+    parser.add_argument('--threads', default='off', choices=list(engine.THREAD_MODES),
+                        help="threads per magick process: split the cores between workers (multi), 1 each (single) or ImageMagick's default (off, the default)")
+    parser.add_argument('--persistent-workers', action='store_true', help="reuse long-lived magick processes")
+    parser.add_argument('--pipeline', action='store_true', help="rasterize PDFs on separate workers ahead of the target-size search")
+    parser.add_argument('--raster-workers', type=int, default=2, help="rasterizing workers with --pipeline (default: 2)")
+    parser.add_argument('--raster-queue', type=int, default=None,
+                        help="PDF pages rasterized ahead of the search with --pipeline (default: 2 x raster workers)")
+    parser.add_argument('--no-event-loop', action='store_true', help="run magick processes from plain worker threads instead of one asyncio event loop")
+    parser.add_argument('--no-fast-probes', action='store_true', help="encode every PNG probe at full compression")
+    parser.add_argument('--no-shared-palette', action='store_true', help="quantize every PNG/GIF probe from scratch with -colors")
+    parser.add_argument('--backend', default='magick', choices=list(engine.BACKENDS),
+                        help="probe encoder for JPG/PNG/GIF sources: one magick process per probe or in-process Pillow (default: magick)")
+    parser.add_argument('--pdf-backend', default='magick', choices=list(engine.PDF_BACKENDS),
+                        help=f"PDF renderer: ImageMagick's Ghostscript delegate or Ghostscript directly, multi-threaded (gs; binary from ${engine.GS_ENV} or PATH)")
+    parser.add_argument('--no-jpeg-extent', action='store_true', help="disable the JPG jpeg:extent fast path")
+    parser.add_argument('--no-cache', action='store_true', help="don't reuse or record cached results")
+    parser.add_argument('--magick', default=None, help="ImageMagick binary to use instead of the bundled one")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = sys.stdout
+    magick_bin = args.magick or engine.get_magick_bin()
+    if not magick_bin:
+        print("No usable ImageMagick binary ('magick' or 'convert') found; pass --magick.", file=sys.stderr)
+        return 2
+    files = collect_files(args.paths, recursive=args.recursive)
+    if not files:
+        print("No PDF/JPG/PNG/GIF files to convert.", file=sys.stderr)
+        return 1
+    if args.backend == 'pillow' and not engine.PIL_AVAILABLE:
+        print("Pillow is not installed; probes are encoded with ImageMagick.", file=sys.stderr)
+    if args.pdf_backend == 'gs' and not engine.get_gs_bin():
+        print(f"No Ghostscript binary found (set {engine.GS_ENV}); PDFs are rendered by ImageMagick.", file=sys.stderr)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    cache = curves = None
+    if not args.no_cache:
+        engine.init_database(engine.path_db)
+        cache = engine.ResultCache(engine.path_db, os.path.join(engine.config_dir, 'result_cache'))
+        curves = engine.RateCurveStore(engine.path_db)
+
+    start = time.time()
+    counts = {'ok': 0, 'failed': 0}
+    # Ctrl-C cancels the batch: running magick processes are killed, pending jobs are skipped
+    cancel_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: cancel_event.set())
+
+    def on_result(index, total, job, result, error):
+        src_path, page = job
+        line = {'event': 'result', 'index': index, 'total': total, 'src': src_path, 'page': page}
+        if isinstance(error, engine.BatchCancelled):
+            counts['failed'] += 1
+            line.update(ok=False, error='cancelled')
+        elif error is not None:
+            counts['failed'] += 1
+            line.update(ok=False, error=str(error))
+        else:
+            counts['ok'] += 1
+            out_path, size_str = result
+            line.update(ok=True, out=out_path, bytes=os.path.getsize(out_path), detail=size_str)
+        line['elapsed'] = round(time.time() - start, 3)
+        out.write(json.dumps(line) + '\n')
+        out.flush()
+
+    # Anything the engine prints is diagnostics, not results
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = engine.convert_batch(
+            files, args.out_dir, args.format,
+            args.target_kb * 1024 if args.target_kb is not None else None,
+            args.tolerance, args.trim, None, on_result,
+            workers=args.workers,
+            default_density=engine.RES_PRESETS[args.res],
+            timeout_sec=args.timeout,
+            magick_bin=magick_bin,
+            search=args.search,
+            persistent_workers=args.persistent_workers,
+            jpeg_extent=not args.no_jpeg_extent,
+            fast_probes=not args.no_fast_probes,
+            shared_palette=not args.no_shared_palette,
+            backend=args.backend,
+            pdf_backend=args.pdf_backend,
+            cache=cache,
+            curves=curves,
+            adaptive=args.adaptive,
+            min_workers=args.min_workers,
+            memory_budget=args.memory_budget_mb * 1024 * 1024 if args.memory_budget_mb else None,
+            memory_admission=not args.no_memory_admission,
+            lpt=not args.list_order,
+            thread_mode=args.threads,
+            process_timeout=args.process_timeout or None,
+            cancel_event=cancel_event,
+            event_loop=not args.no_event_loop,
+            pipeline=args.pipeline,
+            raster_workers=args.raster_workers,
+            raster_queue=args.raster_queue,
+        )
+    out.write(json.dumps({
+        'event': 'summary', 'files': len(files), 'jobs': summary['jobs'],
+        'ok': counts['ok'], 'failed': counts['failed'], 'elapsed': round(time.time() - start, 3),
+        'scheduler': summary['scheduler'], 'memory': summary['memory'], 'threads_per_job': summary['threads_per_job'],
+        'cancelled': summary['cancelled'], 'processes': summary['processes'],
+        'pipeline': summary['pipeline'],
+    }) + '\n')
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
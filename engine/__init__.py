@@ -0,0 +1,39 @@
+"""
+Conversion Engine
+ImageMagick-based conversion used by the Image tab and the command-line converter. Depends only
+on the standard library (Pillow is used when installed), so scripts can import it without PyQt5
+or pandas; ImageMagick itself is located on first use.
+"""
+
+from .magick import (
+    MAGICK_DIR, THREAD_MODES, MagickTimeout, BatchCancelled, get_magick_bin, portable_env, threads_per_job,
+    set_magick_threads, set_async_runner, run_magick, magick_version, start_magick_pool, stop_magick_pool,
+    build_im_command, decode_source_once, pdf_trim_box, pdf_page_count,
+)
+from .search import (
+    SEARCH_STRATEGIES, SearchTimeout, within_tolerance, bisect_search, interpolation_search,
+    speculative_search, predict_resolution, predict_from_points,
+)
+from .convert import (
+    RES_PRESETS, SUPPORTED_INPUTS, ProbeSlots, jpeg_quality_estimate, output_path,
+    convert_with_target, convert_with_cache, cache_key, convert_pdf_to_gif,
+)
+from .backends import BACKENDS, PIL_AVAILABLE, PillowEncoder, open_encoder
+from .ghostscript import PDF_BACKENDS, GS_ENV, get_gs_bin, build_gs_command, rasterize_pdf, decode_pdf_once
+from .pipeline import RasterStage
+from .batch import plan_pages, estimate_jobs, longest_first, run_jobs, convert_batch
+from .scheduler import AdaptiveScheduler
+from .memory import (
+    MemoryBudget, pdf_page_box, image_dimensions, raster_pixels, estimate_job_memory, magick_limits,
+)
+from .result_cache import ResultCache, file_digest
+from .rate_curves import RateCurveStore
+from .database import config_dir, path_db, init_database
+
+
+def __getattr__(name):
+    # The asyncio core costs more to import than the rest of the engine; load it on first access
+    if name in ('AsyncRunner', 'run_magick_async'):
+        from . import aio
+        return getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
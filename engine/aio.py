@@ -0,0 +1,170 @@
+"""
+Asyncio Module
+An event-driven core for batches: every ImageMagick process runs as an asyncio subprocess on one
+event loop, bounded by a semaphore, and results stream out of an async generator in job order.
+Each job's search logic still runs on a worker thread, but the thread only waits on the loop, so
+speculative probes need no thread of their own and cancelling a task kills its process group.
+"""
+
+import asyncio
+import subprocess
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+from .magick import (
+    PROCESS_GROUP, MagickTimeout, BatchCancelled, kill_process_group, portable_env, set_async_runner,
+)
+
+
+async def run_magick_async(cmd, timeout=None):
+    """Run an ImageMagick argv as an asyncio subprocess; returns a subprocess.CompletedProcess.
+    On timeout (MagickTimeout) or task cancellation the whole process group is killed first.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=portable_env(), **PROCESS_GROUP
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        kill_process_group(proc)
+        await proc.wait()
+        raise MagickTimeout(f"ImageMagick killed after {timeout} s")
+    except asyncio.CancelledError:
+        kill_process_group(proc)
+        await proc.wait()
+        raise
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+class AsyncRunner:
+    """Runs a batch on one event loop with at most max_processes magick processes at a time.
+
+    stream() is the asyncio interface; run_jobs() drives it from synchronous code (the Qt
+    conversion thread and the CLI) with the same contract as batch.run_jobs. While a batch is
+    streaming, run_magick() in the job threads hands its commands to this runner (see
+    magick.set_async_runner), and submit() lets speculative probes start processes directly.
+    cancel_event: once set, all running processes are killed and jobs fail with BatchCancelled.
+    """
+
+    def __init__(self, max_processes, cancel_event=None):
+        self.max_processes = max(1, int(max_processes))
+        self.cancel_event = cancel_event
+        self.loop = None
+        self.semaphore = None
+        self.tasks = set()
+        self.running = 0
+        self.peak = 0
+        self.launched = 0
+
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    async def run_async(self, cmd, timeout=None):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            if self.cancelled():
+                raise BatchCancelled()
+            async with self.semaphore:
+                self.running += 1
+                self.launched += 1
+                self.peak = max(self.peak, self.running)
+                try:
+                    return await run_magick_async(cmd, timeout)
+                finally:
+                    self.running -= 1
+        except asyncio.CancelledError:
+            if self.cancelled():
+                raise BatchCancelled()
+            raise
+        finally:
+            self.tasks.discard(task)
+
+    def submit(self, cmd, timeout=None, finished=None):
+        """Start cmd on the loop from a job thread; returns a concurrent.futures.Future.
+        Cancelling the future kills the process, but the future reports cancelled straight away.
+        finished: optional callable, called on the loop once the command is really over (its
+        process group killed and reaped, or it never started).
+        """
+        future = Future()
+
+        def done(task):
+            if task.cancelled():
+                future.cancel()
+            else:
+                try:
+                    if task.exception() is not None:
+                        future.set_exception(task.exception())
+                    else:
+                        future.set_result(task.result())
+                except InvalidStateError:
+                    pass  # the caller cancelled it meanwhile
+            if finished is not None:
+                finished()
+
+        def start():
+            if future.cancelled():
+                # Cancelled before it reached the loop: no process to wait for
+                if finished is not None:
+                    finished()
+                return
+            task = self.loop.create_task(self.run_async(cmd, timeout))
+            task.add_done_callback(done)
+            future.add_done_callback(
+                lambda fut: self.loop.call_soon_threadsafe(task.cancel) if fut.cancelled() else None
+            )
+
+        self.loop.call_soon_threadsafe(start)
+        return future
+
+    def run(self, cmd, timeout=None):
+        """Blocking run_magick equivalent for job threads."""
+        return self.submit(cmd, timeout).result()
+
+    async def watch_cancel(self, interval=0.1):
+        while not self.cancelled():
+            await asyncio.sleep(interval)
+        for task in list(self.tasks):
+            task.cancel()
+
+    async def stream(self, jobs, convert, workers, order=None):
+        """Async generator running convert(src_path, page) for every job on `workers` threads.
+        Yields (index, job, result, error) in job order as soon as each prefix is complete.
+        order: job indices in the order they should start (default: job order).
+        """
+        self.loop = asyncio.get_running_loop()
+        self.semaphore = asyncio.Semaphore(self.max_processes)
+        executor = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+        watcher = self.loop.create_task(self.watch_cancel()) if self.cancel_event is not None else None
+        previous = set_async_runner(self)
+        try:
+            order = range(len(jobs)) if order is None else order
+            index_of = {self.loop.run_in_executor(executor, convert, *jobs[i]): i for i in order}
+            pending = set(index_of)
+            done = {}
+            next_index = 0
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in finished:
+                    error = fut.exception()
+                    done[index_of[fut]] = (None, error) if error is not None else (fut.result(), None)
+                while next_index in done:
+                    result, error = done.pop(next_index)
+                    yield next_index, jobs[next_index], result, error
+                    next_index += 1
+        finally:
+            set_async_runner(previous)
+            if watcher is not None:
+                watcher.cancel()
+            executor.shutdown(wait=False)
+
+    def run_jobs(self, jobs, convert, workers, on_result, order=None):
+        """Synchronous bridge: run the batch on a fresh event loop in the calling thread and call
+        on_result(index, job, result, error) in job order, like batch.run_jobs."""
+        async def drain():
+            async for index, job, result, error in self.stream(jobs, convert, workers, order=order):
+                on_result(index, job, result, error)
+
+        asyncio.run(drain())
+
+    def summary(self):
+        return {'max_processes': self.max_processes, 'peak_processes': self.peak, 'processes': self.launched}
@@ -0,0 +1,86 @@
+"""
+Backends Module
+Encoders behind convert_with_target's search. 'magick' builds ImageMagick command lines
+(build_im_command) and runs one process per probe; 'pillow' decodes a JPG/PNG/GIF source once
+in-process and encodes every probe into a BytesIO. Pillow is optional: without it, or for
+sources it can't reproduce (PDFs, animations, CMYK or 16-bit images), ImageMagick is used.
+PIL itself is imported on first use, so importing the engine stays cheap.
+"""
+
+import io
+import threading
+from importlib.util import find_spec
+
+PIL_AVAILABLE = find_spec('PIL') is not None
+
+BACKENDS = ('magick', 'pillow')
+
+PILLOW_INPUTS = ('.jpg', '.jpeg', '.png', '.gif')
+# Modes encoded as they are; P/LA/PA are expanded to RGB(A) on load, anything else goes to magick
+PILLOW_MODES = ('RGB', 'RGBA', 'L', 'LA', 'P', 'PA')
+
+
+class PillowEncoder:
+    """A decoded raster source that encodes probes in memory with the same options as
+    build_im_command: metadata stripped, progressive 4:2:0 JPEG, undithered palettes, PNG
+    zlib level 9 (1 for fast probes), resize with ImageMagick's size rounding and Lanczos filter.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self.sizes = {100: image}
+        self.lock = threading.Lock()
+
+    def scaled(self, scale):
+        """The source resized to scale %, computed once per scale."""
+        from PIL import Image
+        with self.lock:
+            if scale not in self.sizes:
+                w, h = self.image.size
+                size = (max(1, int(w * scale / 100.0 + 0.5)), max(1, int(h * scale / 100.0 + 0.5)))
+                self.sizes[scale] = self.image.resize(size, Image.LANCZOS)
+            return self.sizes[scale]
+
+    def quantize(self, im, colors):
+        from PIL import Image
+        # Median cut for opaque images; Pillow only quantizes alpha images with the octree method
+        method = Image.Quantize.FASTOCTREE if im.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+        return im.quantize(colors=colors, method=method, dither=Image.Dither.NONE)
+
+    def encode(self, out_fmt, quality=None, colors=None, scale=100, fast=False):
+        """Encoded bytes of one probe (arguments as for build_im_command)."""
+        im = self.scaled(scale)
+        buf = io.BytesIO()
+        if out_fmt == 'jpg':
+            if im.mode not in ('RGB', 'L'):
+                im = im.convert('RGB')
+            im.save(buf, 'JPEG', quality=quality if quality is not None else 92, progressive=True,
+                    subsampling=2, optimize=True)
+        elif out_fmt == 'png':
+            if colors is not None:
+                im = self.quantize(im, colors)
+            im.save(buf, 'PNG', compress_level=1 if fast else 9)
+        else:
+            im = self.quantize(im, colors if colors is not None else 256)
+            im.save(buf, 'GIF', optimize=True)
+        return buf.getvalue()
+
+
+def open_encoder(src_path):
+    """PillowEncoder for src_path, or None when Pillow is missing or the source needs ImageMagick."""
+    if not PIL_AVAILABLE or not src_path.lower().endswith(PILLOW_INPUTS):
+        return None
+    from PIL import Image
+    try:
+        with Image.open(src_path) as im:
+            if getattr(im, 'n_frames', 1) > 1 or im.mode not in PILLOW_MODES:
+                return None
+            im.load()
+            if im.mode in ('P', 'PA', 'LA'):
+                alpha = im.mode != 'P' or 'transparency' in im.info
+                image = im.convert('RGBA' if alpha else 'RGB')
+            else:
+                image = im.copy()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    return PillowEncoder(image)
@@ -0,0 +1,310 @@
+"""
+Batch Module
+Runs many conversions in parallel: splits multi-page PDFs into page jobs, shares idle worker
+slots between files and reports results in order.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .magick import (
+    BatchCancelled, pdf_page_count, start_magick_pool, stop_magick_pool, threads_per_job, set_magick_threads,
+    decode_source_once, pdf_trim_box,
+)
+from .convert import ProbeSlots, convert_with_target, convert_with_cache, cache_key
+from .scheduler import AdaptiveScheduler
+from .pipeline import RasterStage
+from .ghostscript import decode_pdf_once
+from .memory import (
+    MemoryBudget, PIXEL_BYTES, OVERHEAD, UNKNOWN_JOB_BYTES, pdf_page_box, raster_pixels, default_memory_budget,
+    magick_limits,
+)
+
+# Cost model for longest-job-first dispatch, in "pixels decoded" units. Encodes in target mode
+# (probes) and default mode; PDFs are encoded from a 25% pre-pass, images at full size in target
+# mode. Interpreting a PDF page also costs in proportion to its share of the file's bytes.
+TARGET_ENCODES = 6
+PDF_BYTE_COST = 10
+# Compressed image bytes -> pixels, for files whose header can't be read
+IMAGE_BYTES_TO_PIXELS = 5
+
+
+def plan_pages(files, out_fmt, magick_bin=None):
+    """Expand a batch into (src_path, page) jobs: one per page for multi-page PDFs so pages can
+    be rasterized and size-targeted on separate workers, page=None for everything else.
+    GIF output keeps a multi-page PDF together as one animation.
+    """
+    jobs = []
+    for f in files:
+        pages = None
+        if out_fmt != 'gif' and f.lower().endswith('.pdf'):
+            pages = pdf_page_count(f, magick_bin)
+        if pages and pages > 1:
+            jobs.extend((f, i) for i in range(pages))
+        else:
+            jobs.append((f, None))
+    return jobs
+
+
+def scheduled(convert, scheduler):
+    """Wrap convert so each call holds one of the scheduler's slots while it runs."""
+    def run_one(src, page):
+        scheduler.acquire()
+        try:
+            return convert(src, page)
+        finally:
+            scheduler.release()
+    return run_one
+
+
+def run_jobs(jobs, convert, workers, on_result, scheduler=None, order=None):
+    """Run convert(src_path, page) for every job on a pool of workers.
+    on_result(index, job, result, error) is called once per job, in job order (pages of a PDF
+    are reported 0, 1, 2, ... however they finish); result is convert's return value.
+    scheduler: optional AdaptiveScheduler deciding how many of the `workers` threads may run a
+    job at any moment.
+    order: job indices in the order they should start (default: job order).
+    """
+    task = scheduled(convert, scheduler) if scheduler is not None else convert
+    done = {}
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        order = range(len(jobs)) if order is None else order
+        future_to_index = {executor.submit(task, *jobs[i]): i for i in order}
+        for future in as_completed(future_to_index):
+            try:
+                done[future_to_index[future]] = (future.result(), None)
+            except Exception as e:
+                done[future_to_index[future]] = (None, e)
+            while next_index in done:
+                result, error = done.pop(next_index)
+                on_result(next_index, jobs[next_index], result, error)
+                next_index += 1
+
+
+def estimate_jobs(jobs, out_fmt, target_bytes, default_density=None, magick_bin=None):
+    """Pre-flight estimates per job, {(src_path, page): {'memory': bytes or None, 'cost': float}}.
+    memory is the peak raster memory at the density the conversion will rasterize at (a PDF
+    kept whole for GIF output counts all of its pages); cost is a relative run time built from
+    the raster size, the file size per page, the file type and the target mode.
+    """
+    density = default_density or (288 if target_bytes is None else 200)
+    encodes = TARGET_ENCODES if target_bytes is not None else 1
+    boxes = {}
+    page_jobs = {}
+    for src, page in jobs:
+        if page is not None:
+            page_jobs[src] = page_jobs.get(src, 0) + 1
+    estimates = {}
+    for src, page in jobs:
+        try:
+            file_bytes = os.path.getsize(src)
+        except OSError:
+            file_bytes = 0
+        is_pdf = src.lower().endswith('.pdf')
+        pages = 1
+        if is_pdf:
+            if src not in boxes:
+                boxes[src] = pdf_page_box(src)
+            if page is None and out_fmt == 'gif':
+                pages = pdf_page_count(src, magick_bin) or 1
+        pixels = raster_pixels(src, density, pages=pages, box=boxes.get(src))
+        memory = int(pixels * PIXEL_BYTES * OVERHEAD) if pixels is not None else None
+        if is_pdf:
+            # Rasterized once at full density, then encoded from the 25% pre-pass / default resize
+            file_share = file_bytes / page_jobs.get(src, 1)
+            cost = (pixels or 0) * (1 + encodes / 16.0) + PDF_BYTE_COST * file_share
+        else:
+            if pixels is None:
+                pixels = file_bytes * IMAGE_BYTES_TO_PIXELS
+            # Target-mode probes run at full size; default mode encodes after a 25% resize
+            cost = pixels * (1 + (encodes if target_bytes is not None else 1 / 16.0))
+        estimates[(src, page)] = {'memory': memory, 'cost': cost}
+    return estimates
+
+
+def longest_first(jobs, estimates):
+    """Job indices ordered by descending estimated cost (LPT); ties keep job order."""
+    return sorted(range(len(jobs)), key=lambda i: -estimates[jobs[i]]['cost'])
+
+
+def convert_batch(files, output_dir, out_fmt, target_bytes, tolerance_pct, trim_pdf, gif_opts, on_result,
+                  workers=5, default_density=None, timeout_sec=25, magick_bin=None, search='speculative',
+                  persistent_workers=False, jpeg_extent=True, cache=None, curves=None,
+                  adaptive=False, min_workers=1, memory_budget=None, memory_admission=True, lpt=True,
+                  thread_mode='off', process_timeout=None, cancel_event=None, event_loop=True,
+                  max_processes=None, pipeline=False, raster_workers=2, raster_queue=None, fast_probes=True,
+                  shared_palette=True, backend='magick', pdf_backend='magick'):
+    """Convert a batch with `workers` files (or PDF pages, see plan_pages) in flight at once.
+    Shared by the GUI thread and the command-line converter.
+    on_result(index, total, job, result, error) is called in job order; job is (src_path, page),
+    result is convert_with_target's (out_path, size_str), error the exception if it failed.
+    cache/curves: optional ResultCache and RateCurveStore to reuse earlier work.
+    adaptive: let an AdaptiveScheduler vary the concurrency between min_workers and workers.
+    memory_admission: only start a job once its estimated raster memory fits in memory_budget
+    bytes (default: a share of the memory available now) and pass each magick process matching
+    -limit values.
+    lpt: start the jobs with the largest estimated cost first (longest processing time first),
+    so one huge PDF at the end of the list doesn't run alone after everything else. Results are
+    still reported in job order.
+    thread_mode: per-child thread budget from THREAD_MODES (see threads_per_job).
+    process_timeout: seconds any one magick process may run before its process group is killed
+    and the job fails. cancel_event: threading.Event that stops the batch: running processes
+    are killed and jobs not yet started fail with BatchCancelled without running.
+    event_loop: run every magick process on one asyncio event loop (aio.AsyncRunner), at most
+    max_processes (default: workers plus any raster workers) at a time; False uses plain threads
+    (run_jobs).
+    pipeline: in target mode, rasterize the PDF pre-passes on raster_workers threads of their own
+    (pipeline.RasterStage), at most raster_queue (default: 2 x raster_workers) pages ahead of
+    the `workers` encode/search threads, so Ghostscript and the encoders work at the same time.
+    fast_probes: search PNG targets with cheap probes and one final encode (see convert_with_target).
+    shared_palette: encode PNG/GIF palette probes as remaps to palettes derived from one quantization.
+    backend: probe encoder from backends.BACKENDS; 'pillow' encodes raster sources in-process.
+    pdf_backend: PDF renderer from ghostscript.PDF_BACKENDS; 'gs' calls Ghostscript directly.
+    Returns a summary dict: jobs, elapsed seconds and, when enabled, the scheduler's decisions
+    and the memory budget's peak reservation.
+    """
+    start = time.time()
+    workers = max(1, int(workers))
+    scheduler = None
+    if adaptive:
+        scheduler = AdaptiveScheduler(min(min_workers, workers), workers)
+        slots = ProbeSlots(scheduler.limit)
+        scheduler.on_change = slots.set_total
+    else:
+        slots = ProbeSlots(workers)
+    jobs = plan_pages(files, out_fmt, magick_bin)
+    estimates = None
+    if memory_admission or lpt:
+        estimates = estimate_jobs(jobs, out_fmt, target_bytes, default_density, magick_bin)
+    budget = None
+    if memory_admission:
+        total = memory_budget or default_memory_budget()
+        if total:
+            budget = MemoryBudget(total)
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def admit(src, page, share=1):
+        """Reserve share of the job's estimated memory; returns (limits, granted bytes)."""
+        if budget is None:
+            return None, 0
+        estimate = estimates[(src, page)]['memory']
+        if estimate is None:
+            return None, budget.acquire(UNKNOWN_JOB_BYTES)
+        estimate = int(estimate * share)
+        granted = budget.acquire(estimate)
+        return magick_limits(granted, estimate), granted
+
+    def render(src, page):
+        """Raster stage: the target-mode pre-pass of one PDF page, admitted like a whole job."""
+        if cancelled():
+            raise BatchCancelled()
+        if cache is not None:
+            key = cache_key(cache, src, out_fmt, target_bytes, tolerance_pct, trim_pdf, gif_opts,
+                            default_density, magick_bin, page, search=search, jpeg_extent=jpeg_extent,
+                            fast_probes=fast_probes, shared_palette=shared_palette, backend=backend,
+                            pdf_backend=pdf_backend)[0]
+            if cache.get(key) is not None:
+                return None  # replayed from the cache without a search
+        trim_box = None
+        if trim_pdf:
+            trim_box = pdf_trim_box(src, page, magick_bin, timeout=process_timeout, cancel_event=cancel_event)
+        limits, granted = admit(src, page)
+        work_dir = tempfile.mkdtemp(prefix="imraster_")
+        try:
+            decode = partial(decode_pdf_once, out_fmt=out_fmt) if pdf_backend == 'gs' else decode_source_once
+            path = decode(
+                src, work_dir, density=default_density, trim=bool(trim_pdf), scale=25, magick_bin=magick_bin,
+                page=page, limits=limits, timeout=process_timeout, cancel_event=cancel_event, trim_box=trim_box
+            )
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        finally:
+            if budget is not None:
+                budget.release(granted)
+        return work_dir, path
+
+    def convert(src, page):
+        if cancelled():
+            raise BatchCancelled()
+        raster = stage.take((src, page)) if stage is not None else None
+        pre_pass = raster[1] if raster else None
+        try:
+            # Searching from the pre-pass (25% of each side) needs a sixteenth of the raster memory
+            limits, granted = admit(src, page, 1 / 16.0 if pre_pass else 1)
+            # Each running job occupies one slot; idle slots can be borrowed for speculative probes
+            slots.hold()
+            try:
+                kwargs = dict(
+                    timeout_sec=timeout_sec, magick_bin=magick_bin, search=search,
+                    jpeg_extent=jpeg_extent, probe_slots=slots, page=page, limits=limits,
+                    process_timeout=process_timeout, cancel_event=cancel_event, pre_pass=pre_pass,
+                    fast_probes=fast_probes, shared_palette=shared_palette, backend=backend,
+                    pdf_backend=pdf_backend
+                )
+                if cache is not None:
+                    return convert_with_cache(
+                        cache, src, output_dir, out_fmt, target_bytes, tolerance_pct, trim_pdf, gif_opts,
+                        default_density, curves=curves, **kwargs
+                    )
+                return convert_with_target(
+                    src, output_dir, out_fmt, target_bytes, tolerance_pct, trim_pdf, gif_opts, default_density, **kwargs
+                )
+            finally:
+                slots.release(1)
+                if budget is not None:
+                    budget.release(granted)
+        finally:
+            if raster:
+                shutil.rmtree(raster[0], ignore_errors=True)
+
+    def report(index, job, result, error):
+        on_result(index, len(jobs), job, result, error)
+
+    order = longest_first(jobs, estimates) if lpt else None
+    runner = None
+    stage = None
+    raster_jobs = []
+    if pipeline and target_bytes is not None and default_density is not None:
+        raster_jobs = [jobs[i] for i in (order or range(len(jobs))) if jobs[i][0].lower().endswith('.pdf')]
+    # Raster threads run magick processes too, so they share the thread and process budgets
+    processes = workers + (raster_workers if raster_jobs else 0)
+    threads = threads_per_job(thread_mode, processes)
+    previous_threads = set_magick_threads(threads)
+    # Long-lived magick processes replace one spawn per probe when enabled
+    if persistent_workers:
+        start_magick_pool(processes, magick_bin)
+    try:
+        if raster_jobs:
+            depth = raster_queue or 2 * raster_workers
+            stage = RasterStage(raster_jobs, render, raster_workers, depth, cancel_event=cancel_event).start()
+        if event_loop:
+            # asyncio is only loaded by batches that use the event loop (keeps `import engine` cheap)
+            from .aio import AsyncRunner
+            runner = AsyncRunner(max_processes or processes, cancel_event=cancel_event)
+            task = scheduled(convert, scheduler) if scheduler is not None else convert
+            runner.run_jobs(jobs, task, workers, report, order=order)
+        else:
+            run_jobs(jobs, convert, workers, report, scheduler=scheduler, order=order)
+    finally:
+        if stage is not None:
+            stage.close()
+        stop_magick_pool()
+        set_magick_threads(previous_threads)
+    return {
+        'jobs': len(jobs),
+        'elapsed': round(time.time() - start, 3),
+        'scheduler': scheduler.summary() if scheduler is not None else None,
+        'memory': budget.summary() if budget is not None else None,
+        'threads_per_job': threads,
+        'cancelled': cancelled(),
+        'processes': runner.summary() if runner is not None else None,
+        'pipeline': stage.summary() if stage is not None else None,
+    }
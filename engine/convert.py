@@ -0,0 +1,834 @@
+"""
+Convert Module
+Single-file conversion: the default single pass, the target-size search (convert_with_target),
+its cached front end (convert_with_cache) and the legacy PDF-to-GIF command.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .magick import (
+    BatchCancelled, run_magick, get_async_runner, magick_version, build_im_command, decode_source_once, pdf_trim_box,
+    palette_base, derive_palette, ProbeStop,
+)
+from .search import SEARCH_STRATEGIES, SearchTimeout, within_tolerance, predict_resolution, predict_from_points
+from .memory import image_dimensions
+from .backends import open_encoder
+from .ghostscript import rasterize_pdf, decode_pdf_once
+from .result_cache import file_digest
+
+
+# IJG standard luminance quantization table (quality 50)
+JPEG_STD_LUMA_QTABLE = [
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+]
+
+
+def jpeg_quality_estimate(data):
+    """Estimate the IJG -quality a JPEG was written with from its luminance DQT table.
+    data: JPEG bytes or a file path. Returns an int, or None if no table was found.
+    """
+    if not isinstance(data, bytes):
+        with open(data, 'rb') as f:
+            data = f.read(65536)
+    i = 2
+    while i + 4 <= len(data) and data[i] == 0xFF:
+        marker = data[i + 1]
+        length = int.from_bytes(data[i + 2:i + 4], 'big')
+        if marker == 0xDA:  # start of scan: no tables after this
+            break
+        if marker == 0xDB:
+            seg = data[i + 4:i + 2 + length]
+            j = 0
+            while j < len(seg):
+                precision, table_id = seg[j] >> 4, seg[j] & 0x0F
+                n = 128 if precision else 64
+                raw = seg[j + 1:j + 1 + n]
+                if table_id == 0:
+                    values = [int.from_bytes(raw[k:k + 2], 'big') for k in range(0, n, 2)] if precision else list(raw)
+                    scale = 100.0 * sum(values) / sum(JPEG_STD_LUMA_QTABLE)
+                    q = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+                    return max(1, min(100, int(round(q))))
+                j += 1 + n
+        i += 2 + length
+    return None
+
+
+class ProbeSlots:
+    """Counts the busy worker slots of a batch so a file's search can borrow idle ones.
+    Each running file holds one slot; speculative probes take extra slots only while they are free."""
+
+    def __init__(self, total):
+        self.total = max(1, int(total))
+        self.busy = 0
+        self.lock = threading.Lock()
+
+    def hold(self):
+        with self.lock:
+            self.busy += 1
+
+    def try_acquire(self, n):
+        """Take up to n free slots without blocking; returns how many were granted."""
+        with self.lock:
+            granted = max(0, min(n, self.total - self.busy))
+            self.busy += granted
+            return granted
+
+    def release(self, n=1):
+        with self.lock:
+            self.busy -= n
+
+    def set_total(self, total):
+        """Follow the batch's concurrency limit when an adaptive scheduler changes it."""
+        with self.lock:
+            self.total = max(1, int(total))
+
+
+# Threads that wait on speculative probe subprocesses (the CPU budget is enforced by ProbeSlots);
+# created on first use
+_probe_executor = None
+_probe_executor_lock = threading.Lock()
+
+
+def get_probe_executor():
+    global _probe_executor
+    with _probe_executor_lock:
+        if _probe_executor is None:
+            _probe_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="probe")
+        return _probe_executor
+
+
+# Resolution presets -> PDF rasterization density
+RES_PRESETS = {'High': 288, 'Medium': 216, 'Low': 144}
+
+# Inputs the converter accepts
+SUPPORTED_INPUTS = ('.pdf', '.gif', '.jpg', '.jpeg', '.png')
+
+
+def output_path(src_path, out_dir, out_fmt, page=None):
+    """Where a conversion of src_path (or one page of it) is written: base.ext, or base-<page>.ext
+    as ImageMagick itself names multi-page output."""
+    base_name = os.path.splitext(os.path.basename(src_path))[0]
+    if page is not None:
+        base_name = f"{base_name}-{page}"
+    return os.path.join(out_dir or os.path.dirname(src_path), f"{base_name}.{out_fmt}")
+
+
+def store_output(data, dst_path):
+    """Write a probe result to dst_path: bytes are written once, a temp file path is moved into place."""
+    if isinstance(data, bytes):
+        with open(dst_path, 'wb') as f:
+            f.write(data)
+    else:
+        shutil.move(data, dst_path)
+
+
+def convert_with_target(src_path, out_dir, out_fmt, target_bytes, tolerance_pct, trim_pdf,
+                        gif_opts, default_density=None, timeout_sec=25, magick_bin=None,
+                        search='interpolate', probe_mode='pipe', jpeg_extent=True, probe_slots=None, info=None,
+                        prior=None, measured=None, page=None, limits=None, process_timeout=None, cancel_event=None,
+                        pre_pass=None, fast_probes=True, shared_palette=True, backend='magick',
+                        pdf_backend='magick'):
+    """Iteratively convert using ImageMagick only to meet byte target.
+    search: name from SEARCH_STRATEGIES or a callable with the same signature.
+    probe_mode: 'pipe' has ImageMagick write each probe to stdout and measures it in memory,
+    keeping only the best candidate's bytes; 'file' writes every probe into the temp work dir.
+    jpeg_extent: for JPG, first try a single encode with -define jpeg:extent and only search
+    when that lands below the tolerance window or fails.
+    probe_slots: the batch's ProbeSlots; lets strategies that accept probe_many run extra
+    probes concurrently on idle worker slots.
+    info: optional dict filled with the parameters of the stored output, expressed as one
+    build_im_command call on the original source (keys density, scale, quality, colors,
+    extent, trim), plus 'timed_out' when the timed fallback was used.
+    prior: earlier measurements of this source, {(density, scale): {value: bytes}} (see
+    RateCurveStore); the search starts from the value they predict and skips resolutions
+    already known to be too large. measured: optional list that receives every
+    (density, scale, value, bytes) point probed in this run.
+    page: convert only this zero-based page of a multi-page source, written as base-<page>.ext.
+    limits: optional ImageMagick -limit values applied to every command (see memory.magick_limits).
+    process_timeout: wall-clock seconds any single magick process may run before it is killed
+    (MagickTimeout); unlike timeout_sec this also stops a hung render mid-probe.
+    cancel_event: threading.Event; once set, running processes are killed and BatchCancelled raised.
+    pre_pass: MPC cache of the PDF pre-pass (default_density, 25%, trim as trim_pdf) already made
+    by the batch's raster stage (see pipeline.RasterStage); replaces the inline pre-pass.
+    fast_probes: PNG only; probes are encoded at a cheap zlib level and their bytes scaled by a
+    fast-to-final ratio calibrated in this search. A probe predicted to be within tolerance is
+    encoded for real straight away, so every hit and every stored output is a final encode.
+    shared_palette: PNG/GIF only; quantize each probe source once (magick.palette_base) and encode
+    every palette-size probe as a -remap to a palette derived from it, shared by all GIF frames.
+    backend: name from backends.BACKENDS; 'pillow' decodes JPG/PNG/GIF sources once in-process
+    and encodes the probes in memory (ImageMagick still handles everything else, and the jpeg:extent
+    fast path, which Pillow has no equivalent for).
+    pdf_backend: name from ghostscript.PDF_BACKENDS; 'gs' renders PDF pages with Ghostscript
+    directly (ghostscript.rasterize_pdf) and falls back to ImageMagick's render without it.
+    Returns (out_path, size_str) or raises on fatal error. In target mode size_str
+    also reports how many encode probes were needed.
+    """
+    dst_path = output_path(src_path, out_dir, out_fmt, page)
+    is_pdf = src_path.lower().endswith('.pdf')
+
+    # Default mode: if target_bytes is None, do a single-pass conversion with density 288 (for PDFs) and resize 25%
+    if target_bytes is None:
+        density = (default_density if default_density is not None else 288) if is_pdf else None
+        # Direct Ghostscript render: the encode reads the page's raster instead of the PDF
+        gs_dir = tempfile.mkdtemp(prefix="imconv_") if is_pdf and pdf_backend == 'gs' else None
+        try:
+            raster = gs_dir and rasterize_pdf(
+                src_path, gs_dir, density, page=page, trim=trim_pdf, out_fmt=out_fmt, limits=limits,
+                timeout=process_timeout, cancel_event=cancel_event
+            )
+            cmd = build_im_command(
+                raster or src_path, dst_path, out_fmt,
+                quality=None, colors=None, scale=25, density=density,
+                trim=trim_pdf and is_pdf,
+                gif_timing=(gif_opts.get('custom') if gif_opts else None),
+                magick_bin=magick_bin, page=None if raster else page, limits=limits,
+                src_size=image_dimensions(src_path) if not is_pdf else None,
+            )
+            res = run_magick(cmd, timeout=process_timeout, cancel_event=cancel_event)
+        finally:
+            if gs_dir:
+                shutil.rmtree(gs_dir, ignore_errors=True)
+        if res.returncode != 0:
+            raise RuntimeError(f"Default conversion failed: {res.stderr.decode(errors='ignore')}")
+        out_choice = dst_path
+        if not os.path.exists(out_choice):
+            # Multi-page outputs may be written as base-0.ext, base-1.ext, etc.
+            base_no_ext, ext = os.path.splitext(dst_path)
+            import glob
+            candidates = sorted(glob.glob(f"{base_no_ext}-*{ext}"))
+            if candidates:
+                out_choice = candidates[0]
+            else:
+                raise RuntimeError("Default conversion failed: no output produced")
+        size = os.path.getsize(out_choice)
+        if info is not None:
+            info.update(density=density, scale=25, quality=None, colors=None, extent=None, trim=trim_pdf and is_pdf)
+        return out_choice, f"{size} Bytes ({size/1024:.2f} KB)"
+
+    work_dir = tempfile.mkdtemp(prefix="imconv_")
+    try:
+        start_ts = time.time()
+        # Optional pre-pass: for PDFs with a target, rasterize once at the selected preset density then apply tolerance on the raster
+        src_for_iter = src_path
+        iter_page = page  # page selector for src_for_iter (the pre-pass cache is already a single page)
+        pre_scale = None  # resize % already applied by the pre-pass, if any
+        # Decoded pixel caches keyed by (density, trim); every probe for that combination reads from it
+        decoded = {}
+        decode = partial(decode_pdf_once, out_fmt=out_fmt) if pdf_backend == 'gs' else decode_source_once
+        # Trim: measure the content box once on a cheap render, then crop every full-resolution raster
+        trim_box = None
+        if trim_pdf and is_pdf and not pre_pass:
+            trim_box = pdf_trim_box(src_path, page, magick_bin, timeout=process_timeout, cancel_event=cancel_event)
+        if target_bytes is not None and is_pdf and default_density is not None:
+            pre_src = pre_pass or decode(
+                src_path, work_dir, density=default_density, trim=trim_pdf and is_pdf, scale=25, magick_bin=magick_bin,
+                page=page, limits=limits, timeout=process_timeout, cancel_event=cancel_event, trim_box=trim_box
+            )
+            if pre_src:
+                src_for_iter = pre_src
+                iter_page = None
+                decoded[(None, False)] = pre_src
+                pre_scale = 25
+                is_pdf = False  # subsequent steps treat it as an image (no PDF density needed)
+
+        # Strategy parameters: start at full resolution, then let the planner pick density/scale
+        density = (default_density if default_density is not None else 200) if is_pdf else None
+        scale = 100
+        min_density, min_scale = 72, 10
+        max_plan_steps = 6
+        # Quality/palette search ranges
+        q_lo, q_hi = 20, 90
+        c_lo, c_hi = 16, 256
+        search_fn = SEARCH_STRATEGIES[search] if isinstance(search, str) else search
+
+        best_output = None  # bytes (pipe mode) or tmp path (file mode) of the closest attempt
+        best_params = None
+        best_delta = float('inf')
+        last_output = None  # output of the latest sequential probe, or of the hit found by run_probes
+        fast_png = fast_probes and out_fmt == 'png'
+        # In-process encoder for the probes (None = one magick process per probe)
+        pil = open_encoder(src_path) if backend == 'pillow' else None
+        fast_ratio = None  # final bytes / fast bytes, from the latest probe encoded both ways
+        # Remap palettes keyed by (probe source, page, colors); colors None is the source's base sample
+        palettes = {}
+        palette_lock = threading.Lock()
+        probes = 0
+        attempts = {}  # probed value -> size, for the current density/scale
+        history = []  # (resolution, smallest over-target bytes) per density/scale tried
+
+        probe_lock = threading.Lock()
+
+        def winning(value, density, scale, extent=None):
+            """Parameters that reproduce a probe with one build_im_command call on src_path."""
+            if pre_scale is not None:
+                density, scale = default_density, pre_scale * scale / 100.0
+            return {
+                'density': density, 'scale': scale, 'extent': extent,
+                'quality': value if out_fmt == 'jpg' else None,
+                'colors': value if out_fmt != 'jpg' else None,
+                'trim': trim_pdf and src_path.lower().endswith('.pdf'),
+            }
+
+        def palette_for(colors, probe_src, probe_page, probe_density, probe_trim):
+            """Remap palette for a palette-size probe, built on first use; None to use -colors."""
+            with palette_lock:
+                base_key = (probe_src, probe_page, None)
+                if base_key not in palettes:
+                    palettes[base_key] = palette_base(
+                        probe_src, work_dir, density=probe_density, trim=probe_trim, magick_bin=magick_bin,
+                        page=probe_page, limits=limits, timeout=process_timeout, cancel_event=cancel_event,
+                        trim_box=trim_box
+                    )
+                key = (probe_src, probe_page, colors)
+                if key not in palettes:
+                    base = palettes[base_key]
+                    palettes[key] = base and derive_palette(
+                        base, colors, magick_bin, timeout=process_timeout, cancel_event=cancel_event
+                    )
+                return palettes[key]
+
+        def start_probe():
+            """Cancel and timeout checks, then count one probe (either backend)."""
+            nonlocal probes
+            if cancel_event is not None and cancel_event.is_set():
+                raise BatchCancelled()
+            # Timeout: if target mode and taking too long, fall back to single pass using selected preset (or Low)
+            if (time.time() - start_ts) > timeout_sec:
+                raise SearchTimeout()
+            with probe_lock:
+                probes += 1
+
+        def pillow_probe(value, scale, fast=False):
+            """Encode one candidate in-process; returns (size, bytes)."""
+            start_probe()
+            data = pil.encode(
+                out_fmt, quality=value if out_fmt == 'jpg' else None, colors=value if out_fmt != 'jpg' else None,
+                scale=scale, fast=fast
+            )
+            return len(data), data
+
+        def probe_command(value, density, scale, probe_src, probe_density, probe_trim, extent=None, fast=False):
+            """Count one probe and build its command; returns (cmd, tmp_out).
+            fast: cheap PNG settings (see fast_probes)."""
+            start_probe()
+            if probe_mode == 'pipe':
+                tmp_out = f"{out_fmt}:-"
+            else:
+                name = f"tmp_{density}_{scale}_{value if extent is None else 'extent'}{'_fast' if fast else ''}"
+                tmp_out = os.path.join(work_dir, f"{name}.{out_fmt}")
+            # Only the undecoded source needs the page selector; pixel caches hold a single page
+            probe_page = iter_page if probe_src == src_for_iter else None
+            if out_fmt == 'jpg':
+                cmd = build_im_command(
+                    probe_src, tmp_out, 'jpg', quality=value, scale=scale, density=probe_density,
+                    trim=probe_trim, gif_timing=None, magick_bin=magick_bin, extent=extent, page=probe_page,
+                    limits=limits, trim_box=trim_box
+                )
+            else:
+                timing = None
+                if out_fmt == 'gif' and gif_opts:
+                    # Use existing custom timing string if provided
+                    timing = gif_opts.get('custom') or None
+                remap = None
+                if shared_palette and value is not None:
+                    remap = palette_for(value, probe_src, probe_page, probe_density, probe_trim)
+                cmd = build_im_command(
+                    probe_src, tmp_out, out_fmt, colors=value, scale=scale, density=probe_density,
+                    trim=probe_trim, gif_timing=timing, magick_bin=magick_bin, page=probe_page,
+                    limits=limits, trim_box=trim_box, fast=fast, remap=remap
+                )
+            return cmd, tmp_out
+
+        def probe_output(res, tmp_out):
+            """(size, output) of a finished probe, or (None, None) if the encode failed."""
+            if probe_mode == 'pipe':
+                if res.returncode != 0 or not res.stdout:
+                    return None, None
+                return len(res.stdout), res.stdout
+            if res.returncode != 0 or not os.path.exists(tmp_out):
+                return None, None
+            return os.path.getsize(tmp_out), tmp_out
+
+        def encode_final(value, density, scale, probe_src, probe_density, probe_trim, events=None):
+            if pil is not None:
+                return pillow_probe(value, scale)
+            cmd, tmp_out = probe_command(value, density, scale, probe_src, probe_density, probe_trim)
+            return probe_output(run_magick(cmd, timeout=process_timeout, cancel_event=events or cancel_event), tmp_out)
+
+        def finish_fast(value, density, scale, probe_src, probe_density, probe_trim, size, output, events=None):
+            """Predicted final (size, output) of a fast probe. Until the ratio is calibrated, and
+            whenever the prediction is within tolerance, the value is encoded for real and the ratio
+            updated; otherwise output is ('fast', value, density, scale, probe_src, probe_density,
+            probe_trim), the arguments for encoding it for real later."""
+            nonlocal fast_ratio
+            if size is None:
+                return None, None
+            with probe_lock:
+                ratio = fast_ratio
+            if ratio is not None and not within_tolerance(size * ratio, target_bytes, tolerance_pct):
+                return int(size * ratio), ('fast', value, density, scale, probe_src, probe_density, probe_trim)
+            final_size, final_output = encode_final(
+                value, density, scale, probe_src, probe_density, probe_trim, events=events
+            )
+            if final_size is not None:
+                with probe_lock:
+                    fast_ratio = final_size / size
+            return final_size, final_output
+
+        def encode_probe(value, density, scale, probe_src, probe_density, probe_trim, extent=None, cancel=None):
+            """Encode one candidate; returns (size, output) or (None, None) if the encode failed.
+            cancel: this probe's own threading.Event; once set, the probe is abandoned with BatchCancelled
+            (a one-off process is killed, a pooled job is left to run out; see MagickWorkerPool.run)."""
+            events = cancel_event
+            if cancel is not None:
+                if cancel.is_set():
+                    raise BatchCancelled()
+                events = ProbeStop(cancel_event, cancel)
+            if pil is not None:
+                size, output = pillow_probe(value, scale, fast=fast_png)
+            else:
+                cmd, tmp_out = probe_command(
+                    value, density, scale, probe_src, probe_density, probe_trim, extent=extent, fast=fast_png
+                )
+                size, output = probe_output(
+                    run_magick(cmd, timeout=process_timeout, cancel_event=events), tmp_out
+                )
+            if fast_png:
+                return finish_fast(
+                    value, density, scale, probe_src, probe_density, probe_trim, size, output, events=events
+                )
+            return size, output
+
+        def record(value, size, output, density, scale):
+            nonlocal best_output, best_delta, best_params
+            with probe_lock:
+                attempts[value] = size
+                # Track best attempt
+                delta = abs(size - target_bytes)
+                if delta < best_delta:
+                    best_delta = delta
+                    best_output = output
+                    best_params = winning(value, density, scale)
+                # Predictions from fast probes aren't measurements of the final encode
+                if measured is not None and not isinstance(output, tuple):
+                    measured.append((density, scale, value, size))
+
+        def run_probe(value, density, scale, probe_src, probe_density, probe_trim, extent=None):
+            nonlocal last_output
+            size, output = encode_probe(value, density, scale, probe_src, probe_density, probe_trim, extent=extent)
+            if size is None:
+                return None
+            last_output = output
+            if extent is None:
+                # The caller decides whether an extent encode is acceptable (its quality is unknown here)
+                record(value, size, output, density, scale)
+            return size
+
+        def run_probes(values, density, scale, probe_src, probe_density, probe_trim):
+            """Probe values[0] plus as many of the rest as the batch has idle slots, concurrently.
+            Returns {value: size}; stops at the first in-tolerance result and cancels the others."""
+            nonlocal last_output
+            extra = probe_slots.try_acquire(len(values) - 1)
+            if extra == 0:
+                return {values[0]: run_probe(values[0], density, scale, probe_src, probe_density, probe_trim)}
+            values = values[:1 + extra]
+            # In-process probes run on the probe executor; only magick commands go to the event loop
+            runner = get_async_runner() if pil is None else None
+            commands = {}
+            if runner is not None:
+                # On the batch's event loop every probe is a coroutine, and cancelling one kills its process
+                try:
+                    commands = {
+                        value: probe_command(value, density, scale, probe_src, probe_density, probe_trim, fast=fast_png)
+                        for value in values
+                    }
+                except Exception:
+                    probe_slots.release(extra)
+                    raise
+            futures = {}
+            # Executor probes get an Event each: Future.cancel() can't stop a process that already started
+            stops = []
+            # Set once each probe's process is over; a cancelled event-loop future is done before that
+            finished = []
+            for i, value in enumerate(values):
+                over = threading.Event()
+                finished.append(over)
+
+                def finish(_=None, over=over, borrowed=i > 0):
+                    # Borrowed slots are returned when the process actually finishes, even if we stop waiting
+                    if borrowed:
+                        probe_slots.release(1)
+                    over.set()
+
+                if runner is not None:
+                    fut = runner.submit(commands[value][0], timeout=process_timeout, finished=finish)
+                else:
+                    stops.append(threading.Event())
+                    fut = get_probe_executor().submit(
+                        encode_probe, value, density, scale, probe_src, probe_density, probe_trim, cancel=stops[-1]
+                    )
+                    fut.add_done_callback(finish)
+                futures[fut] = value
+            results = {}
+            try:
+                for fut in as_completed(futures):
+                    value = futures[fut]
+                    if runner is not None:
+                        size, output = probe_output(fut.result(), commands[value][1])
+                        if fast_png:
+                            size, output = finish_fast(
+                                value, density, scale, probe_src, probe_density, probe_trim, size, output
+                            )
+                    else:
+                        size, output = fut.result()
+                    results[value] = size
+                    if size is None:
+                        continue
+                    record(value, size, output, density, scale)
+                    if within_tolerance(size, target_bytes, tolerance_pct):
+                        last_output = output
+                        break
+            finally:
+                for stop in stops:
+                    stop.set()
+                for fut in futures:
+                    fut.cancel()
+                # Losers are killed now; let them exit before work_dir can be removed
+                for over in finished:
+                    over.wait()
+            return results
+
+        try:
+            for _ in range(max_plan_steps):
+                attempts.clear()
+                if out_fmt == 'jpg':
+                    lo, hi = q_lo, q_hi
+                else:
+                    lo, hi = c_lo, c_hi
+                hit = None
+                search_here = True
+                # Earlier runs may have measured this resolution already: reuse their points instead of re-probing
+                known = (prior or {}).get((density, scale), {})
+                attempts.update(known)
+                upper = target_bytes * (1 + tolerance_pct / 100.0)
+                can_shrink = (density is not None and density > min_density) or scale > min_scale
+                if known.get(lo, 0) > upper and can_shrink:
+                    # Known to be too big even at the lowest quality/palette: go straight to the planner
+                    search_here = False
+                else:
+                    # Decode once per (density, trim); fall back to the original source if the cache can't be built
+                    cache_key = (density, trim_pdf and is_pdf)
+                    if pil is not None:
+                        decoded[cache_key] = None  # Pillow holds the decoded image itself
+                    if cache_key not in decoded:
+                        decoded[cache_key] = decode(
+                            src_for_iter, work_dir, density=density, trim=trim_pdf and is_pdf, magick_bin=magick_bin,
+                            page=iter_page, limits=limits, timeout=process_timeout, cancel_event=cancel_event,
+                            trim_box=trim_box
+                        )
+                    if decoded[cache_key]:
+                        probe_src, probe_density, probe_trim = decoded[cache_key], None, False
+                    else:
+                        probe_src, probe_density, probe_trim = src_for_iter, density, trim_pdf and is_pdf
+
+                if known and search_here:
+                    # Narrow the range to the known bracket and encode the interpolated value first
+                    for value, size in known.items():
+                        if size > upper:
+                            hi = min(hi, value - 1)
+                        elif not within_tolerance(size, target_bytes, tolerance_pct):
+                            lo = max(lo, value + 1)
+                    if lo <= hi:
+                        guess = min(max(predict_from_points(known, target_bytes, log_param=(out_fmt != 'jpg')), lo), hi)
+                        size = run_probe(guess, density, scale, probe_src, probe_density, probe_trim)
+                        if size is not None and within_tolerance(size, target_bytes, tolerance_pct):
+                            hit = guess
+                        elif size is None or size > target_bytes:
+                            hi = guess - 1
+                        else:
+                            lo = guess + 1
+                    else:
+                        # No untried value is left between the known points; re-encode the closest one
+                        # so this run still has an output
+                        closest = min(known, key=lambda value: abs(known[value] - target_bytes))
+                        run_probe(closest, density, scale, probe_src, probe_density, probe_trim)
+                if jpeg_extent and out_fmt == 'jpg' and search_here and not known and pil is None:
+                    # Fast path: let the JPEG encoder hit the byte budget itself in a single encode
+                    extent_bytes = int(target_bytes * (1 + tolerance_pct / 100.0))
+                    size = run_probe(None, density, scale, probe_src, probe_density, probe_trim, extent=extent_bytes)
+                    if size is not None:
+                        est_q = jpeg_quality_estimate(last_output)
+                        if est_q is not None and measured is not None:
+                            # The quality the encoder settled on is a measurement like any probe's
+                            measured.append((density, scale, est_q, size))
+                        if size > target_bytes * (1 + tolerance_pct / 100.0) or (est_q is not None and est_q < q_lo):
+                            # Budget only reachable below the quality floor: measure the floor and rescale
+                            search_here = False
+                            floor_size = run_probe(q_lo, density, scale, probe_src, probe_density, probe_trim)
+                            if floor_size is not None and within_tolerance(floor_size, target_bytes, tolerance_pct):
+                                hit = q_lo
+                        elif within_tolerance(size, target_bytes, tolerance_pct):
+                            hit = 'extent'
+                if hit is None and search_here:
+                    hit = search_fn(
+                        lo, hi,
+                        lambda value: run_probe(value, density, scale, probe_src, probe_density, probe_trim),
+                        target_bytes, tolerance_pct, log_param=(out_fmt != 'jpg'),
+                        probe_many=(
+                            (lambda values: run_probes(values, density, scale, probe_src, probe_density, probe_trim))
+                            if probe_slots is not None else None
+                        ),
+                    )
+                if hit is not None:
+                    store_output(last_output, dst_path)
+                    if info is not None:
+                        if hit == 'extent':
+                            info.update(winning(None, density, scale, extent=extent_bytes))
+                        else:
+                            info.update(winning(hit, density, scale))
+                    size = os.path.getsize(dst_path)
+                    note = ", jpeg:extent" if hit == 'extent' else (", fast probes" if fast_png else "")
+                    if pil is not None:
+                        note += ", Pillow"
+                    return dst_path, f"{size} Bytes ({size/1024:.2f} KB) [{probes} probes{note}]"
+
+                # Still too big: jump straight to the density/scale predicted from the measured bytes
+                over = [size for size in attempts.values() if size > target_bytes]
+                if not over:
+                    # Already under target at the highest quality/palette; shrinking won't help
+                    break
+                res = density * scale / 100.0 if density is not None else scale
+                history.append((res, min(over)))
+                new_res = predict_resolution(history, target_bytes)
+                if density is not None:
+                    # Lower the rasterization density first (cheaper), then resize below the density floor
+                    new_density = max(min_density, min(density, int(new_res)))
+                    new_scale = max(min_scale, min(100, int(100 * new_res / new_density)))
+                else:
+                    new_density = None
+                    new_scale = max(min_scale, min(scale, int(new_res)))
+                if (new_density, new_scale) == (density, scale):
+                    break
+                density, scale = new_density, new_scale
+            if isinstance(best_output, tuple):
+                # The closest attempt was only fast-encoded; store its final encode instead
+                size, output = encode_final(*best_output[1:])
+                best_output = output if size is not None else None
+        except SearchTimeout:
+            low_density = default_density if default_density is not None else (144 if src_path.lower().endswith('.pdf') else None)
+            cmd = build_im_command(
+                src_path, dst_path, out_fmt,
+                quality=None, colors=None, scale=25, density=low_density,
+                trim=trim_pdf and src_path.lower().endswith('.pdf'),
+                gif_timing=None, magick_bin=magick_bin, page=page, limits=limits, trim_box=trim_box,
+            )
+            res = run_magick(cmd, timeout=process_timeout, cancel_event=cancel_event)
+            if res.returncode != 0 or not os.path.exists(dst_path):
+                raise RuntimeError(f"Timed fallback failed: {res.stderr.decode(errors='ignore')}")
+            size = os.path.getsize(dst_path)
+            if info is not None:
+                info['timed_out'] = True
+            return dst_path, f"{size} Bytes ({size/1024:.2f} KB) [Timed fallback after {probes} probes]"
+
+        # If no exact match, write best attempt if any
+        if best_output is not None:
+            store_output(best_output, dst_path)
+            if info is not None:
+                info.update(best_params)
+            size = os.path.getsize(dst_path)
+            return dst_path, f"{size} Bytes ({size/1024:.2f} KB) [{probes} probes]"
+        raise RuntimeError("Conversion failed: no output produced")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# convert_with_target options that change which bytes a conversion produces
+CACHE_KEY_OPTIONS = ('search', 'jpeg_extent', 'fast_probes', 'shared_palette', 'backend', 'pdf_backend')
+
+
+def cache_key(cache, src_path, out_fmt, target_bytes, tolerance_pct, trim_pdf, gif_opts,
+              default_density=None, magick_bin=None, page=None, search='interpolate', jpeg_extent=True,
+              fast_probes=True, shared_palette=True, backend='magick', pdf_backend='magick'):
+    """ResultCache key for one conversion; returns (key, digest, settings), where settings is
+    everything that shapes an encode's bytes (the RateCurveStore key). The key adds the byte
+    target and the search options that decide which in-tolerance encode is kept.
+    The keyword options default as in convert_with_target."""
+    digest = file_digest(src_path)
+    settings = {
+        'out_fmt': out_fmt,
+        'trim': bool(trim_pdf),
+        'density': default_density,
+        'gif_timing': (gif_opts.get('custom') if gif_opts else None),
+        'magick': magick_version(magick_bin),
+        'page': page,
+        'shared_palette': bool(shared_palette),
+        'backend': backend,
+        'pdf_backend': pdf_backend,
+    }
+    params = dict(
+        settings, target_bytes=target_bytes, tolerance_pct=tolerance_pct,
+        search=search if isinstance(search, str) else getattr(search, '__name__', str(search)),
+        jpeg_extent=bool(jpeg_extent), fast_probes=bool(fast_probes),
+    )
+    return cache.make_key(src_path, params, digest=digest), digest, settings
+
+
+def convert_with_cache(cache, src_path, out_dir, out_fmt, target_bytes, tolerance_pct, trim_pdf,
+                       gif_opts, default_density=None, magick_bin=None, curves=None, page=None, limits=None,
+                       process_timeout=None, cancel_event=None, **kwargs):
+    """convert_with_target behind a ResultCache.
+    A cached output is linked/copied into place; cached parameters alone are replayed as one
+    encode and only trusted if the result is still within tolerance. Otherwise the full search
+    runs and its result is recorded.
+    curves: optional RateCurveStore; the search is seeded from this file's earlier measurements
+    and its new ones are added.
+    """
+    dst_path = output_path(src_path, out_dir, out_fmt, page)
+    key, digest, settings = cache_key(
+        cache, src_path, out_fmt, target_bytes, tolerance_pct, trim_pdf, gif_opts, default_density, magick_bin, page,
+        **{name: kwargs[name] for name in CACHE_KEY_OPTIONS if name in kwargs}
+    )
+    entry = cache.get(key)
+    if entry is not None and entry['path']:
+        cache.materialize(entry['path'], dst_path)
+        size = os.path.getsize(dst_path)
+        return dst_path, f"{size} Bytes ({size/1024:.2f} KB) [cached]"
+
+    # Never write through a hard link into the cache's copy of an earlier result
+    if os.path.exists(dst_path) and os.stat(dst_path).st_nlink > 1:
+        os.remove(dst_path)
+
+    if entry is not None:
+        won = entry['params']
+        cmd = build_im_command(
+            src_path, dst_path, out_fmt,
+            quality=won.get('quality'), colors=won.get('colors'), scale=won.get('scale', 100),
+            density=won.get('density'), trim=won.get('trim', False),
+            gif_timing=settings['gif_timing'] if out_fmt == 'gif' else None,
+            magick_bin=magick_bin, extent=won.get('extent'), page=page, limits=limits,
+        )
+        res = run_magick(cmd, timeout=process_timeout, cancel_event=cancel_event)
+        if res.returncode == 0 and os.path.exists(dst_path):
+            size = os.path.getsize(dst_path)
+            # A closest-attempt result (never in tolerance) is accepted when it reproduces exactly
+            if target_bytes is None or within_tolerance(size, target_bytes, tolerance_pct) or size == won.get('bytes'):
+                cache.put(key, out_fmt, won, dst_path)
+                return dst_path, f"{size} Bytes ({size/1024:.2f} KB) [cached parameters]"
+
+    info = {}
+    measured = []
+    prior = curves.load(digest, settings) if curves is not None and target_bytes is not None else None
+    try:
+        out_path, size_str = convert_with_target(
+            src_path, out_dir, out_fmt, target_bytes, tolerance_pct, trim_pdf, gif_opts,
+            default_density=default_density, magick_bin=magick_bin, info=info,
+            prior=prior, measured=measured, page=page, limits=limits,
+            process_timeout=process_timeout, cancel_event=cancel_event, **kwargs
+        )
+    finally:
+        # Measurements stay valid even if this run timed out or failed
+        if curves is not None:
+            curves.add(digest, settings, measured)
+    # Multi-page outputs and timed fallbacks aren't reproducible results worth keeping
+    if out_path == dst_path and info and not info.get('timed_out'):
+        info['bytes'] = os.path.getsize(out_path)
+        cache.put(key, out_fmt, info, out_path)
+    return out_path, size_str
+
+
+def convert_pdf_to_gif(pdf_path, output_dir, fca_value, frame_value, opt_value, magick_path, custom_fca_frame_cmd=None):
+    # Get the PDF name and the directory to save the GIF in
+    pdf_name = os.path.basename(pdf_path)  # Get the PDF filename
+    pdf_dir = os.path.dirname(pdf_path)
+    gif_name = pdf_name.replace('.pdf', '.gif')  # Create the GIF name
+    gif_path = os.path.join(pdf_dir, gif_name)  # Save GIF in the same directory as the PDF
+
+    # Determine the FCA and Frame part of the command
+    if custom_fca_frame_cmd:
+        fca_frame_cmd = custom_fca_frame_cmd  # Use the custom value if provided
+    else:
+        # Construct the FCA and Frame part of the command
+        if fca_value == "Yes" and frame_value == "Loop":
+            fca_frame_cmd = "300 -loop 0"
+        elif fca_value == "No" and frame_value == "Loop":
+            fca_frame_cmd = "300 -loop 0"
+        elif fca_value == "Yes" and frame_value == "2":
+            fca_frame_cmd = "1000 -loop 1"
+        elif fca_value == "No" and frame_value == "2":
+            fca_frame_cmd = "200 -loop 5"
+        elif fca_value == "Yes" and frame_value == "3":
+            fca_frame_cmd = "500 -loop 1"
+        elif fca_value == "No" and frame_value == "3":
+            fca_frame_cmd = "200 -loop 4"
+        elif fca_value == "Yes" and frame_value == "4":
+            fca_frame_cmd = "350 -loop 1"
+        elif fca_value == "No" and frame_value == "4":
+            fca_frame_cmd = "200 -loop 3"
+        elif fca_value == "Yes" and frame_value == "5":
+            fca_frame_cmd = "250 -loop 1"
+        elif fca_value == "No" and frame_value == "5":
+            fca_frame_cmd = "166 -loop 3"
+        elif fca_value == "Yes" and frame_value == "6":
+            fca_frame_cmd = "250 -loop 1"
+        elif fca_value == "No" and frame_value == "6":
+            fca_frame_cmd = "150 -loop 3"
+        elif fca_value == "Yes" and frame_value == "7":
+            fca_frame_cmd = "220 -loop 1"
+        elif fca_value == "No" and frame_value == "7":
+            fca_frame_cmd = "140 -loop 3"
+        elif fca_value == "Yes" and frame_value == "8":
+            fca_frame_cmd = "220 -loop 1"
+        elif fca_value == "No" and frame_value == "8":
+            fca_frame_cmd = "166 -loop 2"
+        elif fca_value == "Yes" and frame_value == "9":
+            fca_frame_cmd = "220 -loop 1"
+        elif fca_value == "No" and frame_value == "9":
+            fca_frame_cmd = "150 -loop 2"
+        else:
+            fca_frame_cmd = "-delay 500 -loop 0"  # Default command if no match
+
+    opt_cmd = "-layers Optimize" if opt_value == "Yes" else ""
+    opt_cmd1 = "-coalesce -dispose background -alpha background +dither"
+    opt_cmd2 = "+map -scale 25% +set comment"
+
+    # Use portable_magick binaries for conversion
+    if os.path.basename(magick_path) == 'magick':
+        cmd = [magick_path, 'convert', '-density', '288', '-delay']
+    else:
+        cmd = [magick_path, '-density', '288', '-delay']
+    cmd += fca_frame_cmd.split() + opt_cmd1.split() + (opt_cmd.split() if opt_cmd else []) + opt_cmd2.split()
+    cmd += [pdf_path, gif_path]
+
+    # Run the command with portable environment
+    convert_result = run_magick(cmd)
+    print("Convert STDOUT:", convert_result.stdout.decode())
+    print("Convert STDERR:", convert_result.stderr.decode())
+    print("ImageMagick Command:", cmd)
+    if convert_result.returncode != 0:
+        print("ERROR: ImageMagick convert failed!")
+        if not os.path.exists(gif_path):
+            print(f"ERROR: Expected GIF not created at {gif_path}")
+            return 0  # or handle error appropriately
+
+    # Optional gifsicle pass is disabled to keep only portable ImageMagick usage
+
+    # Get the exact size of the GIF in bytes, with existence check
+    if not os.path.exists(gif_path):
+        print(f"ERROR: Final GIF not found at {gif_path}")
+        return 0
+    gif_size_bytes = os.path.getsize(gif_path)
+
+    # Convert to KB with two decimal places
+    gif_size_kb = gif_size_bytes / 1024
+
+    # Return details
+    return pdf_name, gif_path, f"{gif_size_bytes} Bytes ({gif_size_kb:.2f} KB)"
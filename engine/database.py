@@ -0,0 +1,58 @@
+"""
+Database Module
+Location of the app's SQLite database (config/database.db) and creation of its settings tables.
+"""
+
+import os
+import sqlite3
+
+# The application directory (where app.py lives)
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Define the name of your database file
+db_file = 'database.db'  # You can choose any name you like
+
+# Create the 'config' directory path
+config_dir = os.path.join(basedir, 'config')
+
+# Create the full path to the database file inside the 'config' directory
+path_db = os.path.join(config_dir, db_file)
+
+
+def init_database(path_db=path_db):
+    """Create the config directory and the settings tables if they don't exist yet.
+    Called by the GUI and the command-line converter rather than at import time."""
+    os.makedirs(os.path.dirname(path_db), exist_ok=True)
+    conn = None
+    try:
+        # Connect to the SQLite database (this will create the database file if it doesn't exist)
+        conn = sqlite3.connect(path_db)
+
+        # Create a cursor object to execute SQL commands
+        cursor = conn.cursor()
+
+        # Create the tables if they don't already exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS paths (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT UNIQUE,  -- This will store either 'convert_path' or 'gifsicle_path'
+                path TEXT          -- This will store the actual path
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+        # Paths are now hardcoded to portable_magick, so DB values are ignored
+
+        # Commit changes and close the connection
+        conn.commit()
+
+    except sqlite3.OperationalError as e:
+        print(f"Error connecting to the database: {e}")
+    finally:
+        if conn:
+            conn.close()  # Always close the connection
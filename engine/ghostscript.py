@@ -0,0 +1,143 @@
+"""
+Ghostscript Module
+The 'gs' PDF backend: PDF pages are rendered by calling Ghostscript directly instead of through
+ImageMagick's delegate, which runs it single-threaded with default memory settings and reads the
+page back through an intermediate file. Here the render uses several threads on banded memory
+and writes a raster (raw PPM for JPG output, PNG with alpha otherwise) that the encode stage
+decodes like any image. Without a Ghostscript binary, or when a render fails, ImageMagick
+renders the page as before.
+"""
+
+import os
+import shutil
+
+from .magick import MAGICK_DIR, run_magick, get_magick_threads, decode_source_once, pdf_page_count
+
+PDF_BACKENDS = ('magick', 'gs')
+
+# Ghostscript binary override, e.g. Scripts/gs_standin.py where gs isn't installed
+GS_ENV = 'GS_PROG'
+
+# Band buffer per rendering thread; smaller when the job's memory limit is tight
+GS_BUFFER_SPACE = 64 * 1024 * 1024
+GS_MIN_BUFFER = 4 * 1024 * 1024
+
+# Raster handed to the encode stage: raw PPM is the cheapest to write and read; PNG keeps the
+# transparent page background ImageMagick's own render has (pngalpha)
+GS_DEVICES = {'raw': ('ppmraw', 'ppm'), 'png': ('pngalpha', 'png')}
+
+
+def find_gs_bin():
+    # $GS_PROG first, then a gs bundled with portable_magick, then the system's
+    override = os.environ.get(GS_ENV)
+    if override:
+        return shutil.which(override)
+    path = os.path.join(MAGICK_DIR, 'bin', 'gs')
+    if os.path.isfile(path) and os.access(path, os.X_OK):
+        return path
+    return shutil.which('gs') or shutil.which('gswin64c') or shutil.which('gswin32c')
+
+
+_gs_bin = None
+
+
+def get_gs_bin():
+    """The Ghostscript binary for direct renders, or None (resolved on first use)."""
+    global _gs_bin
+    if _gs_bin is None:
+        _gs_bin = find_gs_bin()
+    return _gs_bin
+
+
+def band_settings(threads, memory=None):
+    """(BufferSpace, MaxBitmap) in bytes for a render on `threads` threads.
+    Ghostscript only renders on several threads when it bands the page, so with threads > 1 any
+    page bigger than one band buffer is banded. Every thread holds a band buffer, so the buffers
+    are kept within the job's memory limit (memory.magick_limits) when there is one; a
+    single-threaded render keeps the whole page in memory up to that limit.
+    """
+    buffer_space = GS_BUFFER_SPACE
+    if memory:
+        buffer_space = max(GS_MIN_BUFFER, min(buffer_space, int(memory) // (threads + 1)))
+    if threads > 1:
+        return buffer_space, buffer_space
+    return buffer_space, int(memory) if memory else None
+
+
+def build_gs_command(src_path, dst_path, density, page=None, trim=False, device='ppmraw', threads=1,
+                     buffer_space=None, max_bitmap=None, gs_bin=None):
+    """Build a Ghostscript argv rendering one page of src_path (all pages if page is None) at
+    density dpi into dst_path, antialiased like ImageMagick's render.
+    trim: render the TrimBox instead of the MediaBox (ImageMagick's pdf:use-trimbox).
+    """
+    cmd = [
+        gs_bin or get_gs_bin(), '-q', '-dSAFER', '-dBATCH', '-dNOPAUSE', '-dNOPROMPT',
+        f'-sDEVICE={device}', f'-r{density}', '-dTextAlphaBits=4', '-dGraphicsAlphaBits=4',
+    ]
+    if threads > 1:
+        cmd.append(f'-dNumRenderingThreads={threads}')
+    if buffer_space:
+        cmd.append(f'-dBufferSpace={int(buffer_space)}')
+    if max_bitmap is not None:
+        cmd.append(f'-dMaxBitmap={int(max_bitmap)}')
+    if trim:
+        cmd.append('-dUseTrimBox')
+    if page is not None:
+        cmd += [f'-dFirstPage={page + 1}', f'-dLastPage={page + 1}']
+    # Ghostscript expands % in output names (page numbers)
+    cmd += ['-sOutputFile=' + dst_path.replace('%', '%%'), '-f', src_path]
+    return cmd
+
+
+def rasterize_pdf(src_path, work_dir, density, page=None, trim=False, out_fmt='jpg', limits=None,
+                  timeout=None, cancel_event=None, gs_bin=None):
+    """Render one PDF page into work_dir with Ghostscript; returns the raster's path, or None
+    without a Ghostscript binary, for a whole multi-page PDF (page None) or if the render failed.
+    Rendering threads follow the batch's per-child thread budget (magick.set_magick_threads).
+    """
+    gs_bin = gs_bin or get_gs_bin()
+    if not gs_bin or (page is None and pdf_page_count(src_path) != 1):
+        return None
+    device, ext = GS_DEVICES['raw' if out_fmt == 'jpg' else 'png']
+    raster_path = os.path.join(work_dir, f"gs_{density}_{'trim' if trim else 'full'}_{page}.{ext}")
+    if os.path.exists(raster_path):
+        return raster_path
+    threads = get_magick_threads() or os.cpu_count() or 1
+    buffer_space, max_bitmap = band_settings(threads, (limits or {}).get('memory'))
+    cmd = build_gs_command(
+        src_path, raster_path, density, page=page, trim=trim, device=device, threads=threads,
+        buffer_space=buffer_space, max_bitmap=max_bitmap, gs_bin=gs_bin
+    )
+    try:
+        res = run_magick(cmd, timeout=timeout, cancel_event=cancel_event)
+    except OSError:
+        return None
+    if res.returncode != 0 or not os.path.exists(raster_path) or not os.path.getsize(raster_path):
+        return None
+    return raster_path
+
+
+def decode_pdf_once(src_path, work_dir, density=None, trim=False, scale=100, magick_bin=None, page=None,
+                    limits=None, timeout=None, cancel_event=None, trim_box=None, out_fmt='jpg'):
+    """decode_source_once with PDF pages rendered by rasterize_pdf. The page is rendered inside
+    its TrimBox, so trim_box crops (or -trim scans) the raster exactly as they would ImageMagick's
+    render; the raster is removed once the pixel cache is built. Other sources, and pages
+    Ghostscript couldn't render, go through decode_source_once unchanged.
+    """
+    raster = None
+    if src_path.lower().endswith('.pdf') and density is not None:
+        raster = rasterize_pdf(
+            src_path, work_dir, density, page=page, trim=trim, out_fmt=out_fmt, limits=limits,
+            timeout=timeout, cancel_event=cancel_event
+        )
+    if raster is None:
+        return decode_source_once(
+            src_path, work_dir, density=density, trim=trim, scale=scale, magick_bin=magick_bin, page=page,
+            limits=limits, timeout=timeout, cancel_event=cancel_event, trim_box=trim_box
+        )
+    cache_path = decode_source_once(
+        raster, work_dir, density=density, trim=trim, scale=scale, magick_bin=magick_bin, limits=limits,
+        timeout=timeout, cancel_event=cancel_event, trim_box=trim_box
+    )
+    os.remove(raster)
+    return cache_path
@@ -0,0 +1,780 @@
+"""
+ImageMagick Module
+Locates the bundled (or system) ImageMagick, runs commands through it, optionally via a pool of
+persistent `magick -script` workers, and builds the convert command lines used by the engine.
+"""
+
+import os
+import re
+import sys
+import math
+import mmap
+import time
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+
+
+def resource_path(relative_path):
+    """Get absolute path to resource, works for dev and for PyInstaller bundle."""
+    if hasattr(sys, '_MEIPASS'):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+MAGICK_DIR = resource_path('portable_magick')
+
+
+def find_portable_magick_bin():
+    # Prefer 'magick' (IM v7) if present, fall back to 'convert' (IM v6)
+    for name in ('magick', 'convert'):
+        path = os.path.join(MAGICK_DIR, 'bin', name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def find_system_magick_bin():
+    # Headless installs (e.g. a Linux batch box) may rely on the distribution's ImageMagick
+    return shutil.which('magick') or shutil.which('convert')
+
+
+_magick_bin = None
+
+
+def get_magick_bin():
+    """The ImageMagick entry point: the bundled copy, else one on PATH, or None.
+    Resolved on first use rather than at import; a missing binary only becomes an error when
+    something actually runs it (see run_magick)."""
+    global _magick_bin
+    if _magick_bin is None:
+        _magick_bin = find_portable_magick_bin() or find_system_magick_bin()
+    return _magick_bin
+
+
+# Thread budget: how each child divides the CPUs when several run at once
+THREAD_MODES = ('multi', 'single', 'off')
+
+# Threads each magick child may use (None = ImageMagick's default of one per core)
+magick_threads = None
+
+
+def threads_per_job(mode, workers, cores=None):
+    """OpenMP threads per magick child for a batch of `workers` concurrent jobs.
+    'multi': the cores are split between the jobs, so few jobs each get several threads;
+    'single': every job is single-threaded (best with Workers close to the core count);
+    'off': None, leaving ImageMagick to use every core in every child.
+    """
+    if mode == 'off':
+        return None
+    if mode == 'single':
+        return 1
+    cores = cores or os.cpu_count() or 1
+    return max(1, cores // max(1, int(workers)))
+
+
+def set_magick_threads(threads):
+    """Set the per-child thread budget picked up by portable_env(); returns the previous one."""
+    global magick_threads
+    previous, magick_threads = magick_threads, threads
+    return previous
+
+
+def get_magick_threads():
+    return magick_threads
+
+
+def portable_env():
+    env = os.environ.copy()
+    if magick_threads is not None:
+        # Keep cores x workers OpenMP threads from fighting over the CPUs
+        env['MAGICK_THREAD_LIMIT'] = str(magick_threads)
+        env['OMP_NUM_THREADS'] = str(magick_threads)
+    magick_bin_dir = os.path.join(MAGICK_DIR, 'bin')
+    env['PATH'] = os.pathsep.join([magick_bin_dir, env.get('PATH', '')])
+    lib_dir = os.path.join(MAGICK_DIR, 'lib')
+    if os.path.isdir(lib_dir):
+        # Prepend ImageMagick lib dir to ensure it takes precedence over PIL bundled libs
+        # This fixes harfbuzz symbol conflicts between PIL and ImageMagick
+        env['DYLD_LIBRARY_PATH'] = lib_dir + os.pathsep + env.get('DYLD_LIBRARY_PATH', '')
+    return env
+
+    gs_path = os.path.join(magick_bin_dir, 'gs')
+    env['GS_PROG'] = gs_path
+    # If you have a modules directory, add:
+    # env['MAGICK_MODULE_PATH'] = os.path.join(MAGICK_DIR, 'lib', 'ImageMagick-7.*/modules-Q16HDRI/coders')
+    return env
+    return env
+
+
+class MagickTimeout(RuntimeError):
+    """An ImageMagick process ran past its wall-clock limit and was killed."""
+
+
+class BatchCancelled(Exception):
+    """The batch was cancelled; running ImageMagick processes were killed."""
+
+
+class ProbeStop:
+    """cancel_event for one of several concurrent probes: set once the batch is cancelled or the
+    search no longer needs this probe (stop). run_magick only polls is_set(); the worker pool
+    tells the two apart, so a stopped probe doesn't cost it a worker restart."""
+
+    def __init__(self, batch_event, stop):
+        self.batch_event = batch_event
+        self.stop = stop
+
+    def batch_cancelled(self):
+        return self.batch_event is not None and self.batch_event.is_set()
+
+    def is_set(self):
+        return self.stop.is_set() or self.batch_cancelled()
+
+
+# Own process group per child, so a kill also takes down the Ghostscript it spawned
+if os.name == 'posix':
+    PROCESS_GROUP = {'start_new_session': True}
+else:
+    PROCESS_GROUP = {'creationflags': getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0)}
+
+
+def kill_process_group(proc):
+    """Kill a child started with PROCESS_GROUP together with everything it spawned."""
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+def run_process(cmd, timeout=None, cancel_event=None, poll=0.2):
+    """subprocess.run for ImageMagick with a wall-clock limit and cancellation.
+    Kills the whole process group and raises MagickTimeout or BatchCancelled, so a hung
+    Ghostscript render can't hold a worker.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env(), **PROCESS_GROUP)
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        wait = poll if cancel_event is not None else None
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            wait = remaining if wait is None else min(wait, remaining)
+        try:
+            stdout, stderr = proc.communicate(timeout=wait)
+            return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            pass
+        if cancel_event is not None and cancel_event.is_set():
+            kill_process_group(proc)
+            proc.communicate()
+            raise BatchCancelled()
+        if deadline is not None and time.monotonic() >= deadline:
+            kill_process_group(proc)
+            proc.communicate()
+            raise MagickTimeout(f"ImageMagick killed after {timeout} s")
+
+
+# Persistent ImageMagick workers
+
+
+# Error (not warning) lines in ImageMagick's stderr, e.g. "... @ error/constitute.c/ReadImage/746."
+MAGICK_ERROR_RE = re.compile(rb"@ (?:error|fatal)/")
+
+
+def pooled(cmd):
+    """Whether a worker can run cmd: its last token must be an output file or coder:- (stdout).
+    Workers can't return anything else, e.g. info: text or null: results."""
+    dst = cmd[-1] if cmd else ''
+    return dst.endswith(':-') or not re.match(r'^[A-Za-z0-9]{2,}:', dst)
+
+
+# Resources memory.magick_limits sets per job; -limit is global, so pooled jobs reset them first
+POOL_RESET_RESOURCES = ('memory', 'map', 'disk')
+RESOURCE_LIMIT_RE = re.compile(r"^\s*(Memory|Map|Disk):\s*(\S+)\s*$", re.MULTILINE)
+
+
+def magick_resource_limits(magick_bin):
+    """ImageMagick's default {resource: value} for POOL_RESET_RESOURCES, from `magick -list resource`
+    (e.g. {'memory': '15.5GiB', 'map': '31GiB', 'disk': 'unlimited'}), or None if unreadable."""
+    try:
+        res = subprocess.run(
+            [magick_bin, '-list', 'resource'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env(),
+            timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    found = {name.lower(): value for name, value in RESOURCE_LIMIT_RE.findall(res.stdout.decode(errors='ignore'))}
+    if res.returncode != 0 or set(found) != set(POOL_RESET_RESOURCES):
+        return None
+    return found
+
+
+def script_quote(token):
+    """Quote one argv token for ImageMagick's script reader."""
+    return '"' + str(token).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class MagickWorker:
+    """One long-lived `magick -script -` process that executes commands fed through its stdin.
+
+    Each command from build_im_command is wrapped in parentheses (with -respect-parentheses so
+    image settings such as -density or -quality don't leak into the next job), written with
+    -write, and followed by a tiny marker image written as info: to a per-job file. -limit is a
+    global setting that parentheses don't scope, so every job first resets the resources a
+    job may limit to ImageMagick's defaults (limit_defaults, see magick_resource_limits). The marker file
+    appearing tells us the job finished; its output file existing again (it is removed first)
+    with no error in the job's stderr tells us it succeeded. Commands without an output file
+    (see pooled) don't go through workers.
+    """
+
+    def __init__(self, magick_bin, limit_defaults=None):
+        self.magick_bin = magick_bin
+        self.limit_defaults = limit_defaults or {}
+        self.worker_dir = tempfile.mkdtemp(prefix="imworker_")
+        self.stderr_path = os.path.join(self.worker_dir, 'stderr.log')
+        self.proc = None
+        self.jobs = 0
+        self.start()
+
+    def start(self):
+        self.stop()
+        self.stderr_file = open(self.stderr_path, 'ab')
+        self.proc = subprocess.Popen(
+            [self.magick_bin, '-script', '-'],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr_file, env=portable_env(),
+            **PROCESS_GROUP
+        )
+        self._send(['-respect-parentheses'])
+
+    def stop(self):
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=2)
+            except Exception:
+                kill_process_group(self.proc)
+                self.proc.wait()
+            self.proc = None
+            self.stderr_file.close()
+
+    def kill(self):
+        """Stop at once, e.g. on a hung or cancelled job (start() brings the worker back)."""
+        if self.proc is not None:
+            kill_process_group(self.proc)
+            self.proc.wait()
+            self.proc = None
+            self.stderr_file.close()
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.worker_dir, ignore_errors=True)
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def _send(self, tokens):
+        line = ' '.join(script_quote(t) for t in tokens) + '\n'
+        self.proc.stdin.write(line.encode('utf-8'))
+        self.proc.stdin.flush()
+
+    def _wait_for(self, marker, timeout, cancel_event=None):
+        """Poll for the job marker; returns False if the worker died, the job timed out or the
+        batch was cancelled."""
+        deadline = time.time() + timeout if timeout else None
+        delay = 0.001
+        while True:
+            if os.path.exists(marker) and os.path.getsize(marker) > 0:
+                return True
+            if not self.alive() or (deadline is not None and time.time() > deadline):
+                return False
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.02)
+
+    def ping(self, timeout=10):
+        """Health check: run an empty job and confirm the marker comes back."""
+        marker = os.path.join(self.worker_dir, 'ping.txt')
+        if os.path.exists(marker):
+            os.remove(marker)
+        try:
+            self._send(['(', '-size', '1x1', 'xc:none', '-format', 'ok', '-write', f'info:{marker}', ')', '-delete', '0--1'])
+        except (BrokenPipeError, OSError, ValueError):
+            return False
+        return self._wait_for(marker, timeout)
+
+    def run(self, cmd, timeout=None, cancel_event=None):
+        """Run a build_im_command argv in this worker; returns a subprocess.CompletedProcess.
+        Raises RuntimeError if the worker crashed, hung or was cancelled (the caller restarts it)."""
+        job = self.send(cmd)
+        if not self._wait_for(job['marker'], timeout, cancel_event):
+            raise RuntimeError("magick worker crashed, timed out or was cancelled")
+        return self.collect(job)
+
+    def send(self, cmd):
+        """Queue cmd on the worker; returns the job for _wait_for(job['marker']) and collect()."""
+        self.jobs += 1
+        marker = os.path.join(self.worker_dir, f'done_{self.jobs}.txt')
+        dst = cmd[-1]
+        to_stdout = dst.endswith(':-')
+        if to_stdout:
+            # Script workers can't stream to our stdout; write a per-job file and read it back
+            fmt = dst[:-2]
+            out_path = os.path.join(self.worker_dir, f'out_{self.jobs}.{fmt}')
+            dst = f'{fmt}:{out_path}'
+        else:
+            out_path = dst
+        # A file left by an earlier run must not pass for this job's output
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        err_offset = os.path.getsize(self.stderr_path)
+        resets = []
+        for resource, value in self.limit_defaults.items():
+            resets += ['-limit', resource, value]
+        try:
+            self._send(
+                resets + ['('] + list(cmd[1:-1]) + ['-write', dst, ')', '-delete', '0--1']
+                + ['(', '-size', '1x1', 'xc:none', '-format', 'done', '-write', f'info:{marker}', ')', '-delete', '0--1']
+            )
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise RuntimeError(f"magick worker pipe closed: {e}")
+        return {
+            'cmd': cmd, 'marker': marker, 'out_path': out_path, 'to_stdout': to_stdout, 'err_offset': err_offset,
+        }
+
+    def collect(self, job):
+        """Result of a job whose marker has appeared, as a subprocess.CompletedProcess."""
+        cmd, out_path, to_stdout = job['cmd'], job['out_path'], job['to_stdout']
+        os.remove(job['marker'])
+        with open(self.stderr_path, 'rb') as f:
+            f.seek(job['err_offset'])
+            stderr = f.read()
+        stdout = b''
+        ok = os.path.exists(out_path) and not MAGICK_ERROR_RE.search(stderr)
+        if to_stdout and os.path.exists(out_path):
+            if ok:
+                with open(out_path, 'rb') as f:
+                    stdout = f.read()
+            os.remove(out_path)
+        return subprocess.CompletedProcess(cmd, 0 if ok else 1, stdout, stderr)
+
+
+class MagickWorkerPool:
+    """A fixed set of MagickWorker processes shared by all conversion threads.
+    Workers are health-checked when handed out and restarted after a crash or hang."""
+
+    def __init__(self, size, magick_bin=None, job_timeout=600):
+        magick_bin = magick_bin or get_magick_bin()
+        self.magick_bin = magick_bin
+        self.job_timeout = job_timeout
+        self.limit_defaults = magick_resource_limits(magick_bin)
+        self.idle = queue.Queue()
+        self.restarts = 0
+        self.closed = False
+        self.workers = []
+        for _ in range(max(1, int(size))):
+            worker = MagickWorker(magick_bin, self.limit_defaults)
+            self.workers.append(worker)
+            self.idle.put(worker)
+
+    def run(self, cmd, timeout=None, cancel_event=None):
+        """Run cmd on an idle worker. Returns None after a crash (the caller falls back to a
+        one-off process); raises MagickTimeout / BatchCancelled like run_process.
+        A probe stopped by its ProbeStop (not by the batch) returns at once, but its job is left
+        to finish in the background rather than killing the worker, as long as its output goes
+        to the worker's own directory.
+        Commands with -limit values run as one-off processes when the defaults to reset them to
+        afterwards are unknown."""
+        if self.limit_defaults is None and '-limit' in cmd:
+            return None
+        worker = self.idle.get()
+        timeout = min(timeout, self.job_timeout) if timeout else self.job_timeout
+        started = time.time()
+        try:
+            if not worker.alive():
+                worker.start()
+            job = worker.send(cmd)
+            if worker._wait_for(job['marker'], timeout, cancel_event):
+                return worker.collect(job)
+            remaining = timeout - (time.time() - started)
+            if (isinstance(cancel_event, ProbeStop) and not cancel_event.batch_cancelled() and job['to_stdout']
+                    and worker.alive() and remaining > 0):
+                threading.Thread(target=self.drain, args=(worker, job, remaining), daemon=True).start()
+                worker = None
+                raise BatchCancelled()
+            raise RuntimeError("magick worker crashed, timed out or was cancelled")
+        except RuntimeError:
+            # Crashed, hung or cancelled: replace the process
+            self.restart(worker)
+            if cancel_event is not None and cancel_event.is_set():
+                raise BatchCancelled()
+            if time.time() - started >= timeout:
+                raise MagickTimeout(f"ImageMagick worker killed after {timeout} s")
+            return None
+        finally:
+            if worker is not None:
+                self.idle.put(worker)
+
+    def restart(self, worker):
+        self.restarts += 1
+        worker.kill()
+        worker.start()
+        if not worker.ping():
+            worker.start()
+
+    def drain(self, worker, job, timeout):
+        """Let a stopped probe's job run out, drop its output and hand the worker back."""
+        try:
+            if worker._wait_for(job['marker'], timeout):
+                worker.collect(job)
+            elif not self.closed:
+                self.restart(worker)
+        except (RuntimeError, OSError):
+            if not self.closed:
+                self.restart(worker)
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        self.closed = True
+        for worker in self.workers:
+            worker.close()
+
+
+# Active pool (None = spawn one process per command)
+magick_pool = None
+
+
+def start_magick_pool(size, magick_bin=None):
+    """Start the shared worker pool. Needs IM7's `magick` (script mode); returns None otherwise."""
+    global magick_pool
+    if magick_pool is not None:
+        return magick_pool
+    magick_bin = magick_bin or get_magick_bin()
+    if not magick_bin or os.path.basename(magick_bin) != 'magick':
+        return None
+    try:
+        pool = MagickWorkerPool(size, magick_bin)
+    except OSError as e:
+        print(f"Warning: could not start magick workers: {e}")
+        return None
+    if not all(w.ping() for w in pool.workers):
+        print("Warning: magick workers failed health check; using one process per command")
+        pool.close()
+        return None
+    magick_pool = pool
+    return pool
+
+
+def stop_magick_pool():
+    global magick_pool
+    if magick_pool is not None:
+        magick_pool.close()
+        magick_pool = None
+
+
+# Event loop running the current batch's processes (aio.AsyncRunner; None = run them here)
+async_runner = None
+
+
+def set_async_runner(runner):
+    """Route run_magick through an aio.AsyncRunner (None to stop); returns the previous one."""
+    global async_runner
+    previous, async_runner = async_runner, runner
+    return previous
+
+
+def get_async_runner():
+    return async_runner
+
+
+def run_magick(cmd, timeout=None, cancel_event=None):
+    """Run an ImageMagick argv: through the worker pool when one is running, else on the batch's
+    event loop when one is streaming (which has its own cancel event), else as a child process.
+    timeout: wall-clock seconds before the process (group) is killed with MagickTimeout;
+    cancel_event: threading.Event that kills it with BatchCancelled once set.
+    """
+    if not cmd[0]:
+        raise FileNotFoundError("No usable ImageMagick binary ('magick' or 'convert') found in portable_magick/bin or on PATH.")
+    pool = magick_pool
+    # Legacy `magick convert ...` argv (IM6 syntax) isn't valid in script mode; run those directly
+    if pool is not None and cmd and cmd[0] == pool.magick_bin and cmd[1:2] != ['convert'] and pooled(cmd):
+        res = pool.run(cmd, timeout=timeout, cancel_event=cancel_event)
+        if res is not None:
+            return res
+    runner = async_runner
+    if runner is not None:
+        return runner.run(cmd, timeout=timeout)
+    return run_process(cmd, timeout=timeout, cancel_event=cancel_event)
+
+
+magick_versions = {}
+
+
+def magick_version(magick_bin=None):
+    """First line of `magick -version` (cached); part of the result cache key."""
+    magick_bin = magick_bin or get_magick_bin()
+    if not magick_bin:
+        return ''
+    if magick_bin not in magick_versions:
+        try:
+            res = subprocess.run([magick_bin, '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env())
+            magick_versions[magick_bin] = res.stdout.decode(errors='ignore').splitlines()[0].strip()
+        except (OSError, IndexError):
+            magick_versions[magick_bin] = ''
+    return magick_versions[magick_bin]
+
+
+# zlib level of fast PNG probes; the final encode always uses 9
+FAST_PNG_LEVEL = 1
+
+
+def build_im_command(src_path, dst_path, out_fmt, quality=None, colors=None, scale=100, density=None,
+                     trim=False, gif_timing=None, magick_bin=None, extent=None, page=None, limits=None,
+                     trim_box=None, src_size=None, fast=False, remap=None):
+    """Build an ImageMagick convert command using only portable_magick.
+    gif_timing: dict with keys {delay, loop} or fca/frame/opt/custom string use-case.
+    extent: JPG only; byte budget handed to the encoder via jpeg:extent.
+    page: read only this zero-based page/frame of the source (src[page]).
+    limits: optional {resource: bytes} passed as -limit (see memory.magick_limits).
+    trim_box: with trim, the content box from pdf_trim_box; cropped at this density instead of
+    letting -trim scan the full-resolution raster.
+    src_size: (width, height) of a JPG/PNG source from its header (memory.image_dimensions).
+    With scale < 100 the output size is computed up front, so JPEGs can be decoded at reduced
+    size (jpeg:size, twice the output) and reduced with -thumbnail to exact dimensions.
+    fast: PNG only; cheap zlib level for search probes whose bytes are rescaled to predict the
+    final encode (see convert_with_target's fast_probes).
+    remap: PNG/GIF only; palette image (derive_palette) applied with -remap instead of quantizing
+    with -colors. All GIF frames then share it, so +map is skipped.
+    """
+    cmd = [magick_bin or get_magick_bin()]
+    # Resource limits have to be in place before the input is read
+    for resource, value in (limits or {}).items():
+        cmd += ['-limit', resource, str(int(value))]
+    # PDF density must come before input
+    if density is not None:
+        cmd += ['-density', str(density)]
+
+    # For animated inputs, coalesce should occur AFTER the input is read.
+
+    # Shrink-on-load: libjpeg scales by 1/2 to 1/8 while decoding, so fewer pixels are decoded at all
+    out_size = None
+    if src_size and scale < 100 and src_path.lower().endswith(('.jpg', '.jpeg', '.png')):
+        out_size = [max(1, int(v * scale / 100.0 + 0.5)) for v in src_size]
+        if src_path.lower().endswith(('.jpg', '.jpeg')):
+            cmd += ['-define', f'jpeg:size={2 * out_size[0]}x{2 * out_size[1]}']
+
+    # For PDFs, when trimming is requested, use the TrimBox on import
+    if trim and src_path.lower().endswith('.pdf'):
+        cmd += ['-define', 'pdf:use-trimbox=true']
+
+    # Input
+    cmd += [src_path if page is None else f"{src_path}[{page}]"]
+
+    if trim and trim_box is not None:
+        cmd += ['-crop', crop_geometry(trim_box, density), '+repage']
+    elif trim:
+        cmd += ['-trim', '+repage']
+
+    # Apply coalesce only when output is GIF (or a pixel cache feeding GIF probes) and the input is an animated GIF
+    if out_fmt in ('gif', 'mpc') and src_path.lower().endswith('.gif'):
+        cmd += ['-coalesce']
+
+    # Common operations
+    if out_fmt == 'jpg':
+        if quality is not None:
+            cmd += ['-quality', str(quality)]
+        if extent is not None:
+            cmd += ['-define', f'jpeg:extent={int(extent)}']
+        cmd += ['-strip', '-interlace', 'Plane', '-sampling-factor', '4:2:0']
+    elif out_fmt in ('png', 'gif'):
+        if remap is not None:
+            cmd += ['-dither', 'None', '-remap', remap]
+        elif colors is not None:
+            cmd += ['-dither', 'None', '-colors', str(colors)]
+        if out_fmt == 'png':
+            cmd += ['-strip', '-define', f'png:compression-level={FAST_PNG_LEVEL if fast else 9}']
+        if out_fmt == 'gif':
+            cmd += ['-layers', 'Optimize'] + ([] if remap is not None else ['+map'])
+
+    if out_size is not None:
+        # The decode may already be smaller than the source, so size the result absolutely
+        cmd += ['-thumbnail', f'{out_size[0]}x{out_size[1]}!']
+    elif scale != 100:
+        cmd += ['-resize', f'{scale}%']
+
+    # GIF timing controls (only for GIF output)
+    if out_fmt == 'gif' and gif_timing:
+        if isinstance(gif_timing, str):
+            cmd += ['-delay'] + gif_timing.split()
+        else:
+            delay = gif_timing.get('delay')
+            loop = gif_timing.get('loop')
+            if delay is not None:
+                cmd += ['-delay', str(delay)]
+            if loop is not None:
+                cmd += ['-loop', str(loop)]
+
+    # Output
+    cmd += [dst_path]
+    return cmd
+
+
+def decode_source_once(src_path, work_dir, density=None, trim=False, scale=100, magick_bin=None, page=None,
+                       limits=None, timeout=None, cancel_event=None, trim_box=None):
+    """Decode src_path a single time into an MPC pixel cache inside work_dir.
+    Probes then read the memory-mapped cache instead of re-decoding the source
+    (or re-rasterizing a PDF through Ghostscript) on every attempt.
+    Returns the cache path, or None if decoding failed.
+    """
+    cache_path = os.path.join(work_dir, f"src_{density}_{'trim' if trim else 'full'}_{scale}.mpc")
+    if os.path.exists(cache_path):
+        return cache_path
+    cmd = build_im_command(
+        src_path, cache_path, 'mpc', quality=None, colors=None, scale=scale, density=density,
+        trim=trim, gif_timing=None, magick_bin=magick_bin, page=page, limits=limits, trim_box=trim_box
+    )
+    res = run_magick(cmd, timeout=timeout, cancel_event=cancel_event)
+    if res.returncode != 0 or not os.path.exists(cache_path):
+        return None
+    return cache_path
+
+
+# Pixels kept from the one full quantization of a source; smaller palettes are quantized from them
+PALETTE_SAMPLE = 512 * 512
+
+
+def palette_base(src_path, work_dir, density=None, trim=False, magick_bin=None, page=None, limits=None,
+                 timeout=None, cancel_event=None, trim_box=None):
+    """Quantize src_path (all frames side by side) to 256 colors once and keep a PALETTE_SAMPLE
+    pixel sample of the result in work_dir. The sample keeps the colors' frequencies, so palettes
+    derived from it (derive_palette) are weighted like a quantization of the full image.
+    Returns the sample's path, or None if quantizing failed.
+    """
+    fd, base_path = tempfile.mkstemp(prefix="palette_", suffix=".png", dir=work_dir)
+    os.close(fd)
+    # The builder's input handling (density, trim, page, GIF coalesce) with the quantization appended
+    cmd = build_im_command(
+        src_path, base_path, 'mpc', density=density, trim=trim, magick_bin=magick_bin, page=page,
+        limits=limits, trim_box=trim_box
+    )
+    cmd[-1:-1] = ['+append', '-dither', 'None', '-colors', '256', '-sample', f'{PALETTE_SAMPLE}@>']
+    res = run_magick(cmd, timeout=timeout, cancel_event=cancel_event)
+    if res.returncode != 0 or not os.path.getsize(base_path):
+        return None
+    return base_path
+
+
+def derive_palette(base_path, colors, magick_bin=None, timeout=None, cancel_event=None):
+    """Palette image of at most `colors` colors quantized from a palette_base sample, for
+    build_im_command(remap=...); returns its path, or None if quantizing failed."""
+    palette_path = f"{os.path.splitext(base_path)[0]}_{int(colors)}.png"
+    cmd = [
+        magick_bin or get_magick_bin(), base_path, '-dither', 'None', '-colors', str(int(colors)), '-unique-colors',
+        palette_path,
+    ]
+    res = run_magick(cmd, timeout=timeout, cancel_event=cancel_event)
+    if res.returncode != 0 or not os.path.exists(palette_path):
+        return None
+    return palette_path
+
+
+# Density of the render pdf_trim_box measures on: one pixel per point
+TRIM_DENSITY = 72
+TRIM_GEOMETRY_RE = re.compile(r"^(\d+)x(\d+)([+-]\d+)([+-]\d+)$")
+
+trim_boxes = {}
+
+
+def pdf_trim_box(src_path, page=None, magick_bin=None, timeout=None, cancel_event=None):
+    """Content box (x, y, width, height) in points of a PDF page (inside its TrimBox), as -trim
+    would find it, measured once on a TRIM_DENSITY render and cached per file, page and
+    modification time. The box covers exactly the render pixels -trim keeps, with no padding.
+    None if it can't be measured (several frames, blank page, failed render); callers then trim.
+    Runs as a one-off process: the info: text can't come back through a script worker. Only
+    a finished measurement is cached; a binary that can't be started is retried next time.
+    """
+    try:
+        st = os.stat(src_path)
+    except OSError:
+        return None
+    key = (os.path.abspath(src_path), page, st.st_mtime_ns, st.st_size)
+    if key in trim_boxes:
+        return trim_boxes[key]
+    cmd = [
+        magick_bin or get_magick_bin(), '-density', str(TRIM_DENSITY), '-define', 'pdf:use-trimbox=true',
+        src_path if page is None else f"{src_path}[{page}]", '-format', '%@\n', 'info:',
+    ]
+    try:
+        res = run_process(cmd, timeout=timeout, cancel_event=cancel_event)
+    except OSError:
+        return None
+    lines = res.stdout.decode(errors='ignore').split() if res.returncode == 0 else []
+    m = TRIM_GEOMETRY_RE.match(lines[0]) if len(lines) == 1 else None
+    box = None
+    if m:
+        w, h, x, y = (int(v) for v in m.groups())
+        if w > 1 or h > 1:
+            unit = 72.0 / TRIM_DENSITY
+            box = (x * unit, y * unit, w * unit, h * unit)
+    trim_boxes[key] = box
+    return box
+
+
+def crop_geometry(box, density=None):
+    """-crop geometry covering a pdf_trim_box box on a render at density (default 72)."""
+    f = (density or 72) / 72.0
+    x0, y0 = int(math.floor(box[0] * f)), int(math.floor(box[1] * f))
+    x1, y1 = int(math.ceil((box[0] + box[2]) * f)), int(math.ceil((box[1] + box[3]) * f))
+    return f"{x1 - x0}x{y1 - y0}+{x0}+{y0}"
+
+
+# One indirect object: number, generation and its dictionary up to the stream or endobj
+PDF_OBJECT_RE = re.compile(rb"(?<![0-9])(\d+)\s+\d+\s+obj\b(.*?)(?:\bstream\b|\bendobj\b)", re.DOTALL)
+PDF_PAGES_RE = re.compile(rb"/Type\s*/Pages(?![A-Za-z])")
+PDF_COUNT_RE = re.compile(rb"/Count\s+(\d+)")
+
+
+def pdf_page_count(path, magick_bin=None):
+    """Number of pages in a PDF, or None if it can't be determined.
+    Reads /Count of the root /Pages node (the one without a /Parent) from the raw bytes without
+    rendering anything. Incrementally updated and linearized files keep superseded copies of
+    objects, so only the last definition of each object number counts. PDFs that keep their
+    page tree in compressed object streams fall back to `identify -ping`.
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            latest = {}
+            for m in PDF_OBJECT_RE.finditer(data):
+                latest[int(m.group(1))] = m.group(2)
+        for body in latest.values():
+            count = PDF_COUNT_RE.search(body)
+            if count and PDF_PAGES_RE.search(body) and b'/Parent' not in body:
+                return int(count.group(1))
+    except (OSError, ValueError):
+        pass
+    magick_bin = magick_bin or get_magick_bin()
+    if not magick_bin:
+        return None
+    if os.path.basename(magick_bin).lower().startswith('magick'):
+        cmd = [magick_bin, 'identify']
+    else:
+        cmd = [os.path.join(os.path.dirname(magick_bin), 'identify')]
+    try:
+        res = subprocess.run(cmd + ['-ping', '-format', '%n\n', path],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=portable_env(), timeout=60)
+        return int(res.stdout.split()[0]) if res.returncode == 0 else None
+    except (OSError, ValueError, IndexError, subprocess.TimeoutExpired):
+        return None
@@ -0,0 +1,187 @@
+"""
+Memory Module
+Pre-flight raster memory estimates and admission control: a batch only starts a job when its
+estimated pixel memory fits in a global budget, and each magick process is given matching
+-limit values so a wrong estimate spills to ImageMagick's disk cache instead of into swap.
+"""
+
+import os
+import re
+import mmap
+import struct
+import shutil
+import tempfile
+import threading
+
+from .scheduler import read_meminfo
+
+MiB = 1024 * 1024
+GiB = 1024 * MiB
+
+# Bytes per pixel in ImageMagick's pixel cache: 4 channels (RGBA, PDFs render with alpha) of
+# 4-byte samples in the bundled Q16 HDRI build
+PIXEL_BYTES = 16
+# Extra working memory on top of the pixel cache: Ghostscript's page buffer, -trim/-resize copies
+OVERHEAD = 1.25
+# Charged for jobs whose size can't be read from the file header
+UNKNOWN_JOB_BYTES = 256 * MiB
+# Smallest -limit memory handed to a job, so small jobs never touch the disk cache
+MIN_JOB_LIMIT = 256 * MiB
+# Share of the memory available at batch start that admitted jobs may reserve
+DEFAULT_BUDGET_FRACTION = 0.75
+
+MEDIA_BOX_RE = re.compile(rb"/MediaBox\s*\[\s*(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s*\]")
+
+
+def pdf_page_box(path):
+    """(width, height) in points of the largest /MediaBox in a PDF, or None.
+    The largest box stands in for every page: boxes may be inherited from the page tree, so
+    matching them to page numbers without a PDF parser isn't reliable, and overestimating
+    only costs some parallelism.
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            best = None
+            for m in MEDIA_BOX_RE.finditer(data):
+                x0, y0, x1, y1 = (float(v) for v in m.groups())
+                w, h = abs(x1 - x0), abs(y1 - y0)
+                if best is None or w * h > best[0] * best[1]:
+                    best = (w, h)
+            return best
+    except (OSError, ValueError):
+        return None
+
+
+def image_dimensions(path):
+    """(width, height) in pixels from a PNG, GIF or JPEG header, or None."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(26)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if head[:2] != b'\xff\xd8':
+                return None
+            # JPEG: walk the segments up to the first start-of-frame marker
+            f.seek(2)
+            while True:
+                byte = f.read(1)
+                if not byte:
+                    return None
+                if byte != b'\xff':
+                    continue
+                marker = f.read(1)
+                while marker == b'\xff':
+                    marker = f.read(1)
+                if not marker:
+                    return None
+                code = marker[0]
+                if code in (0x01, 0xd8) or 0xd0 <= code <= 0xd7:
+                    continue  # standalone markers have no length
+                length_bytes = f.read(2)
+                if len(length_bytes) < 2:
+                    return None
+                length = struct.unpack('>H', length_bytes)[0]
+                if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+                    sof = f.read(5)
+                    if len(sof) < 5:
+                        return None
+                    height, width = struct.unpack('>HH', sof[1:5])
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def raster_pixels(src_path, density=None, pages=1, box=None):
+    """Pixels one job decodes, or None if the size is unknown.
+    PDFs: page size x density^2 per page (pages > 1 when a whole PDF is read at once, e.g. for
+    GIF output); box may pass an already-read pdf_page_box. Images: width x height from the header.
+    """
+    if src_path.lower().endswith('.pdf'):
+        box = box or pdf_page_box(src_path)
+        if box is None:
+            return None
+        density = density or 288
+        return (box[0] / 72.0 * density) * (box[1] / 72.0 * density) * max(1, pages)
+    dims = image_dimensions(src_path)
+    if dims is None:
+        return None
+    return dims[0] * dims[1]
+
+
+def estimate_job_memory(src_path, density=None, pages=1, box=None):
+    """Estimated peak memory in bytes for rasterizing one job, or None if the size is unknown
+    (arguments as for raster_pixels)."""
+    pixels = raster_pixels(src_path, density, pages=pages, box=box)
+    if pixels is None:
+        return None
+    return int(pixels * PIXEL_BYTES * OVERHEAD)
+
+
+def default_memory_budget():
+    """DEFAULT_BUDGET_FRACTION of the currently available memory, or None where it can't be read."""
+    mem = read_meminfo()
+    if mem is None:
+        return None
+    return int(mem[0] * DEFAULT_BUDGET_FRACTION)
+
+
+def magick_limits(granted, estimate):
+    """-limit values for one job: RAM up to its granted share of the budget, the same again as
+    memory-mapped cache, and enough disk for the whole pixel cache if the estimate was low."""
+    memory = max(MIN_JOB_LIMIT, int(granted))
+    try:
+        disk_free = shutil.disk_usage(tempfile.gettempdir()).free
+    except OSError:
+        disk_free = None
+    disk = max(GiB, 2 * int(estimate or 0))
+    if disk_free:
+        disk = min(disk, disk_free)
+    return {'memory': memory, 'map': memory, 'disk': disk}
+
+
+class MemoryBudget:
+    """Admits jobs in arrival order while their reserved memory fits in `total` bytes.
+    A job larger than the whole budget is capped to it, so it still runs, just on its own.
+    """
+
+    def __init__(self, total):
+        self.total = int(total)
+        self.used = 0
+        self.running = 0
+        self.peak = 0
+        self.waits = 0
+        self.next_ticket = 0
+        self.serving = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, nbytes):
+        """Block until nbytes (capped to the budget) can be reserved; returns the reservation."""
+        nbytes = min(int(nbytes), self.total)
+        with self.cond:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            waited = False
+            while ticket != self.serving or (self.running and self.used + nbytes > self.total):
+                waited = True
+                self.cond.wait()
+            self.serving += 1
+            self.used += nbytes
+            self.running += 1
+            self.peak = max(self.peak, self.used)
+            self.waits += waited
+            self.cond.notify_all()
+        return nbytes
+
+    def release(self, nbytes):
+        with self.cond:
+            self.used -= nbytes
+            self.running -= 1
+            self.cond.notify_all()
+
+    def summary(self):
+        """Budget, peak reservation and how many jobs had to wait, for the batch summary."""
+        with self.cond:
+            return {'budget': self.total, 'peak_reserved': self.peak, 'waited_jobs': self.waits}
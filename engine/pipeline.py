@@ -0,0 +1,88 @@
+"""
+Pipeline Module
+The first stage of a pipelined batch: PDF pages that need a target-mode pre-pass are rasterized
+on a pool of their own, a bounded number of pages ahead of the encode/search workers, so
+Ghostscript-bound and encoder-bound work overlap across files.
+"""
+
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RasterStage:
+    """Runs render(src_path, page) -> (work_dir, raster_path) or None for `jobs` in order on
+    `workers` threads, with at most `depth` rasters rendering or waiting to be taken at once.
+
+    The encode stage calls take(job) instead of rasterizing itself. A job the stage hasn't
+    started yet is handed back (take returns None) and rasterized by the caller, so the encode
+    stage never waits on work that is stuck behind the queue bound.
+    """
+
+    def __init__(self, jobs, render, workers, depth, cancel_event=None):
+        self.jobs = list(jobs)
+        self.render = render
+        self.depth = max(1, int(depth))
+        self.cancel_event = cancel_event
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+        self.room = threading.Semaphore(self.depth)
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.claimed = set()
+        self.stopped = False
+        self.started = 0
+        self.taken = 0
+        self.feeder = threading.Thread(target=self.feed, daemon=True)
+
+    def start(self):
+        self.feeder.start()
+        return self
+
+    def stopping(self):
+        return self.stopped or (self.cancel_event is not None and self.cancel_event.is_set())
+
+    def feed(self):
+        for job in self.jobs:
+            while not self.room.acquire(timeout=0.2):
+                if self.stopping():
+                    return
+            with self.lock:
+                if self.stopping():
+                    self.room.release()
+                    return
+                if job in self.claimed:
+                    self.room.release()
+                    continue
+                self.futures[job] = self.executor.submit(self.render, *job)
+                self.started += 1
+
+    def take(self, job):
+        """render's result for job, waiting for it if the render is under way; None if the stage
+        hasn't started it (the caller rasterizes it instead). Render errors are
+        raised here. The caller owns work_dir afterwards."""
+        with self.lock:
+            future = self.futures.pop(job, None)
+            if future is None:
+                self.claimed.add(job)
+                return None
+            self.taken += 1
+        try:
+            return future.result()
+        finally:
+            self.room.release()
+
+    def close(self):
+        """Stop feeding, drop renders nobody took and remove their rasters."""
+        with self.lock:
+            self.stopped = True
+            leftover = list(self.futures.values())
+            self.futures.clear()
+        if self.feeder.is_alive():
+            self.feeder.join()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for future in leftover:
+            if future.done() and not future.cancelled() and future.exception() is None and future.result():
+                shutil.rmtree(future.result()[0], ignore_errors=True)
+
+    def summary(self):
+        return {'depth': self.depth, 'started': self.started, 'taken': self.taken}
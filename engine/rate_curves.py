@@ -0,0 +1,84 @@
+"""
+Rate Curves Module
+Measured (density, scale, quality/colors) -> bytes points per source file, so a new Target KB
+for a file that was converted before can start from the interpolated answer instead of
+re-probing the same qualities.
+"""
+
+import json
+import time
+import sqlite3
+
+
+class RateCurveStore:
+    """Probe measurements keyed by source hash and the settings that shape the encode.
+
+    settings is a dict (output format, preset density, trim, GIF timing, ImageMagick version,
+    shared palettes, image encoder and PDF renderer; see convert.cache_key);
+    points are (density, scale, value, bytes) in convert_with_target's own density/scale terms.
+    Points not refreshed within max_age_days are dropped.
+    """
+
+    def __init__(self, database, max_age_days=180):
+        self.database = database
+        self.max_age = max_age_days * 86400
+        conn = sqlite3.connect(self.database, timeout=10)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_curve (
+                    source TEXT,     -- SHA-256 of the source file
+                    settings TEXT,   -- JSON of the settings the points depend on
+                    density INTEGER, -- NULL for raster sources
+                    scale INTEGER,
+                    value INTEGER,   -- JPEG quality or palette size
+                    bytes INTEGER,
+                    updated REAL,
+                    PRIMARY KEY (source, settings, density, scale, value)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load(self, source, settings):
+        """Return {(density, scale): {value: bytes}} for source under settings."""
+        conn = sqlite3.connect(self.database, timeout=10)
+        try:
+            rows = conn.execute(
+                "SELECT density, scale, value, bytes FROM rate_curve WHERE source = ? AND settings = ?",
+                (source, json.dumps(settings, sort_keys=True, default=str))
+            ).fetchall()
+        finally:
+            conn.close()
+        curves = {}
+        for density, scale, value, size in rows:
+            curves.setdefault((density, scale), {})[value] = size
+        return curves
+
+    def add(self, source, settings, points):
+        """Store (density, scale, value, bytes) points, replacing earlier measurements of the same encode."""
+        if not points:
+            return
+        # A run can measure the same encode twice (e.g. a jpeg:extent result the search probes
+        # again); the latest measurement wins
+        latest = {}
+        for density, scale, value, size in points:
+            latest[(density, scale, value)] = size
+        now = time.time()
+        blob = json.dumps(settings, sort_keys=True, default=str)
+        conn = sqlite3.connect(self.database, timeout=10)
+        try:
+            # SQLite treats NULLs as distinct in a primary key, so clear NULL-density rows explicitly
+            for density, scale, value in latest:
+                conn.execute(
+                    "DELETE FROM rate_curve WHERE source = ? AND settings = ? AND density IS ? AND scale = ? AND value = ?",
+                    (source, blob, density, scale, value)
+                )
+            conn.executemany(
+                "INSERT INTO rate_curve(source, settings, density, scale, value, bytes, updated) VALUES(?, ?, ?, ?, ?, ?, ?)",
+                [(source, blob, density, scale, value, size, now) for (density, scale, value), size in latest.items()]
+            )
+            conn.execute("DELETE FROM rate_curve WHERE updated < ?", (now - self.max_age,))
+            conn.commit()
+        finally:
+            conn.close()
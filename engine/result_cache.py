@@ -0,0 +1,145 @@
+"""
+Result Cache Module
+Content-addressed cache of conversion results. Entries are keyed by a hash of the source
+file's bytes plus the full parameter set, so re-running the same folders with the same
+settings links or copies finished outputs into place instead of converting again.
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+
+
+# (path, size, mtime) -> digest, so the pages of one PDF are hashed once per batch
+_digests = {}
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key in _digests:
+        return _digests[memo_key]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    _digests[memo_key] = h.hexdigest()
+    return _digests[memo_key]
+
+
+class ResultCache:
+    """Winning parameters (and optionally output bytes) per (source hash, parameters) key.
+
+    The index lives in the app's SQLite database; output bytes live as files in cache_dir.
+    Stored bytes are evicted least-recently-used once they exceed max_bytes.
+    """
+
+    def __init__(self, database, cache_dir, max_bytes=2 * 1024 ** 3, store_outputs=True):
+        self.database = database
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.store_outputs = store_outputs
+        os.makedirs(cache_dir, exist_ok=True)
+        conn = sqlite3.connect(self.database, timeout=10)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    key TEXT PRIMARY KEY,
+                    out_fmt TEXT,
+                    params TEXT,     -- winning parameters as JSON
+                    file TEXT,       -- cached output file name inside cache_dir, or NULL
+                    size INTEGER,    -- bytes of the cached output file (0 if not stored)
+                    last_used REAL
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def make_key(self, src_path, params, digest=None):
+        """Key = hash of the source bytes (digest, if already computed) plus the JSON-encoded parameter set."""
+        blob = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(((digest or file_digest(src_path)) + blob).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return {'params': dict, 'path': cached output or None} and mark it used, or None."""
+        conn = sqlite3.connect(self.database, timeout=10)
+        try:
+            row = conn.execute("SELECT params, file, size FROM result_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            params_json, file_name, size = row
+            path = os.path.join(self.cache_dir, file_name) if file_name else None
+            if path and (not os.path.exists(path) or os.path.getsize(path) != size):
+                # Bytes were removed or changed behind our back (e.g. an edited hard-linked output);
+                # the parameters are still usable
+                conn.execute("UPDATE result_cache SET file = NULL, size = 0 WHERE key = ?", (key,))
+                path = None
+            conn.execute("UPDATE result_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return {'params': json.loads(params_json), 'path': path}
+        finally:
+            conn.close()
+
+    def put(self, key, out_fmt, params, out_path):
+        """Record the winning parameters for key, plus a copy of out_path when storing outputs."""
+        file_name = None
+        size = 0
+        if self.store_outputs and out_path and os.path.exists(out_path):
+            file_name = f"{key}.{out_fmt}"
+            tmp_path = os.path.join(self.cache_dir, file_name + '.part')
+            shutil.copyfile(out_path, tmp_path)
+            os.replace(tmp_path, os.path.join(self.cache_dir, file_name))
+            size = os.path.getsize(out_path)
+        conn = sqlite3.connect(self.database, timeout=10)
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache(key, out_fmt, params, file, size, last_used) VALUES(?, ?, ?, ?, ?, ?)",
+                (key, out_fmt, json.dumps(params, default=str), file_name, size, time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        if size:
+            self.evict()
+
+    def materialize(self, path, dst_path):
+        """Put a cached output at dst_path: hard link when possible, otherwise copy."""
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        try:
+            os.link(path, dst_path)
+        except OSError:
+            # Different filesystem (e.g. network share) or links unsupported
+            shutil.copyfile(path, dst_path)
+
+    def evict(self):
+        """Drop the least recently used stored outputs until the total fits max_bytes."""
+        conn = sqlite3.connect(self.database, timeout=10)
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = conn.execute(
+                "SELECT key, file, size FROM result_cache WHERE file IS NOT NULL ORDER BY last_used ASC"
+            ).fetchall()
+            for key, file_name, size in rows:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                except OSError:
+                    pass
+                # Keep the winning parameters; they still save the search on the next run
+                conn.execute("UPDATE result_cache SET file = NULL, size = 0 WHERE key = ?", (key,))
+                total -= size
+            conn.commit()
+        finally:
+            conn.close()
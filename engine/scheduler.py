@@ -0,0 +1,154 @@
+"""
+Scheduler Module
+Adaptive concurrency for batches: samples CPU utilisation, load average and available memory
+(from /proc on Linux) and grows or shrinks the number of conversions running at once within
+user-set bounds. Elsewhere the limit simply stays at the maximum.
+"""
+
+import os
+import time
+import threading
+
+
+def read_cpu_times():
+    """(busy, total) jiffies summed over all CPUs from /proc/stat, or None if unavailable."""
+    try:
+        with open('/proc/stat') as f:
+            fields = [int(v) for v in f.readline().split()[1:9]]
+    except (OSError, ValueError):
+        return None
+    if len(fields) < 4:
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+    total = sum(fields)
+    return total - idle, total
+
+
+def read_meminfo():
+    """(available, total) bytes from /proc/meminfo, or None if unavailable."""
+    values = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('MemAvailable', 'MemTotal'):
+                    values[key] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        return None
+    if 'MemAvailable' not in values or 'MemTotal' not in values:
+        return None
+    return values['MemAvailable'], values['MemTotal']
+
+
+def load_average():
+    """1-minute load average, or None if the platform doesn't provide one."""
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+class AdaptiveScheduler:
+    """Limits how many conversions run at once and adjusts the limit every `interval` seconds.
+
+    Grows by one when jobs are waiting, the CPUs are under-used and memory is plentiful; shrinks
+    by one when available memory runs low or the machine is oversubscribed. Jobs call acquire()
+    before starting and release() when done. on_change(limit) is called after every adjustment.
+    """
+
+    # Thresholds: CPU busy fraction below which we grow, load per core above which we shrink,
+    # available-memory fractions below which we shrink / above which growing is allowed
+    grow_below_cpu = 0.75
+    shrink_above_load = 1.5
+    shrink_below_mem = 0.10
+    grow_above_mem = 0.25
+
+    def __init__(self, min_workers, max_workers, interval=2.0, on_change=None):
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers))
+        self.interval = interval
+        self.on_change = on_change
+        self.cores = os.cpu_count() or 1
+        self.prev_cpu = read_cpu_times()
+        self.adaptive = self.prev_cpu is not None
+        # Start at one job per core (within bounds) where we can measure, at the maximum otherwise
+        start = min(self.max_workers, self.cores) if self.adaptive else self.max_workers
+        self.limit = max(self.min_workers, start)
+        self.running = 0
+        self.waiting = 0
+        self.peak = 0
+        self.decisions = []  # {'t', 'from', 'to', 'reason'}
+        self.cond = threading.Condition()
+        self.started = time.monotonic()
+        self.last_check = self.started
+
+    def acquire(self):
+        with self.cond:
+            self.waiting += 1
+            try:
+                self.maybe_adjust()
+                while self.running >= self.limit:
+                    self.cond.wait(timeout=self.interval)
+                    self.maybe_adjust()
+            finally:
+                self.waiting -= 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def release(self):
+        with self.cond:
+            self.running -= 1
+            self.maybe_adjust()
+            self.cond.notify_all()
+
+    def maybe_adjust(self):
+        """Re-evaluate the limit if the interval has passed; call with self.cond held."""
+        now = time.monotonic()
+        if not self.adaptive or now - self.last_check < self.interval:
+            return
+        self.last_check = now
+        cpu = read_cpu_times()
+        if cpu is None:
+            return
+        busy = cpu[0] - self.prev_cpu[0]
+        total = cpu[1] - self.prev_cpu[1]
+        self.prev_cpu = cpu
+        if total <= 0:
+            return
+        cpu_busy = busy / total
+        load = load_average()
+        load_per_core = load / self.cores if load is not None else 0.0
+        mem = read_meminfo()
+        mem_free = mem[0] / mem[1] if mem else 1.0
+
+        new_limit, reason = self.limit, None
+        if mem_free < self.shrink_below_mem:
+            new_limit = self.limit - 1
+            reason = f"low memory ({mem[0] // (1024 * 1024)} MB available)"
+        elif load_per_core > self.shrink_above_load and cpu_busy > 0.9:
+            new_limit = self.limit - 1
+            reason = f"oversubscribed (load {load_per_core:.1f} per core)"
+        elif self.waiting and cpu_busy < self.grow_below_cpu and mem_free > self.grow_above_mem:
+            new_limit = self.limit + 1
+            reason = f"CPU {cpu_busy:.0%} busy with jobs waiting"
+        new_limit = max(self.min_workers, min(self.max_workers, new_limit))
+        if new_limit != self.limit:
+            self.decisions.append({
+                't': round(now - self.started, 1), 'from': self.limit, 'to': new_limit, 'reason': reason,
+            })
+            self.limit = new_limit
+            self.cond.notify_all()
+            if self.on_change:
+                self.on_change(new_limit)
+
+    def summary(self):
+        """What the scheduler did, for the batch summary."""
+        with self.cond:
+            return {
+                'adaptive': self.adaptive,
+                'min_workers': self.min_workers,
+                'max_workers': self.max_workers,
+                'final_workers': self.limit,
+                'peak_running': self.peak,
+                'decisions': list(self.decisions),
+            }
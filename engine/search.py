@@ -0,0 +1,208 @@
+"""
+Search Module
+Strategies that pick the quality or palette size expected to hit a byte target, plus the
+resolution planner used when no quality fits.
+"""
+
+import math
+
+
+def within_tolerance(size_bytes, target_bytes, tolerance_pct):
+    lo = target_bytes * (1 - tolerance_pct / 100.0)
+    hi = target_bytes * (1 + tolerance_pct / 100.0)
+    return lo <= size_bytes <= hi
+
+
+class SearchTimeout(Exception):
+    """Raised by a probe when the per-file time budget is used up."""
+
+
+def bisect_search(lo, hi, probe, target_bytes, tolerance_pct, log_param=False, probe_many=None):
+    """Plain bisection over the integer range lo..hi.
+    probe(value) returns the encoded size in bytes, or None if the encode failed.
+    probe_many(values), when given, probes several values concurrently (see speculative_search).
+    Returns the value whose size landed within tolerance, or None.
+    """
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        size = probe(mid)
+        if size is None:
+            # On error, move lower to try a smaller file
+            hi = mid - 1
+            continue
+        if within_tolerance(size, target_bytes, tolerance_pct):
+            return mid
+        if size > target_bytes:
+            hi = mid - 1
+        else:
+            lo = mid + 1
+    return None
+
+
+def interpolation_search(lo, hi, probe, target_bytes, tolerance_pct, log_param=False, probe_many=None):
+    """Model-guided search over the integer range lo..hi.
+    Fits log(bytes) against the parameter (or log of the parameter when log_param is set,
+    which suits palette sizes) through the sizes already measured and jumps to the value
+    predicted to hit target_bytes. The first step uses a typical slope; afterwards the
+    secant through the bracketing points is used. Guesses are clamped to the open bracket
+    and fall back to bisection when the same bound moves twice in a row, so it never does
+    worse than bisect_search by more than a probe or two.
+    Same contract as bisect_search.
+    """
+    def x_of(v):
+        return math.log(v) if log_param else float(v)
+
+    def v_of(x):
+        return math.exp(x) if log_param else x
+
+    # Typical d(log bytes)/dx: JPEG grows ~3.5x from q20 to q90, palettes ~2x from 16 to 256 colors
+    prior_slope = math.log(2) / math.log(16) if log_param else math.log(3.5) / 70
+    y_target = math.log(target_bytes)
+    below = None  # (x, log bytes) of the largest value measured under target
+    above = None  # (x, log bytes) of the smallest value measured over target
+    moved = []  # which bound moved on each step ('lo'/'hi')
+    guess = (lo + hi) // 2
+    while lo <= hi:
+        value = min(max(guess, lo), hi)
+        size = probe(value)
+        if size is None:
+            hi = value - 1
+            moved.append('hi')
+        elif within_tolerance(size, target_bytes, tolerance_pct):
+            return value
+        else:
+            point = (x_of(value), math.log(max(size, 1)))
+            if size > target_bytes:
+                above = point
+                hi = value - 1
+                moved.append('hi')
+            else:
+                below = point
+                lo = value + 1
+                moved.append('lo')
+        if lo > hi:
+            break
+
+        # Predict the next value from the model
+        x_guess = None
+        if below and above and above[1] != below[1]:
+            x_guess = below[0] + (y_target - below[1]) * (above[0] - below[0]) / (above[1] - below[1])
+        elif below or above:
+            x0, y0 = below or above
+            x_guess = x0 + (y_target - y0) / prior_slope
+        bisect_now = len(moved) >= 2 and moved[-1] == moved[-2] and below and above
+        if x_guess is None or bisect_now:
+            guess = (lo + hi) // 2
+        else:
+            guess = int(round(v_of(x_guess)))
+            if not lo <= guess <= hi:
+                # Prediction fell outside the bracket; step to the nearest end instead
+                guess = lo if guess < lo else hi
+    return None
+
+
+def predict_resolution(history, target_bytes):
+    """Predict the linear resolution (PDF density, or resize %) expected to hit target_bytes.
+    history holds (resolution, bytes) pairs: the smallest over-target size measured at each
+    resolution tried so far. Bytes are modelled as resolution**k; k is fitted from the last two
+    points when available, otherwise k=2 (bytes proportional to pixel count).
+    """
+    res, size = history[-1]
+    k = 2.0
+    if len(history) >= 2:
+        prev_res, prev_size = history[-2]
+        if prev_res != res and prev_size != size:
+            k = math.log(prev_size / size) / math.log(prev_res / res)
+            k = min(max(k, 1.0), 3.0)
+    return res * (target_bytes / size) ** (1.0 / k)
+
+
+def predict_from_points(points, target_bytes, log_param=False):
+    """Value expected to hit target_bytes given earlier {value: bytes} measurements.
+    Interpolates log(bytes) between the two points that straddle the target (on log value when
+    log_param is set, as in interpolation_search); with points on one side only, extrapolates
+    from the nearest one with the same typical slope. Returns an int, or None without points.
+    """
+    if not points:
+        return None
+
+    def x_of(v):
+        return math.log(v) if log_param else float(v)
+
+    prior_slope = math.log(2) / math.log(16) if log_param else math.log(3.5) / 70
+    y_target = math.log(target_bytes)
+    below = [(v, s) for v, s in points.items() if s <= target_bytes]
+    above = [(v, s) for v, s in points.items() if s > target_bytes]
+    if below and above:
+        (v0, s0), (v1, s1) = max(below), min(above)
+        if s1 == s0 or v1 == v0:
+            return v0
+        x = x_of(v0) + (y_target - math.log(s0)) * (x_of(v1) - x_of(v0)) / (math.log(s1) - math.log(s0))
+    else:
+        v0, s0 = max(below) if below else min(above)
+        x = x_of(v0) + (y_target - math.log(max(s0, 1))) / prior_slope
+    return int(round(math.exp(x) if log_param else x))
+
+
+def speculative_search(lo, hi, probe, target_bytes, tolerance_pct, log_param=False, probe_many=None):
+    """Probe several candidates at once while the batch has idle worker slots.
+    Each round offers probe_many the model's guess followed by values spread evenly across the
+    bracket (or a window around the guess once a model exists); probe_many runs as many as there are free slots and
+    returns {value: size}, stopping early on an in-tolerance hit. The bracket then shrinks to the
+    tightest pair around the target. Without probe_many this is interpolation_search.
+    Same contract as bisect_search.
+    """
+    if probe_many is None:
+        return interpolation_search(lo, hi, probe, target_bytes, tolerance_pct, log_param=log_param)
+
+    def x_of(v):
+        return math.log(v) if log_param else float(v)
+
+    # Same typical slopes as interpolation_search, used until both sides of the target are measured
+    prior_slope = math.log(2) / math.log(16) if log_param else math.log(3.5) / 70
+    # Any prefix of these fractions is spread evenly, however many slots probe_many gets
+    fractions = [0.5, 0.25, 0.75, 0.125, 0.625, 0.375, 0.875]
+    below = None  # (value, size) of the largest value measured under target
+    above = None  # (value, size) of the smallest value measured over target
+    while lo <= hi:
+        guess = (lo + hi) // 2
+        win_lo, win_hi = lo, hi
+        x = None
+        if below and above and above[1] != below[1]:
+            t = (math.log(target_bytes) - math.log(below[1])) / (math.log(above[1]) - math.log(below[1]))
+            x = x_of(below[0]) + t * (x_of(above[0]) - x_of(below[0]))
+        elif below or above:
+            v0, size0 = below or above
+            x = x_of(v0) + (math.log(target_bytes) - math.log(size0)) / prior_slope
+        if x is not None:
+            guess = min(max(int(round(math.exp(x) if log_param else x)), lo), hi)
+            # With a model, spend the extra probes close to its guess
+            width = max(1, (hi - lo) // 4)
+            win_lo, win_hi = max(lo, guess - width), min(hi, guess + width)
+        candidates = [guess]
+        for f in fractions:
+            value = win_lo + int(round(f * (win_hi - win_lo)))
+            if value not in candidates:
+                candidates.append(value)
+        results = probe_many(candidates)
+        for value, size in results.items():
+            if size is not None and within_tolerance(size, target_bytes, tolerance_pct):
+                return value
+        for value, size in sorted(results.items()):
+            if size is None or size > target_bytes:
+                hi = min(hi, value - 1)
+                if size is not None and (above is None or value < above[0]):
+                    above = (value, size)
+            else:
+                lo = max(lo, value + 1)
+                if below is None or value > below[0]:
+                    below = (value, size)
+    return None
+
+
+# Pluggable search strategies for target mode; convert_with_target(search=...) accepts a name or a callable
+SEARCH_STRATEGIES = {
+    'bisect': bisect_search,
+    'interpolate': interpolation_search,
+    'speculative': speculative_search,
+}
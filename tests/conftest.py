@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_magick.py')
+
+
+@pytest.fixture
+def magick_bin(tmp_path):
+    """A `magick` executable running tests/stub_magick.py (named magick so the worker pool takes it)."""
+    if os.name != 'posix':
+        pytest.skip("the stub magick is a shell script")
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    path = bin_dir / 'magick'
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{STUB}" "$@"\n')
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """An input file the stub accepts (it only checks that the file exists)."""
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(b'\xff\xd8\xff\xd9')
+    return str(path)
+
+
+class Sleeper:
+    """Makes the stub sleep before converting, with a child process standing in for Ghostscript."""
+
+    def __init__(self, tmp_path, monkeypatch, seconds=30):
+        self.pid_file = tmp_path / 'child.pid'
+        monkeypatch.setenv('STUB_SLEEP', str(seconds))
+        monkeypatch.setenv('STUB_CHILD_PID', str(self.pid_file))
+
+    def child_gone(self, wait=3.0):
+        """True once the stub's child has exited (a zombie awaiting its reaper counts) within `wait` s."""
+        deadline = time.monotonic() + wait
+        while not self.pid_file.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        pid = int(self.pid_file.read_text())
+        while time.monotonic() < deadline:
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    if f.read().rsplit(')', 1)[1].split()[0] == 'Z':
+                        return True
+            except FileNotFoundError:
+                return True
+            time.sleep(0.05)
+        return False
+
+
+@pytest.fixture
+def sleeper(tmp_path, monkeypatch):
+    if not os.path.isdir('/proc'):
+        pytest.skip("needs /proc to check on the stub's child process")
+    return Sleeper(tmp_path, monkeypatch)
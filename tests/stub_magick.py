@@ -0,0 +1,189 @@
+"""
+Stand-in for ImageMagick's `magick` in the tests. Understands the argv build_im_command and the
+engine's helpers produce, one-off and in `-script -` mode (as MagickWorker drives it), and writes
+filler bytes whose count follows quality, palette size and resize like a real encode would:
+    jpg: STUB_BYTES * (scale/100)^2 * exp((quality - 85) / 30)
+    png/gif: STUB_BYTES * (scale/100)^2 * (log2(colors) + 1) / 9
+A missing input fails with an ImageMagick-style error line. Environment knobs:
+    STUB_BYTES      bytes of a full-size q85 JPEG (default 100000)
+    STUB_PAGES      what `identify` prints (default 1)
+    STUB_SLEEP      seconds to sleep before each conversion, with a child `sleep` of its own
+    STUB_CHILD_PID  file the sleeping child's pid is written to
+    STUB_WARN_ERROR write the output but also report an error on stderr
+    STUB_FAIL       inputs whose name contains this text fail as if unreadable
+    STUB_LIMITS_LOG file each conversion appends its memory/map/disk -limit values to; in
+                    -script mode limits are global and carry over to later jobs, as in ImageMagick
+"""
+
+import os
+import sys
+import json
+import math
+import shlex
+import subprocess
+import time
+
+RESOURCES = """Resource limits:
+  Width: 214.7MP
+  Height: 214.7MP
+  Area: 33.3GP
+  Memory: 15.5GiB
+  Map: 31GiB
+  Disk: unlimited
+  File: 768
+  Thread: 8
+"""
+DEFAULT_LIMITS = {'memory': '15.5GiB', 'map': '31GiB', 'disk': 'unlimited'}
+
+ERROR = "magick: unable to open image '{}': No such file or directory @ error/blob.c/OpenBlob/3596.\n"
+
+
+def spawn_sleeper():
+    seconds = float(os.environ['STUB_SLEEP'])
+    child = subprocess.Popen(['sleep', str(seconds + 1)])
+    pid_file = os.environ.get('STUB_CHILD_PID')
+    if pid_file:
+        with open(pid_file, 'w') as f:
+            f.write(str(child.pid))
+    time.sleep(seconds)
+
+
+def split_output(out):
+    """(format, path) of an output token: 'jpg:-', 'png:/tmp/x.png' or a plain file name."""
+    if ':' in out and len(out.split(':', 1)[0]) > 1:
+        fmt, path = out.split(':', 1)
+        return fmt, path
+    return os.path.splitext(out)[1][1:].lower(), out
+
+
+def apply_limits(args, limits):
+    """Fold the -limit settings in args into limits."""
+    for i, arg in enumerate(args[:-2]):
+        if arg == '-limit':
+            limits[args[i + 1]] = args[i + 2]
+
+
+def log_limits(limits):
+    log = os.environ.get('STUB_LIMITS_LOG')
+    if log:
+        with open(log, 'a') as f:
+            f.write(' '.join(f"{name}={limits[name]}" for name in ('memory', 'map', 'disk')) + '\n')
+
+
+def convert(args, out, stdout, stderr):
+    """Run one conversion; returns the exit status."""
+    quality, colors, scale, extent, src = 85, None, 1.0, None, None
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ('-quality', '-colors'):
+            if arg == '-quality':
+                quality = int(args[i + 1])
+            else:
+                colors = int(args[i + 1])
+            i += 2
+        elif arg in ('-resize', '-thumbnail'):
+            value = args[i + 1].rstrip('!')
+            if value.endswith('%'):
+                scale *= float(value[:-1]) / 100
+            i += 2
+        elif arg == '-define':
+            if args[i + 1].startswith('jpeg:extent='):
+                extent = int(args[i + 1].split('=')[1])
+            i += 2
+        elif arg == '-limit':
+            i += 3
+        elif arg in ('-density', '-interlace', '-sampling-factor', '-dither', '-layers', '-crop', '-remap',
+                     '-format', '-delay', '-loop', '-fuzz'):
+            i += 2
+        elif arg.startswith(('-', '+')):
+            i += 1
+        else:
+            src = src or arg
+            i += 1
+    path = (src or '').split('[')[0]
+    fail = os.environ.get('STUB_FAIL')
+    if not os.path.exists(path) or (fail and fail in os.path.basename(path)):
+        stderr.write(ERROR.format(src).encode())
+        return 1
+    if out.startswith('info:'):
+        stdout.write(b"100x80+0+0")
+        return 0
+    if path.endswith('.mpc'):
+        with open(path) as f:
+            scale *= json.load(f)['scale']
+    fmt, dst = split_output(out)
+    if fmt == 'mpc':
+        with open(dst, 'w') as f:
+            json.dump({'scale': scale}, f)
+        return 0
+    full = float(os.environ.get('STUB_BYTES', 100000)) * scale * scale
+    if fmt in ('jpg', 'jpeg'):
+        def size(q):
+            return int(full * math.exp((q - 85) / 30.0))
+        if extent is not None:
+            quality = 100
+            while quality > 1 and size(quality) > extent:
+                quality -= 1
+        nbytes = size(quality)
+    else:
+        nbytes = int(full * (math.log2(colors or 256) + 1) / 9)
+    data = b'x' * max(1, nbytes)
+    if dst == '-':
+        stdout.write(data)
+    else:
+        with open(dst, 'wb') as f:
+            f.write(data)
+    if os.environ.get('STUB_WARN_ERROR'):
+        stderr.write(b"magick: simulated failure @ error/stub.c/Convert/1.\n")
+    return 0
+
+
+def run_script(stdin, stderr):
+    """-script -: each line holds '( ARGS -write OUT ) -delete 0--1' groups, run in order."""
+    limits = dict(DEFAULT_LIMITS)
+    for line in stdin:
+        tokens = shlex.split(line)
+        while '(' in tokens:
+            start = tokens.index('(')
+            end = tokens.index(')', start)
+            apply_limits(tokens[:start], limits)
+            group, tokens = tokens[start + 1:end], tokens[end + 1:]
+            write = group.index('-write')
+            args, out = group[:write], group[write + 1]
+            if 'xc:none' in args:
+                # Job marker / ping: '-format TEXT -write info:FILE'
+                with open(out[len('info:'):], 'w') as f:
+                    f.write(args[args.index('-format') + 1])
+                continue
+            if os.environ.get('STUB_SLEEP'):
+                spawn_sleeper()
+            apply_limits(args, limits)
+            log_limits(limits)
+            convert(args, out, sys.stdout.buffer, stderr)
+            stderr.flush()
+
+
+def main(argv):
+    if argv[:1] == ['identify']:
+        print(os.environ.get('STUB_PAGES', '1'))
+        return 0
+    if argv[:1] == ['-version']:
+        print("Version: ImageMagick 7.1.1-0 (stub)")
+        return 0
+    if argv == ['-list', 'resource']:
+        sys.stdout.write(RESOURCES)
+        return 0
+    if argv == ['-script', '-']:
+        run_script(sys.stdin, sys.stderr.buffer)
+        return 0
+    if os.environ.get('STUB_SLEEP'):
+        spawn_sleeper()
+    limits = dict(DEFAULT_LIMITS)
+    apply_limits(argv[:-1], limits)
+    log_limits(limits)
+    return convert(argv[:-1], argv[-1], sys.stdout.buffer, sys.stderr.buffer)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
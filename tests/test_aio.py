@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from engine import magick
+from engine.aio import AsyncRunner, run_magick_async
+from engine.magick import BatchCancelled, MagickTimeout, build_im_command
+
+
+def test_timeout_kills_the_process_group(magick_bin, source, tmp_path, sleeper):
+    cmd = build_im_command(source, str(tmp_path / 'out.jpg'), 'jpg', magick_bin=magick_bin)
+    start = time.monotonic()
+    with pytest.raises(MagickTimeout):
+        asyncio.run(run_magick_async(cmd, timeout=1))
+    assert time.monotonic() - start < 10
+    assert sleeper.child_gone()
+
+
+def test_cancel_kills_running_processes(magick_bin, source, tmp_path, sleeper):
+    cancel = threading.Event()
+    threading.Timer(1, cancel.set).start()
+    runner = AsyncRunner(2, cancel_event=cancel)
+    results = []
+
+    def convert(name, page):
+        return magick.run_magick(build_im_command(source, str(tmp_path / name), 'jpg', magick_bin=magick_bin))
+
+    start = time.monotonic()
+    runner.run_jobs([('out.jpg', None)], convert, 1, lambda *args: results.append(args))
+    assert time.monotonic() - start < 10
+    assert isinstance(results[0][3], BatchCancelled)
+    assert sleeper.child_gone()
+    assert magick.get_async_runner() is None
+
+
+def test_results_stream_in_job_order(magick_bin, source, tmp_path):
+    runner = AsyncRunner(2)
+    results = []
+
+    def convert(quality, delay):
+        time.sleep(delay)
+        res = magick.run_magick(build_im_command(source, 'jpg:-', 'jpg', quality=quality, magick_bin=magick_bin))
+        return len(res.stdout)
+
+    jobs = [(85, 0.3), (55, 0.0), (25, 0.1)]
+    runner.run_jobs(jobs, convert, 3, lambda index, job, result, error: results.append((index, result, error)))
+    assert [index for index, _, _ in results] == [0, 1, 2]
+    assert [result for _, result, _ in results] == [100000, 36787, 13533]
+    summary = runner.summary()
+    assert summary['processes'] == 3
+    assert summary['peak_processes'] <= 2
+
+
+def test_submit_reports_finished_only_once_the_process_is_reaped(magick_bin, source, tmp_path, sleeper):
+    runner = AsyncRunner(2)
+    finished = threading.Event()
+    seen = {}
+
+    def convert(name, page):
+        fut = runner.submit(
+            build_im_command(source, str(tmp_path / name), 'jpg', magick_bin=magick_bin), finished=finished.set
+        )
+        time.sleep(1)
+        fut.cancel()
+        # The future is cancelled at once; the process exits a moment later
+        seen['cancelled'] = fut.cancelled()
+        seen['finished_at_cancel'] = finished.is_set()
+        seen['finished'] = finished.wait(10)
+        seen['child_gone'] = sleeper.child_gone()
+
+    runner.run_jobs([('out.jpg', None)], convert, 1, lambda *args: None)
+    assert seen == {'cancelled': True, 'finished_at_cancel': False, 'finished': True, 'child_gone': True}
+
+
+def test_submit_cancelled_before_it_starts_still_finishes(magick_bin, source):
+    runner = AsyncRunner(1)
+    finished = threading.Event()
+
+    def convert(name, page):
+        # Hold the loop so the submission can't start before it is cancelled
+        runner.loop.call_soon_threadsafe(time.sleep, 0.5)
+        fut = runner.submit(build_im_command(source, 'jpg:-', 'jpg', magick_bin=magick_bin), finished=finished.set)
+        fut.cancel()
+        return finished.wait(5)
+
+    results = []
+    runner.run_jobs([('out.jpg', None)], convert, 1, lambda index, job, result, error: results.append(result))
+    assert results == [True]
+    assert runner.summary()['processes'] == 0
@@ -0,0 +1,51 @@
+import json
+import signal
+
+import cli
+
+
+def run_cli(capsys, *argv):
+    # main() binds Ctrl-C to cancelling its batch; give it back to pytest afterwards
+    previous = signal.getsignal(signal.SIGINT)
+    try:
+        status = cli.main([str(arg) for arg in argv])
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return status, lines
+
+
+def test_target_size_batch(capsys, magick_bin, tmp_path):
+    sources = []
+    for name in ('b.jpg', 'a.png'):
+        path = tmp_path / name
+        path.write_bytes(b'\x00')
+        sources.append(path)
+    out_dir = tmp_path / 'out'
+    status, lines = run_cli(
+        capsys, *sources, '--target-kb', 50, '--out-dir', out_dir, '--magick', magick_bin, '--no-cache',
+    )
+    assert status == 0
+    results, summary = lines[:-1], lines[-1]
+    # One line per file, in input order
+    assert [line['src'] for line in results] == [str(path) for path in sources]
+    for line in results:
+        assert line['ok']
+        assert 46080 <= line['bytes'] <= 56320
+        assert line['out'].startswith(str(out_dir))
+    assert summary['event'] == 'summary'
+    assert (summary['files'], summary['ok'], summary['failed']) == (2, 2, 0)
+
+
+def test_failed_file_sets_the_exit_code(capsys, magick_bin, tmp_path, monkeypatch):
+    monkeypatch.setenv('STUB_FAIL', 'bad')
+    sources = []
+    for name in ('bad.jpg', 'good.jpg'):
+        path = tmp_path / name
+        path.write_bytes(b'\x00')
+        sources.append(path)
+    status, lines = run_cli(capsys, *sources, '--out-dir', tmp_path / 'out', '--magick', magick_bin, '--no-cache')
+    assert status == 1
+    assert [line['ok'] for line in lines[:-1]] == [False, True]
+    assert 'Default conversion failed' in lines[0]['error']
+    assert (lines[-1]['ok'], lines[-1]['failed']) == (1, 1)
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from engine import magick
+from engine.magick import BatchCancelled, MagickWorkerPool, ProbeStop, build_im_command, pooled, run_magick
+
+
+@pytest.fixture
+def pool(magick_bin):
+    pool = MagickWorkerPool(1, magick_bin)
+    yield pool
+    pool.close()
+
+
+def test_worker_writes_file_and_stdout_outputs(pool, magick_bin, source, tmp_path):
+    dst = str(tmp_path / 'out.jpg')
+    res = pool.run(build_im_command(source, dst, 'jpg', quality=85, magick_bin=magick_bin))
+    assert res.returncode == 0
+    assert (tmp_path / 'out.jpg').stat().st_size == 100000
+
+    res = pool.run(build_im_command(source, 'jpg:-', 'jpg', quality=85, scale=50, magick_bin=magick_bin))
+    assert res.returncode == 0
+    assert len(res.stdout) == 25000
+
+
+def test_failed_job_does_not_pass_off_a_stale_output(pool, magick_bin, tmp_path):
+    dst = tmp_path / 'out.jpg'
+    dst.write_bytes(b'left over from an earlier run')
+    res = pool.run(build_im_command(str(tmp_path / 'missing.jpg'), str(dst), 'jpg', quality=85, magick_bin=magick_bin))
+    assert res.returncode != 0
+    assert b'@ error/' in res.stderr
+    assert not dst.exists()
+
+
+def test_error_on_stderr_fails_the_job(magick_bin, source, tmp_path, monkeypatch):
+    monkeypatch.setenv('STUB_WARN_ERROR', '1')
+    pool = MagickWorkerPool(1, magick_bin)
+    try:
+        res = pool.run(build_im_command(source, 'jpg:-', 'jpg', quality=85, magick_bin=magick_bin))
+    finally:
+        pool.close()
+    assert res.returncode != 0
+    assert res.stdout == b''
+
+
+def test_jobs_see_only_their_own_stderr(pool, magick_bin, source, tmp_path):
+    pool.run(build_im_command(str(tmp_path / 'missing.jpg'), 'jpg:-', 'jpg', magick_bin=magick_bin))
+    res = pool.run(build_im_command(source, 'jpg:-', 'jpg', magick_bin=magick_bin))
+    assert res.returncode == 0
+    assert res.stderr == b''
+
+
+@pytest.mark.parametrize('dst, expected', [
+    ('/tmp/out.jpg', True),
+    ('out.png', True),
+    ('C:/out.jpg', True),
+    ('jpg:-', True),
+    ('info:', False),
+    ('null:', False),
+])
+def test_pooled(dst, expected):
+    assert pooled(['magick', 'in.jpg', dst]) is expected
+
+
+def test_info_output_bypasses_the_pool(magick_bin, source):
+    assert magick.start_magick_pool(1, magick_bin) is not None
+    try:
+        res = run_magick([magick_bin, source, '-format', '%wx%h%O', 'info:'])
+    finally:
+        magick.stop_magick_pool()
+    assert res.returncode == 0
+    assert res.stdout == b'100x80+0+0'
+
+
+def test_stopped_probe_keeps_its_worker(magick_bin, source, monkeypatch):
+    monkeypatch.setenv('STUB_SLEEP', '1')
+    pool = MagickWorkerPool(1, magick_bin)
+    try:
+        stop = threading.Event()
+        threading.Timer(0.2, stop.set).start()
+        start = time.monotonic()
+        with pytest.raises(BatchCancelled):
+            pool.run(build_im_command(source, 'jpg:-', 'jpg', quality=85, magick_bin=magick_bin),
+                     cancel_event=ProbeStop(threading.Event(), stop))
+        assert time.monotonic() - start < 0.9
+        # The next job waits for the stopped one to run out, on the same process
+        process = pool.workers[0].proc
+        res = pool.run(build_im_command(source, 'jpg:-', 'jpg', quality=55, magick_bin=magick_bin))
+        assert res.returncode == 0
+        assert len(res.stdout) == 36787
+        assert pool.workers[0].proc is process
+        assert pool.restarts == 0
+    finally:
+        pool.close()
+
+
+def test_batch_cancel_restarts_the_worker(magick_bin, source, monkeypatch):
+    monkeypatch.setenv('STUB_SLEEP', '1')
+    pool = MagickWorkerPool(1, magick_bin)
+    try:
+        batch = threading.Event()
+        threading.Timer(0.2, batch.set).start()
+        with pytest.raises(BatchCancelled):
+            pool.run(build_im_command(source, 'jpg:-', 'jpg', magick_bin=magick_bin),
+                     cancel_event=ProbeStop(batch, threading.Event()))
+        assert pool.restarts == 1
+    finally:
+        pool.close()
+
+
+def test_limits_do_not_leak_into_later_jobs(magick_bin, source, tmp_path, monkeypatch):
+    log = tmp_path / 'limits.log'
+    monkeypatch.setenv('STUB_LIMITS_LOG', str(log))
+    pool = MagickWorkerPool(1, magick_bin)
+    try:
+        limited = build_im_command(source, 'jpg:-', 'jpg', magick_bin=magick_bin,
+                                   limits={'memory': 1000, 'map': 1000, 'disk': 5000})
+        assert pool.run(limited).returncode == 0
+        assert pool.run(build_im_command(source, 'jpg:-', 'jpg', magick_bin=magick_bin)).returncode == 0
+    finally:
+        pool.close()
+    assert log.read_text().splitlines() == [
+        'memory=1000 map=1000 disk=5000',
+        'memory=15.5GiB map=31GiB disk=unlimited',
+    ]
+
+
+def test_limited_commands_skip_the_pool_without_known_defaults(magick_bin, source, monkeypatch):
+    monkeypatch.setattr(magick, 'magick_resource_limits', lambda magick_bin: None)
+    pool = MagickWorkerPool(1, magick_bin)
+    try:
+        limited = build_im_command(source, 'jpg:-', 'jpg', magick_bin=magick_bin, limits={'memory': 1000})
+        assert pool.run(limited) is None
+        assert pool.run(build_im_command(source, 'jpg:-', 'jpg', magick_bin=magick_bin)).returncode == 0
+    finally:
+        pool.close()
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from engine.memory import MemoryBudget
+
+
+def start_waiting(budget, nbytes, admitted, name):
+    thread = threading.Thread(target=lambda: admitted.append((name, budget.acquire(nbytes))), daemon=True)
+    tickets = budget.next_ticket
+    thread.start()
+    # Let it take its place in the queue before the next job arrives
+    deadline = time.monotonic() + 2
+    while budget.next_ticket == tickets and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return thread
+
+
+def test_jobs_are_admitted_in_arrival_order():
+    budget = MemoryBudget(100)
+    first = budget.acquire(80)
+    admitted = []
+    big = start_waiting(budget, 50, admitted, 'big')
+    small = start_waiting(budget, 10, admitted, 'small')
+    time.sleep(0.1)
+    # 10 bytes would fit next to the first job, but the small job queues behind the big one
+    assert admitted == []
+
+    budget.release(first)
+    big.join(2)
+    small.join(2)
+    assert admitted == [('big', 50), ('small', 10)]
+    assert budget.summary() == {'budget': 100, 'peak_reserved': 80, 'waited_jobs': 2}
+
+
+def test_job_larger_than_the_budget_runs_alone():
+    budget = MemoryBudget(100)
+    assert budget.acquire(500) == 100
+    admitted = []
+    other = start_waiting(budget, 1, admitted, 'other')
+    time.sleep(0.1)
+    assert admitted == []
+    budget.release(100)
+    other.join(2)
+    assert admitted == [('other', 1)]
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import pytest
+
+from engine.pipeline import RasterStage
+
+
+class Renders:
+    """render() for a RasterStage: one work dir per job, optionally held until released."""
+
+    def __init__(self, tmp_path, hold=False):
+        self.tmp_path = tmp_path
+        self.gate = threading.Event()
+        if not hold:
+            self.gate.set()
+        self.started = []
+        self.lock = threading.Lock()
+
+    def __call__(self, src_path, page):
+        with self.lock:
+            self.started.append((src_path, page))
+        self.gate.wait(5)
+        if src_path == 'broken.pdf':
+            raise RuntimeError("render failed")
+        work_dir = self.tmp_path / f'{src_path}_{page}'
+        work_dir.mkdir()
+        raster = work_dir / 'page.mpc'
+        raster.write_text('raster')
+        return str(work_dir), str(raster)
+
+    def wait_started(self, count):
+        deadline = time.monotonic() + 5
+        while len(self.started) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        return list(self.started)
+
+
+JOBS = [('a.pdf', 0), ('a.pdf', 1), ('b.pdf', 0), ('c.pdf', 0)]
+
+
+def test_renders_ahead_at_most_depth_jobs(tmp_path):
+    renders = Renders(tmp_path, hold=True)
+    stage = RasterStage(JOBS, renders, workers=4, depth=2).start()
+    try:
+        assert renders.wait_started(2) == JOBS[:2]
+        renders.gate.set()
+        work_dir, raster = stage.take(JOBS[0])
+        assert os.path.exists(raster)
+        # Taking a raster makes room for the next job
+        assert renders.wait_started(3) == JOBS[:3]
+    finally:
+        stage.close()
+    assert stage.summary() == {'depth': 2, 'started': 3, 'taken': 1}
+
+
+def test_job_not_started_is_handed_back_and_never_rendered(tmp_path):
+    renders = Renders(tmp_path, hold=True)
+    stage = RasterStage(JOBS, renders, workers=1, depth=1).start()
+    try:
+        assert stage.take(JOBS[2]) is None
+        renders.gate.set()
+        assert stage.take(JOBS[0]) is not None
+        renders.wait_started(2)
+        assert stage.take(JOBS[1]) is not None
+        # The claimed job is skipped: the next render is the one after it
+        assert renders.wait_started(3) == [JOBS[0], JOBS[1], JOBS[3]]
+    finally:
+        stage.close()
+
+
+def test_render_errors_are_raised_by_take(tmp_path):
+    stage = RasterStage([('broken.pdf', 0)], Renders(tmp_path), workers=1, depth=1).start()
+    try:
+        with pytest.raises(RuntimeError, match="render failed"):
+            stage.take(('broken.pdf', 0))
+    finally:
+        stage.close()
+
+
+def test_close_removes_rasters_nobody_took(tmp_path):
+    renders = Renders(tmp_path)
+    stage = RasterStage(JOBS, renders, workers=2, depth=2).start()
+    taken_dir, _ = stage.take(JOBS[0])
+    renders.wait_started(3)
+    stage.close()
+    assert os.path.isdir(taken_dir)
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(taken_dir)]
+
+
+def test_cancel_stops_feeding(tmp_path):
+    cancel = threading.Event()
+    renders = Renders(tmp_path)
+    stage = RasterStage(JOBS, renders, workers=1, depth=1, cancel_event=cancel).start()
+    renders.wait_started(1)
+    cancel.set()
+    stage.feeder.join(2)
+    assert not stage.feeder.is_alive()
+    stage.close()
+    assert len(renders.started) == 1
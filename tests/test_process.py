@@ -0,0 +1,34 @@
+import threading
+import time
+
+import pytest
+
+from engine.magick import BatchCancelled, MagickTimeout, build_im_command, run_process
+
+
+def test_run_process_returns_output(magick_bin, source):
+    res = run_process(build_im_command(source, 'jpg:-', 'jpg', quality=85, magick_bin=magick_bin), timeout=30)
+    assert res.returncode == 0
+    assert len(res.stdout) == 100000
+
+
+def test_timeout_kills_the_process_group(magick_bin, source, tmp_path, sleeper):
+    cmd = build_im_command(source, str(tmp_path / 'out.jpg'), 'jpg', magick_bin=magick_bin)
+    start = time.monotonic()
+    with pytest.raises(MagickTimeout):
+        run_process(cmd, timeout=1)
+    # The orphaned child would hold the output pipes open for its whole sleep
+    assert time.monotonic() - start < 10
+    assert sleeper.child_gone()
+    assert not (tmp_path / 'out.jpg').exists()
+
+
+def test_cancel_kills_the_process_group(magick_bin, source, tmp_path, sleeper):
+    cancel = threading.Event()
+    threading.Timer(1, cancel.set).start()
+    cmd = build_im_command(source, str(tmp_path / 'out.jpg'), 'jpg', magick_bin=magick_bin)
+    start = time.monotonic()
+    with pytest.raises(BatchCancelled):
+        run_process(cmd, timeout=60, cancel_event=cancel, poll=0.05)
+    assert time.monotonic() - start < 10
+    assert sleeper.child_gone()
@@ -0,0 +1,23 @@
+from engine.rate_curves import RateCurveStore
+
+SETTINGS = {'format': 'jpg', 'density': 150}
+
+
+def test_points_round_trip(tmp_path):
+    store = RateCurveStore(str(tmp_path / 'curves.db'))
+    store.add('h', SETTINGS, [(150, 100, 60, 1000), (150, 100, 80, 2000), (None, 50, 60, 300)])
+    assert store.load('h', SETTINGS) == {(150, 100): {60: 1000, 80: 2000}, (None, 50): {60: 300}}
+    assert store.load('h', {'format': 'png'}) == {}
+
+
+def test_duplicate_points_keep_the_latest(tmp_path):
+    store = RateCurveStore(str(tmp_path / 'curves.db'))
+    store.add('h', SETTINGS, [(150, 100, 60, 1000), (150, 100, 60, 1010), (None, 100, 60, 500), (None, 100, 60, 505)])
+    assert store.load('h', SETTINGS) == {(150, 100): {60: 1010}, (None, 100): {60: 505}}
+
+
+def test_later_runs_replace_earlier_measurements(tmp_path):
+    store = RateCurveStore(str(tmp_path / 'curves.db'))
+    store.add('h', SETTINGS, [(None, 100, 60, 500), (150, 100, 60, 1000)])
+    store.add('h', SETTINGS, [(None, 100, 60, 520), (150, 100, 60, 1020)])
+    assert store.load('h', SETTINGS) == {(150, 100): {60: 1020}, (None, 100): {60: 520}}
@@ -0,0 +1,107 @@
+import math
+
+import pytest
+
+from engine.search import SEARCH_STRATEGIES, bisect_search, interpolation_search, speculative_search, within_tolerance
+
+
+def jpeg_bytes(quality):
+    """Bytes of a JPEG at this quality: roughly exponential, like real encoders."""
+    return int(20000 * math.exp(quality / 30.0))
+
+
+def palette_bytes(colors):
+    return int(30000 * (math.log2(colors) + 1))
+
+
+class Probe:
+    def __init__(self, size_of):
+        self.size_of = size_of
+        self.values = []
+
+    def __call__(self, value):
+        self.values.append(value)
+        return self.size_of(value)
+
+
+@pytest.mark.parametrize('name', sorted(SEARCH_STRATEGIES))
+@pytest.mark.parametrize('target', [40000, 100000, 250000, 380000])
+def test_strategies_land_within_tolerance(name, target):
+    probe = Probe(jpeg_bytes)
+    value = SEARCH_STRATEGIES[name](20, 95, probe, target, 5)
+    assert value is not None
+    assert within_tolerance(jpeg_bytes(value), target, 5)
+    assert probe.values[-1] == value
+
+
+@pytest.mark.parametrize('name', sorted(SEARCH_STRATEGIES))
+def test_palette_search_on_log_scale(name):
+    probe = Probe(palette_bytes)
+    value = SEARCH_STRATEGIES[name](2, 256, probe, 150000, 5, log_param=True)
+    assert within_tolerance(palette_bytes(value), 150000, 5)
+
+
+@pytest.mark.parametrize('name', sorted(SEARCH_STRATEGIES))
+def test_unreachable_target_returns_none(name):
+    # Even the lowest quality is over the target
+    assert SEARCH_STRATEGIES[name](20, 95, Probe(jpeg_bytes), 10000, 5) is None
+
+
+@pytest.mark.parametrize('name', sorted(SEARCH_STRATEGIES))
+def test_failed_encodes_steer_lower(name):
+    def size_of(quality):
+        return None if quality > 60 else jpeg_bytes(quality)
+
+    value = SEARCH_STRATEGIES[name](20, 95, Probe(size_of), jpeg_bytes(50), 5)
+    assert within_tolerance(jpeg_bytes(value), jpeg_bytes(50), 5)
+
+
+def test_interpolation_needs_fewer_probes_than_bisection():
+    totals = {}
+    for search in (bisect_search, interpolation_search):
+        probes = 0
+        for target in range(40000, 460000, 10000):
+            probe = Probe(jpeg_bytes)
+            assert search(20, 95, probe, target, 3) is not None
+            probes += len(probe.values)
+        totals[search] = probes
+    assert totals[interpolation_search] < totals[bisect_search]
+
+
+class ProbeMany:
+    """probe_many for speculative_search with `slots` concurrent probes per round."""
+
+    def __init__(self, size_of, slots):
+        self.size_of = size_of
+        self.slots = slots
+        self.rounds = []
+
+    def __call__(self, values):
+        values = values[:self.slots]
+        self.rounds.append(values)
+        return {value: self.size_of(value) for value in values}
+
+
+@pytest.mark.parametrize('slots', [1, 2, 4, 8])
+@pytest.mark.parametrize('target', [40000, 100000, 250000, 380000])
+def test_speculative_search_with_idle_slots(slots, target):
+    probe_many = ProbeMany(jpeg_bytes, slots)
+    value = speculative_search(20, 95, Probe(jpeg_bytes), target, 5, probe_many=probe_many)
+    assert within_tolerance(jpeg_bytes(value), target, 5)
+    assert all(len(set(values)) == len(values) for values in probe_many.rounds)
+
+
+def test_speculative_search_takes_fewer_rounds_with_more_slots():
+    def rounds(slots):
+        total = 0
+        for target in range(40000, 460000, 10000):
+            probe_many = ProbeMany(jpeg_bytes, slots)
+            assert speculative_search(20, 95, Probe(jpeg_bytes), target, 3, probe_many=probe_many) is not None
+            total += len(probe_many.rounds)
+        return total
+
+    assert rounds(4) < rounds(1)
+
+
+def test_speculative_search_unreachable_target():
+    assert speculative_search(20, 95, Probe(jpeg_bytes), 10000, 5, probe_many=ProbeMany(jpeg_bytes, 4)) is None